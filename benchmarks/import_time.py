@@ -0,0 +1,98 @@
+"""
+Time registering the plugin with the MAP Client, i.e. importing the plugin package once the
+client's own modules are loaded, and check it does not pull in the fitting dependencies. Run
+from the repository root::
+
+    python -m benchmarks.import_time --budget 0.05
+
+Exits with status 1 if the median import time exceeds the budget or a heavy module is imported.
+Each measurement runs in a new interpreter so nothing is already imported.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PLUGIN_MODULE = 'mapclientplugins.scaffoldfitterstep'
+# imported by the MAP Client before loading plugins, so not counted; the mapclientplugins
+# namespace package is shared by all plugins
+FRAMEWORK_MODULES = ('PySide.QtGui', 'mapclient.mountpoints.workflowstep', 'mapclientplugins')
+# must only be imported when the step is configured or executed
+HEAVY_MODULES = ('numpy', 'scipy', 'opencmiss.zinc', 'opencmiss.zincwidgets', 'opencmiss.zinchandlers',
+                 'scaffoldfitter')
+DEFAULT_BUDGET = 0.05
+
+_MEASURE_SCRIPT = """
+import importlib
+import json
+import sys
+import time
+
+for name in sys.argv[2:]:
+    importlib.import_module(name)
+start_time = time.perf_counter()
+importlib.import_module(sys.argv[1])
+import_time = time.perf_counter() - start_time
+print(json.dumps({'import_time': import_time, 'modules': sorted(sys.modules)}))
+"""
+
+
+def measure_import(module=PLUGIN_MODULE, framework_modules=FRAMEWORK_MODULES):
+    """
+    Import module in a new interpreter after importing framework_modules.
+
+    :return: Seconds taken to import module, list of all modules imported.
+    """
+    output = subprocess.check_output([sys.executable, '-c', _MEASURE_SCRIPT, module] + list(framework_modules))
+    result = json.loads(output.decode('utf-8').splitlines()[-1])
+    return result['import_time'], result['modules']
+
+
+def get_heavy_modules(modules, heavy_modules=HEAVY_MODULES):
+    """
+    :return: Sorted list of heavy_modules, or their submodules, in modules.
+    """
+    return sorted(set(heavy for heavy in heavy_modules for name in modules
+                      if (name == heavy) or name.startswith(heavy + '.')))
+
+
+def run_import_benchmark(repeats=5, budget=DEFAULT_BUDGET):
+    """
+    :return: dict of 'import_times', 'median_import_time', 'budget', 'heavy_modules' imported and
+    whether the benchmark 'passed'.
+    """
+    import_times = []
+    heavy_modules = set()
+    for repeat in range(repeats):
+        import_time, modules = measure_import()
+        import_times.append(import_time)
+        heavy_modules.update(get_heavy_modules(modules))
+    median_import_time = statistics.median(import_times)
+    return {
+        'import_times': import_times,
+        'median_import_time': median_import_time,
+        'budget': budget,
+        'heavy_modules': sorted(heavy_modules),
+        'passed': (median_import_time <= budget) and not heavy_modules
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the time taken to register the plugin.')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help='maximum median import time in seconds')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('-o', '--output', help='JSON file to write results to')
+    args = parser.parse_args(argv)
+    result = run_import_benchmark(args.repeats, args.budget)
+    print('plugin import {0:.3f} s (budget {1:.3f} s)'.format(result['median_import_time'], result['budget']))
+    if result['heavy_modules']:
+        print('imported at registration: ' + ', '.join(result['heavy_modules']))
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(result, stream, indent=4)
+    return 0 if result['passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Time loading, auto-align, projection and fitting of synthetic scaffolds and point clouds at
+increasing sizes, without a GUI. Run from the repository root::
+
+    python -m benchmarks.run_benchmarks --output results.json
+
+Each case runs in a new process so its peak RSS is not inflated by earlier cases.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from opencmiss.zinc.context import Context
+
+from benchmarks.synthetic import SHAPES, write_point_cloud, write_scaffold
+from mapclientplugins.scaffoldfitterstep.model.profiler import get_peak_rss
+from mapclientplugins.scaffoldfitterstep.model.scaffoldfittermodel import ScaffoldFitterModel
+
+QUICK_ELEMENTS_COUNTS = (10, 100, 1000)
+QUICK_POINTS_COUNTS = (1000, 10000, 100000)
+FULL_ELEMENTS_COUNTS = (10, 100, 1000, 10000)
+FULL_POINTS_COUNTS = (1000, 10000, 100000, 1000000, 10000000)
+
+
+def _get_input_files(work_dir, shape, elements_count, points_count, noise, seed):
+    """
+    Write the synthetic inputs for a case, reusing files written by earlier runs.
+
+    :return: scaffold file_location, point cloud file_location, actual number of elements.
+    """
+    scaffold = os.path.join(work_dir, '{0}_{1}.exf'.format(shape, elements_count))
+    count_file = scaffold + '.count'
+    if not (os.path.exists(scaffold) and os.path.exists(count_file)):
+        actual_elements_count = write_scaffold(scaffold, shape, elements_count)
+        with open(count_file, 'w') as stream:
+            stream.write(str(actual_elements_count))
+    with open(count_file, 'r') as stream:
+        actual_elements_count = int(stream.read())
+    point_cloud = os.path.join(work_dir, '{0}_{1}_{2}_{3}.npy'.format(shape, points_count, noise, seed))
+    if not os.path.exists(point_cloud):
+        write_point_cloud(point_cloud, shape, points_count, noise, seed)
+    return scaffold, point_cloud, actual_elements_count
+
+
+def run_case(case):
+    """
+    Fit one case in this process.
+
+    :param case: dict of 'scaffold' and 'point_cloud' file_locations, 'workers' and
+    'max_iterations', plus any description keys which are copied to the result.
+    :return: dict of the case description with stage times in seconds and peak RSS in bytes.
+    """
+    result = dict(case)
+    model = ScaffoldFitterModel(Context('benchmark'))
+    if 'bvh' in model.get_projection_methods():
+        model.set_projection_method('bvh')
+    model.set_projection_workers(case['workers'])
+    model.set_fit_settings(max_iterations=case['max_iterations'])
+    model.set_fit_telemetry(False)
+    start_time = time.perf_counter()
+    model.initialise(case['point_cloud'], case['scaffold'])
+    result['load_time'] = time.perf_counter() - start_time
+    result['load_timings'] = model.get_load_timings()
+    start_time = time.perf_counter()
+    model.auto_align_model_on_data()
+    result['align_time'] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    model.project_data()
+    result['projection_time'] = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    model.fit_data(update_graphics=False)
+    result['fit_time'] = time.perf_counter() - start_time
+    result['rms_error'], result['max_error'] = model.get_data_projection_errors()
+    result['peak_rss'] = get_peak_rss()
+    return result
+
+
+def _send_case_result(case, connection):
+    connection.send(run_case(case))
+    connection.close()
+
+
+def _run_case_process(case):
+    # not a Pool worker: those are daemonic, so could not start projection processes
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_send_case_result, args=(case, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        raise RuntimeError('Benchmark process exited with code {0}'.format(process.exitcode))
+    finally:
+        process.join()
+        receiver.close()
+    return result
+
+
+def get_system_info():
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': multiprocessing.cpu_count(),
+        'python': platform.python_version()
+    }
+
+
+def run_benchmarks(shapes, elements_counts, points_counts, noise=0.01, repeats=1, workers=1,
+                   max_iterations=1, work_dir=None, progress_callback=None):
+    """
+    Run every combination of shape, element count and point count.
+
+    :param noise: Standard deviation of the point cloud noise relative to the unit scaffold size.
+    :param work_dir: Directory to keep the synthetic inputs in, or None for a temporary directory.
+    :param progress_callback: Optional callable(result) called as each case finishes.
+    :return: dict of 'system' information and list of case 'results'.
+    """
+    temporary_dir = None
+    if work_dir is None:
+        temporary_dir = tempfile.TemporaryDirectory()
+        work_dir = temporary_dir.name
+    results = []
+    try:
+        for shape in shapes:
+            for elements_count in elements_counts:
+                for points_count in points_counts:
+                    scaffold, point_cloud, actual_elements_count = _get_input_files(
+                        work_dir, shape, elements_count, points_count, noise, 0)
+                    for repeat in range(repeats):
+                        result = _run_case_process({
+                            'shape': shape,
+                            'elements': actual_elements_count,
+                            'points': points_count,
+                            'noise': noise,
+                            'repeat': repeat,
+                            'workers': workers,
+                            'max_iterations': max_iterations,
+                            'scaffold': scaffold,
+                            'point_cloud': point_cloud
+                        })
+                        del result['scaffold']
+                        del result['point_cloud']
+                        results.append(result)
+                        if progress_callback is not None:
+                            progress_callback(result)
+    finally:
+        if temporary_dir is not None:
+            temporary_dir.cleanup()
+    return {'system': get_system_info(), 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark scaffold fitting on synthetic data.')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='JSON file to write results to')
+    parser.add_argument('--shapes', nargs='+', choices=SHAPES, default=list(SHAPES))
+    parser.add_argument('--elements', nargs='+', type=int, help='target element counts')
+    parser.add_argument('--points', nargs='+', type=int, help='point cloud sizes')
+    parser.add_argument('--full', action='store_true', help='default to the full range of sizes, up to 10M points')
+    parser.add_argument('--noise', type=float, default=0.01, help='point cloud noise standard deviation')
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1, help='projection processes')
+    parser.add_argument('--iterations', type=int, default=1, help='fit iterations')
+    parser.add_argument('--work-dir', help='directory to keep synthetic inputs in between runs')
+    args = parser.parse_args(argv)
+    elements_counts = args.elements or (FULL_ELEMENTS_COUNTS if args.full else QUICK_ELEMENTS_COUNTS)
+    points_counts = args.points or (FULL_POINTS_COUNTS if args.full else QUICK_POINTS_COUNTS)
+
+    def _print_result(result):
+        print('{0} {1} elements {2} points: load {3:.3f} s, align {4:.3f} s, project {5:.3f} s, fit {6:.3f} s'.format(
+            result['shape'], result['elements'], result['points'], result['load_time'], result['align_time'],
+            result['projection_time'], result['fit_time']))
+
+    benchmark = run_benchmarks(args.shapes, elements_counts, points_counts, args.noise, args.repeats,
+                               args.workers, args.iterations, args.work_dir, _print_result)
+    with open(args.output, 'w') as stream:
+        json.dump(benchmark, stream, indent=4)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Synthetic trilinear scaffolds and point clouds sampled from their surfaces, for benchmarking.
+"""
+import math
+
+import numpy as np
+
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.element import Element, Elementbasis
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.status import OK as ZINC_OK
+
+SHAPES = ('cube', 'cylinder')
+
+CYLINDER_INNER_RADIUS = 0.25
+CYLINDER_OUTER_RADIUS = 0.5
+
+
+def get_elements_counts(shape, elements_count):
+    """
+    :return: Numbers of elements in xi1, xi2 and xi3 giving approximately elements_count in total.
+    For the cylinder these are around, along and through the wall.
+    """
+    if shape == 'cube':
+        count = max(1, int(round(elements_count ** (1.0 / 3.0))))
+        return count, count, max(1, int(round(elements_count / (count * count))))
+    if shape == 'cylinder':
+        wall_count = max(1, int(round((elements_count / 16.0) ** (1.0 / 3.0))))
+        around_count = max(4, int(round(math.sqrt(2.0 * elements_count / wall_count))))
+        return around_count, max(1, int(round(elements_count / (wall_count * around_count)))), wall_count
+    raise ValueError('Unknown shape: ' + str(shape))
+
+
+def _get_node_coordinates(shape, elements_counts):
+    """
+    :return: (nodes_count, 3) array of node coordinates with xi1 varying fastest, and the number
+    of nodes in each xi direction.
+    """
+    if shape == 'cube':
+        nodes_counts = [count + 1 for count in elements_counts]
+        x, y, z = np.meshgrid(*[np.linspace(0.0, 1.0, count) for count in nodes_counts], indexing='ij')
+    else:
+        # around the cylinder wraps, so has as many nodes as elements
+        nodes_counts = [elements_counts[0], elements_counts[1] + 1, elements_counts[2] + 1]
+        theta, z, r = np.meshgrid(
+            np.linspace(0.0, 2.0 * math.pi, nodes_counts[0], endpoint=False),
+            np.linspace(0.0, 1.0, nodes_counts[1]),
+            np.linspace(CYLINDER_INNER_RADIUS, CYLINDER_OUTER_RADIUS, nodes_counts[2]), indexing='ij')
+        x = r * np.cos(theta)
+        y = r * np.sin(theta)
+    coordinates = np.stack([x, y, z], axis=-1)
+    return coordinates.transpose(2, 1, 0, 3).reshape(-1, 3), nodes_counts
+
+
+def _get_element_node_identifiers(shape, elements_counts, nodes_counts):
+    """
+    :return: List of the 8 local node identifiers of each element, in trilinear Lagrange order.
+    """
+    element_node_identifiers = []
+    for k in range(elements_counts[2]):
+        for j in range(elements_counts[1]):
+            for i in range(elements_counts[0]):
+                next_i = (i + 1) % nodes_counts[0] if shape == 'cylinder' else i + 1
+                node_identifiers = []
+                for node_k in (k, k + 1):
+                    for node_j in (j, j + 1):
+                        for node_i in (i, next_i):
+                            node_identifiers.append(
+                                (node_k * nodes_counts[1] + node_j) * nodes_counts[0] + node_i + 1)
+                element_node_identifiers.append(node_identifiers)
+    return element_node_identifiers
+
+
+def write_scaffold(filename, shape, elements_count):
+    """
+    Write a trilinear Lagrange scaffold with a 'coordinates' field and all faces to an EX file.
+
+    :return: Actual number of elements.
+    """
+    elements_counts = get_elements_counts(shape, elements_count)
+    node_coordinates, nodes_counts = _get_node_coordinates(shape, elements_counts)
+    context = Context('synthetic')
+    region = context.getDefaultRegion()
+    fm = region.getFieldmodule()
+    fm.beginChange()
+    coordinates = fm.createFieldFiniteElement(3)
+    coordinates.setName('coordinates')
+    coordinates.setManaged(True)
+    coordinates.setTypeCoordinate(True)
+    nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+    nodetemplate = nodes.createNodetemplate()
+    nodetemplate.defineField(coordinates)
+    cache = fm.createFieldcache()
+    for index, x in enumerate(node_coordinates.tolist()):
+        node = nodes.createNode(index + 1, nodetemplate)
+        cache.setNode(node)
+        coordinates.assignReal(cache, x)
+    mesh = fm.findMeshByDimension(3)
+    elementtemplate = mesh.createElementtemplate()
+    elementtemplate.setElementShapeType(Element.SHAPE_TYPE_CUBE)
+    eft = mesh.createElementfieldtemplate(fm.createElementbasis(3, Elementbasis.FUNCTION_TYPE_LINEAR_LAGRANGE))
+    elementtemplate.defineField(coordinates, -1, eft)
+    for index, node_identifiers in enumerate(_get_element_node_identifiers(shape, elements_counts, nodes_counts)):
+        element = mesh.createElement(index + 1, elementtemplate)
+        element.setNodesByIdentifier(eft, node_identifiers)
+    fm.defineAllFaces()
+    fm.endChange()
+    if region.writeFile(filename) != ZINC_OK:
+        raise ValueError('Failed to write synthetic scaffold to ' + filename)
+    return mesh.getSize()
+
+
+def _sample_cube_surface(points_count, random_state):
+    points = random_state.uniform(0.0, 1.0, (points_count, 3))
+    faces = random_state.randint(0, 6, points_count)
+    points[np.arange(points_count), faces % 3] = faces // 3
+    return points
+
+
+def _sample_annulus(points_count, random_state, z):
+    inner_squared = CYLINDER_INNER_RADIUS * CYLINDER_INNER_RADIUS
+    outer_squared = CYLINDER_OUTER_RADIUS * CYLINDER_OUTER_RADIUS
+    r = np.sqrt(random_state.uniform(inner_squared, outer_squared, points_count))
+    return r, np.full(points_count, z)
+
+
+def _sample_cylinder_surface(points_count, random_state):
+    areas = np.array([
+        2.0 * math.pi * CYLINDER_OUTER_RADIUS,
+        2.0 * math.pi * CYLINDER_INNER_RADIUS,
+        math.pi * (CYLINDER_OUTER_RADIUS ** 2 - CYLINDER_INNER_RADIUS ** 2),
+        math.pi * (CYLINDER_OUTER_RADIUS ** 2 - CYLINDER_INNER_RADIUS ** 2)])
+    counts = random_state.multinomial(points_count, areas / np.sum(areas))
+    r = [np.full(counts[0], CYLINDER_OUTER_RADIUS), np.full(counts[1], CYLINDER_INNER_RADIUS)]
+    z = [random_state.uniform(0.0, 1.0, counts[0]), random_state.uniform(0.0, 1.0, counts[1])]
+    for cap_r, cap_z in (_sample_annulus(counts[2], random_state, 0.0),
+                         _sample_annulus(counts[3], random_state, 1.0)):
+        r.append(cap_r)
+        z.append(cap_z)
+    r = np.concatenate(r)
+    z = np.concatenate(z)
+    theta = random_state.uniform(0.0, 2.0 * math.pi, points_count)
+    return np.stack([r * np.cos(theta), r * np.sin(theta), z], axis=-1)
+
+
+def write_point_cloud(filename, shape, points_count, noise=0.0, seed=0):
+    """
+    Write points sampled uniformly from the surface of the shape, each offset by normally
+    distributed noise with standard deviation noise in each direction, to a .npy file.
+    """
+    random_state = np.random.RandomState(seed)
+    if shape == 'cube':
+        points = _sample_cube_surface(points_count, random_state)
+    elif shape == 'cylinder':
+        points = _sample_cylinder_surface(points_count, random_state)
+    else:
+        raise ValueError('Unknown shape: ' + str(shape))
+    if noise > 0.0:
+        points += random_state.normal(0.0, noise, points.shape)
+    np.save(filename, points)
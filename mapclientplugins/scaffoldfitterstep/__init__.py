@@ -2,15 +2,19 @@
 """
 MAP Client Plugin
 """
+import sys
 
 __version__ = '0.1.0'
 __author__ = 'Mahyar Osanlouy'
 __stepname__ = 'Scaffold Fitter'
 __location__ = ''
 
-# import class that derives itself from the step mountpoint.
-from mapclientplugins.scaffoldfitterstep import step
+# Only register the step when loaded by the MAP Client, so the fitting model and
+# headless fitting can be used without importing PySide.
+if 'mapclient' in sys.modules:
+    # import class that derives itself from the step mountpoint.
+    from mapclientplugins.scaffoldfitterstep import step
 
-# Import the resource file when the module is loaded,
-# this enables the framework to use the step icon.
-from . import resources_rc
\ No newline at end of file
+    # Import the resource file when the module is loaded,
+    # this enables the framework to use the step icon.
+    from . import resources_rc
\ No newline at end of file
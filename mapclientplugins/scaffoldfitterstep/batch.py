@@ -0,0 +1,169 @@
+"""
+Fit many scaffold and point cloud pairs in parallel processes, each with its own Zinc context.
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+POLL_INTERVAL = 0.1
+
+
+def read_manifest(filename):
+    """
+    Read a JSON list of jobs, each a dict with 'scaffold', 'point_cloud', 'output' and optional
+    'settings' file_locations, and an optional 'name'. Relative paths are relative to the manifest.
+
+    :return: List of job dicts with absolute paths.
+    """
+    with open(filename, 'r') as stream:
+        jobs = json.load(stream)
+    directory = os.path.dirname(os.path.abspath(filename))
+    for index, job in enumerate(jobs):
+        for key in ('scaffold', 'point_cloud', 'output', 'settings'):
+            if job.get(key):
+                job[key] = os.path.join(directory, job[key])
+        job.setdefault('name', 'job{0}'.format(index + 1))
+    return jobs
+
+
+def run_job(job):
+    """
+    Fit a single job in this process.
+
+    :return: dict of job 'name', 'status', 'duration' and fitted data 'rms_error' and 'max_error'.
+    """
+    # Zinc is only loaded by the processes fitting jobs, not the one scheduling them
+    from mapclientplugins.scaffoldfitterstep.headless import fit_scaffold, read_settings
+    from mapclientplugins.scaffoldfitterstep.model.sharedcontext import reset_shared_contexts
+    # contexts inherited from a forked parent are not shared with it
+    reset_shared_contexts()
+    start_time = time.perf_counter()
+    model = fit_scaffold(job['scaffold'], job['point_cloud'], read_settings(job.get('settings')), job['output'])
+    rms_error, max_error = model.get_data_projection_errors()
+    model.done()
+    return {
+        'name': job['name'],
+        'status': 'succeeded',
+        'duration': time.perf_counter() - start_time,
+        'rms_error': rms_error,
+        'max_error': max_error
+    }
+
+
+def _run_job_process(job, connection):
+    try:
+        result = run_job(job)
+    except Exception:
+        result = {'name': job['name'], 'status': 'failed', 'error': traceback.format_exc()}
+    connection.send(result)
+    connection.close()
+
+
+def run_batch(jobs, workers_count=None, timeout=None, retries=0, progress_callback=None):
+    """
+    Run jobs in up to workers_count processes at a time. Each attempt runs in a new process, so a
+    job which exceeds timeout can be terminated, and failed or timed out jobs are retried.
+
+    :param timeout: Seconds allowed for each attempt, or None for no limit.
+    :param retries: Number of further attempts after a failure.
+    :param progress_callback: Optional callable(result) called as each job finishes.
+    :return: List of result dicts in the order of jobs, each with 'attempts' added.
+    """
+    if workers_count is None:
+        workers_count = multiprocessing.cpu_count()
+    results = [None] * len(jobs)
+    pending = collections.deque((index, 1) for index in range(len(jobs)))
+    running = {}
+    while pending or running:
+        while pending and (len(running) < workers_count):
+            index, attempt = pending.popleft()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_run_job_process, args=(jobs[index], sender))
+            process.start()
+            sender.close()
+            running[index] = (process, receiver, time.perf_counter(), attempt)
+        time.sleep(POLL_INTERVAL)
+        for index, (process, receiver, start_time, attempt) in list(running.items()):
+            result = None
+            if receiver.poll():
+                try:
+                    result = receiver.recv()
+                    process.join()
+                except EOFError:
+                    # the pipe closes without a result when the worker process dies
+                    process.join()
+                    result = {'name': jobs[index]['name'], 'status': 'failed',
+                              'error': 'Worker process exited with code {0}'.format(process.exitcode)}
+            elif not process.is_alive():
+                result = {'name': jobs[index]['name'], 'status': 'failed',
+                          'error': 'Worker process exited with code {0}'.format(process.exitcode)}
+            elif (timeout is not None) and (time.perf_counter() - start_time > timeout):
+                process.terminate()
+                process.join()
+                result = {'name': jobs[index]['name'], 'status': 'timeout',
+                          'error': 'Exceeded {0} s'.format(timeout)}
+            if result is None:
+                continue
+            receiver.close()
+            del running[index]
+            result['attempts'] = attempt
+            result.setdefault('duration', time.perf_counter() - start_time)
+            if (result['status'] != 'succeeded') and (attempt <= retries):
+                pending.append((index, attempt + 1))
+                continue
+            results[index] = result
+            if progress_callback is not None:
+                progress_callback(result)
+    return results
+
+
+def summarise(results):
+    """
+    :return: dict of job counts by status, total and maximum durations, mean RMS and worst
+    maximum error of succeeded jobs, and the job results.
+    """
+    succeeded = [result for result in results if result['status'] == 'succeeded']
+    durations = [result['duration'] for result in results]
+    rms_errors = [result['rms_error'] for result in succeeded if result['rms_error'] is not None]
+    max_errors = [result['max_error'] for result in succeeded if result['max_error'] is not None]
+    return {
+        'jobs': len(results),
+        'succeeded': len(succeeded),
+        'failed': sum(1 for result in results if result['status'] == 'failed'),
+        'timeout': sum(1 for result in results if result['status'] == 'timeout'),
+        'total_duration': sum(durations),
+        'max_duration': max(durations) if durations else None,
+        'mean_rms_error': sum(rms_errors) / len(rms_errors) if rms_errors else None,
+        'max_error': max(max_errors) if max_errors else None,
+        'results': results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit a manifest of scaffold and point cloud jobs in parallel.')
+    parser.add_argument('manifest', help='JSON list of jobs with scaffold, point_cloud, output and optional settings')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of processes, default CPU count')
+    parser.add_argument('-t', '--timeout', type=float, default=None, help='seconds allowed per attempt')
+    parser.add_argument('-r', '--retries', type=int, default=0, help='further attempts after a failure')
+    parser.add_argument('--report', help='JSON file to write the summary report to')
+    args = parser.parse_args(argv)
+
+    def _print_result(result):
+        print('{0}: {1} in {2:.1f} s'.format(result['name'], result['status'], result['duration']))
+
+    results = run_batch(read_manifest(args.manifest), args.workers, args.timeout, args.retries, _print_result)
+    summary = summarise(results)
+    print('{0} of {1} jobs succeeded'.format(summary['succeeded'], summary['jobs']))
+    if args.report:
+        with open(args.report, 'w') as stream:
+            json.dump(summary, stream, indent=4)
+    return 0 if summary['succeeded'] == summary['jobs'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,7 @@
 
 
 from PySide import QtGui
+from mapclientplugins.scaffoldfitterstep.model.graphicsmanager import DEFAULT_DISPLAY_POINT_BUDGET
 from mapclientplugins.scaffoldfitterstep.ui_configuredialog import Ui_ConfigureDialog
 
 INVALID_STYLE_SHEET = 'background-color: rgba(239, 0, 0, 50)'
@@ -71,7 +72,15 @@ class ConfigureDialog(QtGui.QDialog):
         self._previousIdentifier = self._ui.lineEdit0.text()
         config = {}
         config['identifier'] = self._ui.lineEdit0.text()
-        # config[''] = self._ui.lineEdit1.text()
+        config['cache_dir'] = self._ui.lineEdit1.text()
+        config['sidecar_cache'] = self._ui.checkBox2.isChecked()
+        config['profile'] = self._ui.checkBox3.isChecked()
+        config['result_cache'] = self._ui.checkBox4.isChecked()
+        config['initial_geometry'] = self._ui.lineEdit5.text()
+        config['display_point_budget'] = self._ui.spinBox6.value()
+        config['export_reference_coordinates'] = self._ui.checkBox7.isChecked()
+        config['export_projections'] = self._ui.checkBox8.isChecked()
+        config['export_compressed'] = self._ui.checkBox9.isChecked()
         return config
 
     def setConfig(self, config):
@@ -82,5 +91,13 @@ class ConfigureDialog(QtGui.QDialog):
         '''
         self._previousIdentifier = config['identifier']
         self._ui.lineEdit0.setText(config['identifier'])
-        # self._ui.lineEdit1.setText(config[''])
+        self._ui.lineEdit1.setText(config.get('cache_dir', ''))
+        self._ui.checkBox2.setChecked(config.get('sidecar_cache', False))
+        self._ui.checkBox3.setChecked(config.get('profile', False))
+        self._ui.checkBox4.setChecked(config.get('result_cache', False))
+        self._ui.lineEdit5.setText(config.get('initial_geometry', ''))
+        self._ui.spinBox6.setValue(config.get('display_point_budget', DEFAULT_DISPLAY_POINT_BUDGET))
+        self._ui.checkBox7.setChecked(config.get('export_reference_coordinates', False))
+        self._ui.checkBox8.setChecked(config.get('export_projections', False))
+        self._ui.checkBox9.setChecked(config.get('export_compressed', False))
 
@@ -0,0 +1,136 @@
+"""
+Fit a scaffold to a point cloud without the MAP Client or Qt, e.g. for batch fitting on servers.
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+
+from mapclientplugins.scaffoldfitterstep.model.master import MasterModel
+from mapclientplugins.scaffoldfitterstep.model.profiler import get_profiler
+
+DEFAULT_SETTINGS = {
+    'swap_yz': False,
+    # None to auto-align unless starting from an already fitted initial_geometry
+    'auto_align': None,
+    'icp': {
+        'enabled': False,
+        'mode': 'similarity',
+        # True or False, None to try both, or 'current' to keep the auto-align mirror
+        'mirror': 'current',
+        'max_iterations': 50,
+        'tolerance': 1.0E-6,
+        'sample_count': 5000,
+        'trim_fraction': 0.0
+    },
+    'initial_geometry': None,
+    'downsample': {
+        'mode': 'none',
+        'voxel_size': None,
+        'target_count': None
+    },
+    'projection': {
+        'method': 'fitter',
+        'incremental': True,
+        'workers': 1
+    },
+    'fit': {
+        'strain_penalty': 0.0,
+        'edge_discontinuity_penalty': 0.0,
+        'max_iterations': 1,
+        'schedule': []
+    },
+    'checkpoint_interval': 10
+}
+
+
+def read_settings(filename=None):
+    """
+    :param filename: JSON settings file overriding any of DEFAULT_SETTINGS, or None for defaults.
+    :return: Complete settings dict.
+    """
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+    if filename:
+        with open(filename, 'r') as stream:
+            file_settings = json.load(stream)
+        for key, value in file_settings.items():
+            if isinstance(value, dict) and isinstance(settings.get(key), dict):
+                settings[key].update(value)
+            else:
+                settings[key] = value
+    return settings
+
+
+def fit_scaffold(scaffold, point_cloud, settings=None, output=None, telemetry=None, checkpoint=None, resume=False):
+    """
+    Load the scaffold and point cloud, then align, project and fit.
+
+    :param scaffold: file_location of the scaffold EX file.
+    :param point_cloud: file_location of the point cloud, or an (N, 3) array.
+    :param settings: dict as returned by read_settings(), or None for defaults.
+    :param output: Optional file_location to write the fitted scaffold to.
+    :param telemetry: Optional .csv or .json file_location to write per-iteration fit measurements to.
+    :param checkpoint: Optional file_location to write fit checkpoints to.
+    :param resume: If True and checkpoint exists, continue fitting from it instead of aligning
+    and projecting again.
+    :return: The MasterModel holding the fitted scaffold.
+    """
+    if settings is None:
+        settings = read_settings()
+    model = MasterModel('Fitting')
+    model.set_downsample_settings(**settings['downsample'])
+    model.set_projection_method(settings['projection']['method'])
+    model.set_incremental_projection(settings['projection']['incremental'])
+    model.set_projection_workers(settings['projection']['workers'])
+    model.set_fit_settings(**settings['fit'])
+    model.set_fit_telemetry(bool(telemetry))
+    model.set_initial_geometry(settings['initial_geometry'])
+    model.initialise(point_cloud, scaffold)
+    if checkpoint:
+        model.set_checkpoint(checkpoint, settings['checkpoint_interval'])
+    if resume and checkpoint and os.path.isfile(checkpoint):
+        model.resume_from_checkpoint(checkpoint)
+    else:
+        if settings['swap_yz']:
+            model.swap_yz()
+        auto_align = settings['auto_align']
+        if auto_align is None:
+            auto_align = not settings['initial_geometry']
+        if auto_align:
+            model.auto_align_model_on_data()
+        icp_settings = dict(settings['icp'])
+        if icp_settings.pop('enabled'):
+            model.icp_align_model_on_data(**icp_settings)
+        model.project_data()
+    model.fit_scaffold()
+    if telemetry:
+        model.get_fit_telemetry().write(telemetry)
+    if output:
+        model.write_model(output)
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit a scaffold to a point cloud without a GUI.')
+    parser.add_argument('scaffold', help='scaffold EX file')
+    parser.add_argument('point_cloud', help='point cloud EX data, .npy, binary .ply, or raw .f32/.f64 file')
+    parser.add_argument('output', help='EX file to write the fitted scaffold to')
+    parser.add_argument('-s', '--settings', help='JSON settings file')
+    parser.add_argument('--telemetry', help='CSV or JSON file to write per-iteration fit measurements to')
+    parser.add_argument('--profile', help='Chrome trace JSON file to write stage timings to')
+    parser.add_argument('--checkpoint', help='file to write fit checkpoints to')
+    parser.add_argument('--resume', action='store_true', help='continue fitting from the checkpoint if it exists')
+    args = parser.parse_args(argv)
+    profiler = get_profiler()
+    profiler.set_enabled(bool(args.profile))
+    model = fit_scaffold(args.scaffold, args.point_cloud, read_settings(args.settings), args.output, args.telemetry,
+                         args.checkpoint, args.resume)
+    model.done()
+    if args.profile:
+        profiler.write_trace(args.profile)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
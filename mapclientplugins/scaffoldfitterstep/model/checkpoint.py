@@ -0,0 +1,65 @@
+import json
+import os
+import zlib
+
+import numpy as np
+
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.status import OK as ZINC_OK
+
+CHECKPOINT_VERSION = 2
+DEFAULT_CHECKPOINT_INTERVAL = 10
+
+
+def serialise_node_parameters(field):
+    """
+    :return: zlib-compressed EX buffer of the node parameters of finite element field.
+    """
+    region = field.getFieldmodule().getRegion()
+    sir = region.createStreaminformationRegion()
+    memory_resource = sir.createStreamresourceMemory()
+    sir.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_NODES)
+    sir.setResourceFieldNames(memory_resource, [field.getName()])
+    if region.write(sir) != ZINC_OK:
+        raise ValueError('Failed to serialise field ' + field.getName())
+    result, buffer = memory_resource.getBuffer()
+    return zlib.compress(buffer)
+
+
+def deserialise_node_parameters(region, buffer):
+    """
+    Read node parameters serialised by serialise_node_parameters() back into region.
+    """
+    sir = region.createStreaminformationRegion()
+    sir.createStreamresourceMemoryBuffer(zlib.decompress(buffer))
+    if region.read(sir) != ZINC_OK:
+        raise ValueError('Failed to read node parameters from checkpoint')
+
+
+def write_checkpoint(filename, metadata, arrays):
+    """
+    Write a checkpoint atomically, so an interrupted write leaves any earlier checkpoint intact.
+
+    :param metadata: JSON-serialisable dict.
+    :param arrays: dict of name -> numpy array.
+    """
+    metadata = dict(metadata, version=CHECKPOINT_VERSION)
+    directory = os.path.dirname(os.path.abspath(filename))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    temporary_filename = filename + '.tmp'
+    with open(temporary_filename, 'wb') as stream:
+        np.savez(stream, metadata=np.array(json.dumps(metadata)), **arrays)
+    os.replace(temporary_filename, filename)
+
+
+def read_checkpoint(filename):
+    """
+    :return: metadata dict, dict of name -> numpy array.
+    """
+    with np.load(filename) as data:
+        metadata = json.loads(str(data['metadata']))
+        if metadata.get('version') != CHECKPOINT_VERSION:
+            raise ValueError('Unsupported checkpoint version in ' + filename)
+        arrays = {name: data[name] for name in data.files if name != 'metadata'}
+    return metadata, arrays
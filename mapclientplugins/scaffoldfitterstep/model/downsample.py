@@ -0,0 +1,159 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+DOWNSAMPLE_MODES = ('none', 'voxel', 'stratified', 'poisson')
+
+_SPACING_SEARCH_ITERATIONS = 12
+# smallest spacing searched relative to the extent of the points, reached when they have fewer
+# distinct positions than the target count
+_MIN_RELATIVE_SPACING = 1.0E-6
+# each Poisson-disk sample loops over the candidate points in Python, so searching for a
+# spacing, which samples repeatedly, is limited to targets it can reach in seconds
+POISSON_MAX_TARGET_COUNT = 20000
+
+
+def _get_voxel_inverse(coordinates, voxel_size):
+    """
+    :return: Array of the index of the occupied cubic voxel of side voxel_size holding each point.
+    """
+    minimum = coordinates.min(axis=0)
+    keys = np.floor((coordinates - minimum) / voxel_size).astype(np.int64)
+    dimensions = keys.max(axis=0) + 1
+    if np.prod(dimensions.astype(np.float64)) < 2.0**62:
+        voxel_ids = np.ravel_multi_index(keys.T, dimensions)
+        _, inverse = np.unique(voxel_ids, return_inverse=True)
+    else:
+        _, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return inverse.reshape(-1)
+
+
+def _random_voxel_indices(coordinates, voxel_size, seed):
+    """
+    :return: Sorted array of indices of one randomly chosen point per cubic voxel of side voxel_size.
+    """
+    inverse = _get_voxel_inverse(coordinates, voxel_size)
+    order = np.random.RandomState(seed).permutation(len(coordinates))
+    _, first = np.unique(inverse[order], return_index=True)
+    return np.sort(order[first])
+
+
+def voxel_grid_indices(coordinates, voxel_size):
+    """
+    Keep one point per cubic voxel of side voxel_size: the point closest to the centroid of the
+    points in that voxel.
+
+    :param coordinates: (N, components) array.
+    :return: Sorted array of indices of the retained points.
+    """
+    inverse = _get_voxel_inverse(coordinates, voxel_size)
+    counts = np.bincount(inverse)
+    centroids = np.stack([np.bincount(inverse, weights=coordinates[:, c]) for c in range(coordinates.shape[1])],
+                         axis=-1) / counts[:, np.newaxis]
+    distances = np.sum((coordinates - centroids[inverse])**2, axis=1)
+    order = np.lexsort((distances, inverse))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = inverse[order[1:]] != inverse[order[:-1]]
+    return np.sort(order[first])
+
+
+def stratified_indices(coordinates, cell_size, seed=0):
+    """
+    Keep one randomly chosen point per cubic cell of side cell_size. Cheaper than
+    voxel_grid_indices() and without its regular pattern, so suited to display.
+
+    :param coordinates: (N, components) array.
+    :return: Sorted array of indices of the retained points.
+    """
+    return _random_voxel_indices(coordinates, cell_size, seed)
+
+
+def poisson_disk_indices(coordinates, radius, seed=0):
+    """
+    Dart-throwing Poisson-disk sample: visit points in random order, keeping each one that is
+    at least radius from all points kept so far. Points in a voxel of side radius / sqrt(dimension)
+    are all closer than radius, so only one random point per such voxel is a candidate.
+
+    :param coordinates: (N, components) array.
+    :return: Sorted array of indices of the retained points.
+    """
+    candidates = _random_voxel_indices(coordinates, radius / np.sqrt(coordinates.shape[1]), seed)
+    tree = cKDTree(coordinates[candidates])
+    # neighbours of all candidates are found at once; visiting them in random order then only
+    # needs to skip those near a point already kept
+    neighbours = tree.query_ball_point(tree.data, np.nextafter(radius, 0.0))
+    rejected = np.zeros(len(candidates), dtype=bool)
+    retained = []
+    for index in np.random.RandomState(seed).permutation(len(candidates)).tolist():
+        if not rejected[index]:
+            retained.append(index)
+            rejected[neighbours[index]] = True
+    return np.sort(candidates[np.array(retained, dtype=np.int64)])
+
+
+def _indices_for_target_count(sample, coordinates, target_count, seed):
+    """
+    Search for the sample spacing giving the largest point count not exceeding target_count.
+    """
+    # a single voxel, or Poisson-disk radius, spanning all points keeps exactly one point
+    high = float(np.linalg.norm(coordinates.max(axis=0) - coordinates.min(axis=0))) * (1.0 + 1.0E-6)
+    if high <= 0.0:
+        return np.arange(min(target_count, len(coordinates)))
+    best = sample(coordinates, high, seed)
+    # halve the spacing until the target is reached: the count depends on whether the points
+    # fill a volume or lie on a surface, so no initial lower bound holds for all clouds
+    min_spacing = _MIN_RELATIVE_SPACING * high
+    low = 0.5 * high
+    while True:
+        indices = sample(coordinates, low, seed)
+        if len(indices) >= target_count:
+            if len(indices) == target_count:
+                return indices
+            break
+        best = indices
+        if low < min_spacing:
+            return best
+        high = low
+        low *= 0.5
+    for _ in range(_SPACING_SEARCH_ITERATIONS):
+        if len(best) > 0.95 * target_count:
+            break
+        spacing = np.sqrt(low * high)
+        indices = sample(coordinates, spacing, seed)
+        if len(indices) > target_count:
+            low = spacing
+        else:
+            best = indices
+            high = spacing
+    return best
+
+
+def downsample_indices(coordinates, mode, voxel_size=None, target_count=None, seed=0):
+    """
+    Choose a spatially even subset of points for fitting or display.
+
+    :param coordinates: (N, components) array.
+    :param mode: One of DOWNSAMPLE_MODES.
+    :param voxel_size: Voxel side for 'voxel' and 'stratified' or minimum point distance for 'poisson' mode.
+    :param target_count: Used when voxel_size is not set; the spacing is searched to keep at most
+    this many points. At most POISSON_MAX_TARGET_COUNT for 'poisson' mode.
+    :return: Sorted array of indices of the retained points.
+    """
+    count = len(coordinates)
+    if (mode == 'none') or (count == 0):
+        return np.arange(count)
+    if mode == 'voxel':
+        sample = lambda points, spacing, _seed: voxel_grid_indices(points, spacing)
+    elif mode == 'stratified':
+        sample = stratified_indices
+    elif mode == 'poisson':
+        sample = poisson_disk_indices
+    else:
+        raise ValueError('Unknown downsample mode: ' + str(mode))
+    if voxel_size:
+        return sample(coordinates, voxel_size, seed)
+    if target_count and (target_count < count):
+        if (mode == 'poisson') and (target_count > POISSON_MAX_TARGET_COUNT):
+            raise ValueError('Poisson-disk downsampling to more than {0} points is too slow; set voxel_size or use '
+                             'voxel or stratified mode'.format(POISSON_MAX_TARGET_COUNT))
+        return _indices_for_target_count(sample, coordinates, target_count, seed)
+    return np.arange(count)
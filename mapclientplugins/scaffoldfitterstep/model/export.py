@@ -0,0 +1,42 @@
+import gzip
+import os
+import shutil
+
+from opencmiss.zinc.status import OK as ZINC_OK
+
+COMPRESSED_EXTENSION = '.gz'
+# fastest gzip level: EX text still compresses several times over
+COMPRESS_LEVEL = 1
+# bytes compressed at a time, bounding memory use whatever the mesh size
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def write_region_fields(region, filename, field_names, domain_types, compress=False):
+    """
+    Write fields of region to an EX file. Zinc streams the file straight to disk, and it is then
+    optionally gzip compressed in chunks, so the serialisation is never held in memory. The file
+    is replaced atomically so readers never see a partial file.
+
+    :param field_names: Names of the fields to write.
+    :param domain_types: Field.DOMAIN_TYPE_* flags for the nodes, meshes and datapoints to write.
+    :param compress: If True, gzip compress the file.
+    :return: filename.
+    """
+    temporary_filename = filename + '.tmp'
+    sir = region.createStreaminformationRegion()
+    resource = sir.createStreamresourceFile(temporary_filename)
+    sir.setResourceDomainTypes(resource, domain_types)
+    sir.setResourceFieldNames(resource, field_names)
+    if region.write(sir) != ZINC_OK:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+        raise ValueError('Failed to write ' + filename)
+    if compress:
+        compressed_filename = temporary_filename + COMPRESSED_EXTENSION
+        with open(temporary_filename, 'rb') as source, \
+                gzip.open(compressed_filename, 'wb', compresslevel=COMPRESS_LEVEL) as target:
+            shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+        os.remove(temporary_filename)
+        temporary_filename = compressed_filename
+    os.replace(temporary_filename, filename)
+    return filename
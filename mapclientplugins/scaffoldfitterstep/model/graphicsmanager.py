@@ -0,0 +1,81 @@
+import time
+
+DEFAULT_RELEASE_DELAY = 300.0
+# maximum number of data points drawn, or 0 to draw all
+DEFAULT_DISPLAY_POINT_BUDGET = 200000
+
+
+class GraphicsManager(object):
+    """
+    Creates named scene graphics only when they are first made visible, reusing them thereafter.
+    Graphics hidden for longer than release_delay seconds are removed from the scene to free
+    their tessellation and GPU memory, and are created again if shown later. They are checked on
+    every visibility change and whenever release_hidden_graphics() is called, which users of the
+    manager should do periodically.
+    """
+
+    def __init__(self, scene, release_delay=DEFAULT_RELEASE_DELAY):
+        self._scene = scene
+        self._release_delay = release_delay
+        self._creators = {}
+        self._hidden_times = {}
+
+    def register(self, name, create):
+        """
+        :param create: callable() returning new graphics with the given name.
+        """
+        self._creators[name] = create
+
+    def is_registered(self, name):
+        return name in self._creators
+
+    def get_graphics(self, name):
+        """
+        :return: Existing graphics with name, or None if not created or released.
+        """
+        graphics = self._scene.findGraphicsByName(name)
+        return graphics if graphics.isValid() else None
+
+    def set_visibility(self, name, show):
+        """
+        Show graphics with name, creating them if needed, or hide them if they exist.
+        Unregistered names are only shown or hidden if they already exist.
+        """
+        self._scene.beginChange()
+        graphics = self.get_graphics(name)
+        if show:
+            if (graphics is None) and (name in self._creators):
+                graphics = self._creators[name]()
+            if graphics is not None:
+                graphics.setVisibilityFlag(True)
+            self._hidden_times.pop(name, None)
+        elif graphics is not None:
+            graphics.setVisibilityFlag(False)
+            self._hidden_times.setdefault(name, time.monotonic())
+        self.release_hidden_graphics()
+        self._scene.endChange()
+
+    def set_coordinate_field(self, names, coordinate_field):
+        """
+        Change the coordinate field of existing graphics; graphics created later get theirs from
+        their creator.
+        """
+        self._scene.beginChange()
+        for name in names:
+            graphics = self.get_graphics(name)
+            if graphics is not None:
+                graphics.setCoordinateField(coordinate_field)
+        self._scene.endChange()
+
+    def release_hidden_graphics(self, now=None):
+        """
+        Remove graphics hidden for longer than the release delay.
+        """
+        if now is None:
+            now = time.monotonic()
+        for name, hidden_time in list(self._hidden_times.items()):
+            if now - hidden_time >= self._release_delay:
+                graphics = self.get_graphics(name)
+                if graphics is not None:
+                    self._scene.removeGraphics(graphics)
+                del self._hidden_times[name]
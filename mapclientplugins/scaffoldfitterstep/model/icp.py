@@ -0,0 +1,138 @@
+import math
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+ICP_MODES = ('rigid', 'similarity')
+
+MIRROR = np.diag([-1.0, 1.0, 1.0])
+
+
+def euler_angles_to_rotation_matrix(euler_angles):
+    """
+    :param euler_angles: azimuth, elevation, roll in radians.
+    :return: 3x3 rotation matrix as used for the fitter's align settings.
+    """
+    cos_azimuth, sin_azimuth = math.cos(euler_angles[0]), math.sin(euler_angles[0])
+    cos_elevation, sin_elevation = math.cos(euler_angles[1]), math.sin(euler_angles[1])
+    cos_roll, sin_roll = math.cos(euler_angles[2]), math.sin(euler_angles[2])
+    return np.array([
+        [cos_azimuth * cos_elevation, sin_azimuth * cos_elevation, -sin_elevation],
+        [cos_azimuth * sin_elevation * sin_roll - sin_azimuth * cos_roll,
+         sin_azimuth * sin_elevation * sin_roll + cos_azimuth * cos_roll,
+         cos_elevation * sin_roll],
+        [cos_azimuth * sin_elevation * cos_roll + sin_azimuth * sin_roll,
+         sin_azimuth * sin_elevation * cos_roll - cos_azimuth * sin_roll,
+         cos_elevation * cos_roll]])
+
+
+def rotation_matrix_to_euler_angles(rotation):
+    """
+    Inverse of euler_angles_to_rotation_matrix(). At elevation +/-90 degrees, roll is taken as zero.
+    """
+    elevation = math.asin(max(-1.0, min(1.0, -rotation[0, 2])))
+    if abs(rotation[0, 2]) < 1.0 - 1.0E-12:
+        azimuth = math.atan2(rotation[0, 1], rotation[0, 0])
+        roll = math.atan2(rotation[1, 2], rotation[2, 2])
+    else:
+        azimuth = math.atan2(-rotation[1, 0], rotation[1, 1])
+        roll = 0.0
+    return [azimuth, elevation, roll]
+
+
+def _estimate_transform(source, target, mode, scale):
+    """
+    Least squares rotation, translation and for 'similarity' mode scale, mapping source to target
+    points (Umeyama's method). Reflections are excluded.
+
+    :return: scale, rotation matrix, offset.
+    """
+    source_mean = np.mean(source, axis=0)
+    target_mean = np.mean(target, axis=0)
+    source_centred = source - source_mean
+    target_centred = target - target_mean
+    covariance = np.dot(target_centred.T, source_centred) / len(source)
+    u, s, vt = np.linalg.svd(covariance)
+    d = np.ones(3)
+    if np.linalg.det(u) * np.linalg.det(vt) < 0.0:
+        d[2] = -1.0
+    rotation = np.dot(u * d, vt)
+    if mode == 'similarity':
+        source_variance = np.sum(source_centred * source_centred) / len(source)
+        if source_variance > 0.0:
+            scale = np.sum(s * d) / source_variance
+    offset = target_mean - scale * np.dot(rotation, source_mean)
+    return scale, rotation, offset
+
+
+def _match(source, target, scale, rotation, offset, trim_fraction):
+    """
+    :return: index of the nearest transformed source point to each target point, mask or slice
+    of the correspondences kept, and their RMS distance.
+    """
+    transformed = scale * np.dot(source, rotation.T) + offset
+    distances, indices = cKDTree(transformed).query(target)
+    if trim_fraction > 0.0:
+        keep = distances <= np.percentile(distances, 100.0 * (1.0 - trim_fraction))
+    else:
+        keep = slice(None)
+    return indices, keep, math.sqrt(np.mean(distances[keep] ** 2))
+
+
+def _icp(source, target, mode, mirror, scale, rotation, offset, max_iterations, tolerance, trim_fraction):
+    if mirror:
+        # reflect about the source centroid so the initial transform leaves it in place
+        centre = np.mean(source, axis=0)
+        offset = offset + scale * np.dot(rotation, centre - np.dot(MIRROR, centre))
+        source = np.dot(source, MIRROR)
+    indices, keep, rms_error = _match(source, target, scale, rotation, offset, trim_fraction)
+    iteration = 0
+    while iteration < max_iterations:
+        iteration += 1
+        scale, rotation, offset = _estimate_transform(source[indices[keep]], target[keep], mode, scale)
+        previous_rms_error = rms_error
+        indices, keep, rms_error = _match(source, target, scale, rotation, offset, trim_fraction)
+        if previous_rms_error - rms_error <= tolerance * previous_rms_error:
+            break
+    return {
+        'scale': scale,
+        'rotation': rotation,
+        'euler_angles': rotation_matrix_to_euler_angles(rotation),
+        'offset': offset,
+        'mirror': mirror,
+        'rms_error': rms_error,
+        'iterations': iteration
+    }
+
+
+def icp_align(source, target, mode='similarity', mirror=False, scale=1.0, euler_angles=None, offset=None,
+              max_iterations=50, tolerance=1.0E-6, sample_count=5000, trim_fraction=0.0, seed=0):
+    """
+    Iterative closest point alignment of source points, e.g. scaffold nodes, to target points,
+    e.g. data, with the transform target ~= scale * rotation * (mirror * source) + offset, where
+    mirror negates x.
+
+    :param mode: One of ICP_MODES; 'rigid' keeps the initial scale.
+    :param mirror: True or False, or None to try both and keep the better alignment.
+    :param scale, euler_angles, offset: Initial transform, by default the identity.
+    :param tolerance: Stop when the RMS error decreases by less than this fraction.
+    :param sample_count: Number of randomly chosen target points to align, or None for all.
+    :param trim_fraction: Fraction of the most distant correspondences to ignore as outliers.
+    :return: dict of 'scale', 'rotation' matrix, 'euler_angles', 'offset', 'mirror', final
+    'rms_error' and 'iterations'.
+    """
+    if mode not in ICP_MODES:
+        raise ValueError('Unknown ICP mode: ' + str(mode))
+    source = np.asarray(source, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64)
+    if sample_count and (len(target) > sample_count):
+        target = target[np.random.RandomState(seed).choice(len(target), sample_count, replace=False)]
+    rotation = euler_angles_to_rotation_matrix(euler_angles) if euler_angles is not None else np.identity(3)
+    offset = np.asarray(offset, dtype=np.float64) if offset is not None else np.zeros(3)
+    best = None
+    for mirror_option in ((False, True) if mirror is None else (mirror,)):
+        result = _icp(source, target, mode, mirror_option, scale, rotation, offset, max_iterations, tolerance,
+                      trim_fraction)
+        if (best is None) or (result['rms_error'] < best['rms_error']):
+            best = result
+    return best
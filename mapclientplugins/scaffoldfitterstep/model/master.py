@@ -1,18 +1,29 @@
-from opencmiss.zinc.context import Context
-
+from .checkpoint import DEFAULT_CHECKPOINT_INTERVAL
+from .graphicsmanager import DEFAULT_DISPLAY_POINT_BUDGET
+from .profiler import profiled
 from .scaffoldfittermodel import ScaffoldFitterModel
+from .sharedcontext import get_shared_context
 
 
 class MasterModel(object):
 
+    @profiled('MasterModel.__init__')
     def __init__(self, context):
 
-        self._context = Context(context)
+        self._context = get_shared_context(context)
         self._scaffoldFitterModel = ScaffoldFitterModel(self._context)
 
+    def done(self):
+        self._scaffoldFitterModel.done()
+
     def auto_align_model_on_data(self):
         self._scaffoldFitterModel.auto_align_model_on_data()
 
+    def icp_align_model_on_data(self, mode='similarity', mirror='current', max_iterations=50, tolerance=1.0E-6,
+                                sample_count=5000, trim_fraction=0.0):
+        return self._scaffoldFitterModel.icp_align_model_on_data(mode, mirror, max_iterations, tolerance,
+                                                                 sample_count, trim_fraction)
+
     def get_context(self):
         return self._context
 
@@ -28,6 +39,9 @@ class MasterModel(object):
     def get_scene(self):
         return self._scaffoldFitterModel.get_scene()
 
+    def get_load_timings(self):
+        return self._scaffoldFitterModel.get_load_timings()
+
     def get_material_module(self):
         return self._scaffoldFitterModel.get_material_module()
 
@@ -43,11 +57,47 @@ class MasterModel(object):
     def get_align_euler_angles(self):
         return self._scaffoldFitterModel.get_align_euler_angles()
 
-    def initialise(self, point_cloud, scaffold_path):
-        self._scaffoldFitterModel.initialise(point_cloud, scaffold_path)
+    def get_align_settings(self):
+        return self._scaffoldFitterModel.get_align_settings()
+
+    def set_initial_geometry(self, filename, field_name=None):
+        self._scaffoldFitterModel.set_initial_geometry(filename, field_name)
+
+    def initialise(self, point_cloud, scaffold):
+        self._scaffoldFitterModel.initialise(point_cloud, scaffold)
 
     def is_align_mirror(self):
-        self._scaffoldFitterModel.is_align_mirror()
+        return self._scaffoldFitterModel.is_align_mirror()
+
+    def set_point_cloud_chunk_size(self, chunk_size):
+        self._scaffoldFitterModel.set_point_cloud_chunk_size(chunk_size)
+
+    def set_point_cloud_progress_callback(self, progress_callback):
+        self._scaffoldFitterModel.set_point_cloud_progress_callback(progress_callback)
+
+    def set_sidecar_cache(self, enabled, cache_dir=None):
+        self._scaffoldFitterModel.set_sidecar_cache(enabled, cache_dir)
+
+    def get_data_projection_errors(self, full_cloud=False):
+        return self._scaffoldFitterModel.get_data_projection_errors(full_cloud)
+
+    def get_data_point_counts(self):
+        return self._scaffoldFitterModel.get_data_point_counts()
+
+    def set_downsample_settings(self, mode, voxel_size=None, target_count=None):
+        self._scaffoldFitterModel.set_downsample_settings(mode, voxel_size, target_count)
+
+    def set_display_settings(self, mode='stratified', point_budget=DEFAULT_DISPLAY_POINT_BUDGET):
+        self._scaffoldFitterModel.set_display_settings(mode, point_budget)
+
+    def set_display_full_resolution(self, full_resolution):
+        self._scaffoldFitterModel.set_display_full_resolution(full_resolution)
+
+    def get_projection_methods(self):
+        return self._scaffoldFitterModel.get_projection_methods()
+
+    def set_projection_method(self, method):
+        self._scaffoldFitterModel.set_projection_method(method)
 
     def set_align_settings_change_callback(self, align_settings_change_callback):
         self._scaffoldFitterModel.set_align_settings_change_callback(align_settings_change_callback)
@@ -64,11 +114,70 @@ class MasterModel(object):
     def show_surface_translucent(self, show):
         self._scaffoldFitterModel.set_visibility('display_surfaces_translucent', show)
 
+    def set_view_size(self, viewport_pixels, view_extent):
+        self._scaffoldFitterModel.set_view_size(viewport_pixels, view_extent)
+
+    def set_view_interacting(self, interacting):
+        self._scaffoldFitterModel.set_view_interacting(interacting)
+
+    def release_hidden_graphics(self):
+        self._scaffoldFitterModel.release_hidden_graphics()
+
     def perturb_lines(self):
         self._scaffoldFitterModel.perturb_lines()
 
     def project_data(self):
         self._scaffoldFitterModel.project_data()
 
-    def fit_scaffold(self):
-        self._scaffoldFitterModel.fit_data()
+    def clear_projections(self):
+        self._scaffoldFitterModel.clear_projections()
+
+    def get_projection_report(self):
+        return self._scaffoldFitterModel.get_projection_report()
+
+    def set_projection_workers(self, workers_count, measure_speedup=False):
+        self._scaffoldFitterModel.set_projection_workers(workers_count, measure_speedup)
+
+    def set_incremental_projection(self, incremental):
+        self._scaffoldFitterModel.set_incremental_projection(incremental)
+
+    def get_fit_settings(self):
+        return self._scaffoldFitterModel.get_fit_settings()
+
+    def is_fitted(self):
+        return self._scaffoldFitterModel.is_fitted()
+
+    def set_fit_settings(self, strain_penalty=None, edge_discontinuity_penalty=None, max_iterations=None,
+                         schedule=None):
+        self._scaffoldFitterModel.set_fit_settings(strain_penalty, edge_discontinuity_penalty, max_iterations,
+                                                   schedule)
+
+    def get_fit_telemetry(self):
+        return self._scaffoldFitterModel.get_fit_telemetry()
+
+    def set_fit_telemetry(self, enabled, telemetry_callback=None):
+        self._scaffoldFitterModel.set_fit_telemetry(enabled, telemetry_callback)
+
+    def set_checkpoint(self, filename, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self._scaffoldFitterModel.set_checkpoint(filename, interval)
+
+    def get_checkpoint_filename(self):
+        return self._scaffoldFitterModel.get_checkpoint_filename()
+
+    def write_checkpoint(self, filename, iteration):
+        self._scaffoldFitterModel.write_checkpoint(filename, iteration)
+
+    def resume_from_checkpoint(self, filename):
+        return self._scaffoldFitterModel.resume_from_checkpoint(filename)
+
+    def fit_scaffold(self, iteration_callback=None, update_graphics=True):
+        self._scaffoldFitterModel.fit_data(iteration_callback, update_graphics)
+
+    def update_post_fit_graphics(self):
+        self._scaffoldFitterModel.update_post_fit_graphics()
+
+    def write_model(self, filename):
+        self._scaffoldFitterModel.write_model(filename)
+
+    def export_model(self, filename, reference_coordinates=False, projections=False, compress=False):
+        return self._scaffoldFitterModel.export_model(filename, reference_coordinates, projections, compress)
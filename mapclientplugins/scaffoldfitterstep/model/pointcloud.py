@@ -0,0 +1,176 @@
+import os
+
+import numpy as np
+
+from opencmiss.zinc.field import Field
+from opencmiss.zinc.status import OK as ZINC_OK
+
+from .pointcloudfile import ARRAY_READERS, DEFAULT_CHUNK_SIZE, check_coordinates, iterate_exdata_chunks, \
+    read_exdata_header
+from .sidecar import PointCloudSidecar
+
+
+class DatapointWriter(object):
+    """
+    Creates datapoints with a coordinate field in bulk, one change block per chunk.
+    """
+
+    def __init__(self, region, field_name='data_coordinates', components_count=3):
+        self._fm = region.getFieldmodule()
+        self._fm.beginChange()
+        self._field = self._fm.findFieldByName(field_name).castFiniteElement()
+        if not self._field.isValid():
+            self._field = self._fm.createFieldFiniteElement(components_count)
+            self._field.setName(field_name)
+            self._field.setTypeCoordinate(True)
+            self._field.setCoordinateSystemType(Field.COORDINATE_SYSTEM_TYPE_RECTANGULAR_CARTESIAN)
+            self._field.setManaged(True)
+            for c, component_name in enumerate(['x', 'y', 'z'][:components_count]):
+                self._field.setComponentName(c + 1, component_name)
+        self._components_count = self._field.getNumberOfComponents()
+        self._datapoints = self._fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
+        self._template = self._datapoints.createNodetemplate()
+        self._template.defineField(self._field)
+        self._cache = self._fm.createFieldcache()
+        self._fm.endChange()
+        self._count = 0
+
+    def get_field(self):
+        return self._field
+
+    def get_count(self):
+        return self._count
+
+    def write(self, coordinates, identifiers=None):
+        """
+        Create a datapoint for each coordinate.
+
+        :param coordinates: Sequence of coordinates, each with components_count values.
+        :param identifiers: Optional sequence of datapoint identifiers, otherwise the next free
+        identifiers are used.
+        """
+        if isinstance(coordinates, np.ndarray):
+            coordinates = coordinates.astype(np.float64).tolist()
+        if isinstance(identifiers, np.ndarray):
+            identifiers = identifiers.tolist()
+        self._fm.beginChange()
+        for index, values in enumerate(coordinates):
+            identifier = -1 if identifiers is None else int(identifiers[index])
+            node = self._datapoints.createNode(identifier, self._template)
+            if not node.isValid():
+                self._fm.endChange()
+                raise ValueError('Failed to create datapoint {0}'.format(identifier))
+            self._cache.setNode(node)
+            self._field.assignReal(self._cache, values)
+        self._fm.endChange()
+        self._count += len(coordinates)
+
+
+def get_nodeset_coordinates(field, nodeset):
+    """
+    :return: identifiers (N,) and values (N, components) of field at the nodes in nodeset where
+    it is defined.
+    """
+    fm = field.getFieldmodule()
+    cache = fm.createFieldcache()
+    components_count = field.getNumberOfComponents()
+    identifiers = []
+    coordinates = []
+    iterator = nodeset.createNodeiterator()
+    node = iterator.next()
+    while node.isValid():
+        cache.setNode(node)
+        result, values = field.evaluateReal(cache, components_count)
+        if result == ZINC_OK:
+            identifiers.append(node.getIdentifier())
+            coordinates.append(values)
+        node = iterator.next()
+    return np.array(identifiers, dtype=np.int64), np.array(coordinates, dtype=np.float64).reshape(-1, components_count)
+
+
+def write_point_cloud_array(region, coordinates, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None,
+                            field_name='data_coordinates', identifiers=None):
+    """
+    Create datapoints in region directly from an (N, components) array-like of coordinates,
+    slicing it in chunks of chunk_size so memory-mapped arrays are never fully loaded.
+
+    :param identifiers: Optional (N,) array of datapoint identifiers.
+    :return: Number of datapoints created.
+    """
+    count = len(coordinates)
+    writer = DatapointWriter(region, field_name, coordinates.shape[1])
+    for start in range(0, count, chunk_size):
+        end = min(start + chunk_size, count)
+        writer.write(np.asarray(coordinates[start:end]),
+                     None if identifiers is None else np.asarray(identifiers[start:end]))
+        if progress_callback is not None:
+            progress_callback(end, end / count)
+    return writer.get_count()
+
+
+def read_point_cloud(region, point_cloud, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None,
+                     sidecar_cache=False, cache_dir=None):
+    """
+    Stream the point cloud into datapoints of region in chunks of chunk_size datapoints, so
+    memory used for reading does not grow with the file size.
+    Binary point clouds (.npy, binary .ply, raw .f32/.raw float32 or .f64 float64 xyz) and arrays
+    are written straight to datapoints. EX data is parsed in chunks, falling back to reading the
+    whole file with Zinc if it is not a plain coordinate point cloud.
+
+    :param point_cloud: file_location of the point cloud, or an (N, components) array.
+    :param progress_callback: Optional callable(datapoints_count, fraction_complete).
+    :param sidecar_cache: If True, EX data parsed once is cached in a binary sidecar which
+    later reads of the unchanged file memory-map instead.
+    :param cache_dir: Directory for sidecars, otherwise they are written next to the file.
+    :return: Number of datapoints read.
+    """
+    if isinstance(point_cloud, np.ndarray):
+        return write_point_cloud_array(region, check_coordinates(point_cloud, 'array'), chunk_size,
+                                       progress_callback)
+    reader = ARRAY_READERS.get(os.path.splitext(point_cloud)[1].lower())
+    if reader is not None:
+        return write_point_cloud_array(region, reader(point_cloud), chunk_size, progress_callback)
+
+    filename = point_cloud
+    sidecar = PointCloudSidecar(filename, cache_dir) if sidecar_cache else None
+    if (sidecar is not None) and sidecar.is_valid():
+        field_name, identifiers, coordinates = sidecar.load()
+        return write_point_cloud_array(region, coordinates, chunk_size, progress_callback, field_name, identifiers)
+
+    try:
+        field_name, components_count = read_exdata_header(filename)
+    except ValueError:
+        return _read_point_cloud_zinc(region, filename)
+
+    writer = DatapointWriter(region, field_name, components_count)
+    file_size = max(os.path.getsize(filename), 1)
+    if sidecar is not None:
+        try:
+            sidecar.begin_write(field_name, components_count)
+        except (IOError, OSError):
+            sidecar = None  # e.g. read-only data directory; read without caching
+    try:
+        for identifiers, coordinates, bytes_read in iterate_exdata_chunks(filename, components_count, chunk_size):
+            writer.write(coordinates, identifiers)
+            if sidecar is not None:
+                sidecar.append(identifiers, coordinates)
+            if progress_callback is not None:
+                progress_callback(writer.get_count(), min(bytes_read / file_size, 1.0))
+    except Exception:
+        if sidecar is not None:
+            sidecar.abort_write()
+        raise
+    if sidecar is not None:
+        sidecar.end_write()
+    return writer.get_count()
+
+
+def _read_point_cloud_zinc(region, filename):
+    sir = region.createStreaminformationRegion()
+    point_cloud_resource = sir.createStreamresourceFile(filename)
+    sir.setResourceDomainTypes(point_cloud_resource, Field.DOMAIN_TYPE_DATAPOINTS)
+    result = region.read(sir)
+    if result != ZINC_OK:
+        raise ValueError('Failed to read point cloud')
+    datapoints = region.getFieldmodule().findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
+    return datapoints.getSize()
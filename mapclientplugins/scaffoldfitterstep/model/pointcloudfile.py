@@ -0,0 +1,177 @@
+import os
+import re
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 100000
+
+_FIELD_HEADER = re.compile(r'^\s*\d+\)\s*([^,]+),\s*(\w+),\s*([^,]+),.*#Components\s*=\s*(\d+)', re.IGNORECASE)
+_NODE_HEADER = re.compile(r'^\s*Node:\s*(\d+)', re.IGNORECASE)
+_FIELDS_COUNT = re.compile(r'#Fields\s*=\s*(\d+)', re.IGNORECASE)
+_DERIVATIVES = re.compile(r'#Derivatives\s*=\s*([1-9])|#Values\s*=\s*([2-9])', re.IGNORECASE)
+
+_PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'
+}
+_PLY_FORMATS = {'binary_little_endian': '<', 'binary_big_endian': '>'}
+
+
+def read_exdata_header(filename):
+    """
+    Read the field header of a point cloud EX data file.
+
+    :return: (field name, components count) of its single, value-only coordinate field.
+    :raises ValueError: if the file is not a single coordinate field point cloud.
+    """
+    fields_count = None
+    header = None
+    with open(filename, 'r') as stream:
+        for line in stream:
+            if _NODE_HEADER.match(line):
+                break
+            match = _FIELDS_COUNT.search(line)
+            if match:
+                fields_count = int(match.group(1))
+                continue
+            match = _FIELD_HEADER.match(line)
+            if match:
+                header = (match.group(1).strip(), int(match.group(4)))
+                continue
+            if _DERIVATIVES.search(line):
+                raise ValueError('Point cloud field has derivatives or versions: ' + filename)
+    if (fields_count != 1) or (header is None):
+        raise ValueError('Point cloud must have a single coordinate field: ' + filename)
+    return header
+
+
+def iterate_exdata_chunks(filename, components_count, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Parse the datapoints of a single field EX data file without loading it all into memory.
+
+    :return: Generator of (identifiers, coordinates, bytes read) for at most chunk_size datapoints.
+    """
+    identifiers = []
+    coordinates = []
+    identifier = None
+    values = []
+    bytes_read = 0
+    # read bytes so progress is measured against the file size, not in characters
+    with open(filename, 'rb') as stream:
+        for raw_line in stream:
+            bytes_read += len(raw_line)
+            line = raw_line.decode('utf-8')
+            match = _NODE_HEADER.match(line)
+            if match:
+                identifier = int(match.group(1))
+                values = []
+                continue
+            if identifier is None:
+                continue
+            for token in line.split():
+                values.append(float(token))
+            if len(values) >= components_count:
+                identifiers.append(identifier)
+                coordinates.append(values[:components_count])
+                identifier = None
+                if len(identifiers) == chunk_size:
+                    yield identifiers, coordinates, bytes_read
+                    identifiers = []
+                    coordinates = []
+    if identifiers:
+        yield identifiers, coordinates, bytes_read
+
+
+def open_npy(filename):
+    """
+    :return: Memory-mapped (N, components) array of the point cloud in a .npy file.
+    """
+    return check_coordinates(np.load(filename, mmap_mode='r'), filename)
+
+
+def open_raw(filename, dtype, components_count=3):
+    """
+    :return: Memory-mapped (N, components_count) array of a headerless buffer of interleaved
+    coordinates of type dtype.
+    """
+    itemsize = np.dtype(dtype).itemsize * components_count
+    count = os.path.getsize(filename) // itemsize
+    if count * itemsize != os.path.getsize(filename):
+        raise ValueError('Raw point cloud size is not a multiple of {0} bytes: {1}'.format(itemsize, filename))
+    return np.memmap(filename, dtype=dtype, mode='r', shape=(count, components_count))
+
+
+def open_ply(filename):
+    """
+    :return: (N, 3) view of the x, y, z properties of the vertices in a binary PLY file,
+    memory-mapped so only the chunks being read are loaded.
+    """
+    with open(filename, 'rb') as stream:
+        if stream.readline().strip() != b'ply':
+            raise ValueError('Not a PLY file: ' + filename)
+        byte_order = None
+        elements = []
+        while True:
+            line = stream.readline()
+            if not line:
+                raise ValueError('PLY header has no end_header: ' + filename)
+            words = line.decode('ascii').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'end_header':
+                break
+            if words[0] == 'format':
+                if words[1] not in _PLY_FORMATS:
+                    raise ValueError('Only binary PLY is supported: ' + filename)
+                byte_order = _PLY_FORMATS[words[1]]
+            elif words[0] == 'element':
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == 'property':
+                if words[1] == 'list':
+                    elements[-1][2].append(None)
+                else:
+                    elements[-1][2].append((words[2], _PLY_TYPES[words[1]]))
+        offset = stream.tell()
+    for name, count, properties in elements:
+        if None in properties:
+            raise ValueError('PLY list properties before the vertices are not supported: ' + filename)
+        dtype = np.dtype([(property_name, byte_order + type_code) for property_name, type_code in properties])
+        if name == 'vertex':
+            vertices = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(count,))
+            return _PlyCoordinates(vertices)
+        offset += dtype.itemsize * count
+    raise ValueError('PLY file has no vertex element: ' + filename)
+
+
+class _PlyCoordinates(object):
+    """
+    Array-like (N, 3) view of PLY vertex coordinates, converted to float one slice at a time.
+    """
+
+    def __init__(self, vertices):
+        self._vertices = vertices
+        self.shape = (vertices.shape[0], 3)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        vertices = self._vertices[index]
+        return np.stack([vertices['x'], vertices['y'], vertices['z']], axis=-1)
+
+
+def check_coordinates(array, filename):
+    if (array.ndim != 2) or not (1 <= array.shape[1] <= 3):
+        raise ValueError('Point cloud array must have shape (N, 1-3): ' + filename)
+    return array
+
+
+ARRAY_READERS = {
+    '.npy': open_npy,
+    '.ply': open_ply,
+    '.f32': lambda filename: open_raw(filename, np.float32),
+    '.raw': lambda filename: open_raw(filename, np.float32),
+    '.f64': lambda filename: open_raw(filename, np.float64),
+}
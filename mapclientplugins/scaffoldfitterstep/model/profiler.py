@@ -0,0 +1,119 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+def get_peak_rss():
+    """
+    :return: Peak resident set size of this process in bytes, or None if unavailable.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+class Profiler(object):
+    """
+    Records named spans of wall time, CPU time and peak RSS, written as a Chrome trace
+    (chrome://tracing or Perfetto). Spans are not recorded unless enabled.
+    """
+
+    def __init__(self):
+        self._enabled = False
+        self._events = []
+        self._origin = time.perf_counter()
+
+    def is_enabled(self):
+        return self._enabled
+
+    def set_enabled(self, enabled):
+        self._enabled = enabled
+
+    def clear(self):
+        self._events = []
+        self._origin = time.perf_counter()
+
+    def get_events(self):
+        return self._events
+
+    def span(self, name):
+        """
+        :return: Context manager recording a span called name while profiling is enabled.
+        """
+        return _Span(self, name)
+
+    def add_span(self, name, start_time, wall_time, cpu_time, peak_rss):
+        self._events.append({
+            'name': name,
+            'ph': 'X',
+            'ts': (start_time - self._origin) * 1.0E6,
+            'dur': wall_time * 1.0E6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': {
+                'wall_time': wall_time,
+                'cpu_time': cpu_time,
+                'peak_rss': peak_rss
+            }
+        })
+
+    def write_trace(self, filename):
+        with open(filename, 'w') as stream:
+            json.dump({'traceEvents': self._events, 'displayTimeUnit': 'ms'}, stream, indent=1)
+
+
+class _Span(object):
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+        self._start_time = None
+        self._start_cpu_time = None
+
+    def __enter__(self):
+        if self._profiler.is_enabled():
+            self._start_cpu_time = time.thread_time()
+            self._start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._start_time is not None:
+            wall_time = time.perf_counter() - self._start_time
+            cpu_time = time.thread_time() - self._start_cpu_time
+            self._profiler.add_span(self._name, self._start_time, wall_time, cpu_time, get_peak_rss())
+            self._start_time = None
+        return False
+
+
+_profiler = Profiler()
+
+
+def get_profiler():
+    """
+    :return: The Profiler shared by the step, models and headless runners.
+    """
+    return _profiler
+
+
+def profiled(name):
+    """
+    Decorator recording each call of the function as a span called name.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _profiler.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,487 @@
+import itertools
+import multiprocessing
+import time
+
+import numpy as np
+
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.field import Field, FieldFindMeshLocation
+from opencmiss.zinc.status import OK as ZINC_OK
+
+PROJECTION_METHODS = ('fitter', 'bvh')
+
+# fraction of each element's sampled extent added to its bounding box to contain curved edges
+BOUNDING_BOX_PADDING = 0.1
+# projection runs in model task threads, and forking a threaded process can copy locks held by
+# other threads into the workers, so they are started fresh instead
+WORKER_START_METHOD = 'spawn'
+
+
+class ElementBoundingVolumeHierarchy(object):
+    """
+    Binary tree of axis-aligned element bounding boxes, split at the median element centre along
+    the longest axis. Queries are vectorised over many points.
+    """
+
+    def __init__(self, minimums, maximums, leaf_size=4):
+        """
+        :param minimums, maximums: (E, components) arrays of element bounding box corners.
+        """
+        self._minimums = np.asarray(minimums, dtype=np.float64)
+        self._maximums = np.asarray(maximums, dtype=np.float64)
+        self._leaf_size = leaf_size
+        self._order = np.arange(len(self._minimums))
+        self._node_minimums = []
+        self._node_maximums = []
+        self._node_children = []
+        self._node_ranges = []
+        if len(self._order) > 0:
+            self._build(0, len(self._order))
+        self._node_minimums = np.array(self._node_minimums)
+        self._node_maximums = np.array(self._node_maximums)
+
+    def _build(self, start, end):
+        node = len(self._node_ranges)
+        elements = self._order[start:end]
+        self._node_minimums.append(self._minimums[elements].min(axis=0))
+        self._node_maximums.append(self._maximums[elements].max(axis=0))
+        self._node_ranges.append((start, end))
+        self._node_children.append(None)
+        if end - start > self._leaf_size:
+            centres = 0.5 * (self._minimums[elements] + self._maximums[elements])
+            axis = int(np.argmax(self._node_maximums[node] - self._node_minimums[node]))
+            self._order[start:end] = elements[np.argsort(centres[:, axis], kind='mergesort')]
+            middle = (start + end) // 2
+            left = self._build(start, middle)
+            right = self._build(middle, end)
+            self._node_children[node] = (left, right)
+        return node
+
+    def get_size(self):
+        return len(self._minimums)
+
+    def get_bounding_box(self, index):
+        return self._minimums[index], self._maximums[index]
+
+    @staticmethod
+    def _minimum_distances_squared(points, minimums, maximums):
+        return np.sum(np.maximum(np.maximum(minimums - points, points - maximums), 0.0)**2, axis=-1)
+
+    @staticmethod
+    def _maximum_distances_squared(points, minimums, maximums):
+        return np.sum(np.maximum(np.abs(points - minimums), np.abs(points - maximums))**2, axis=-1)
+
+    def _descend_upper_bounds(self, points):
+        """
+        Greedily descend each point to the leaf with the nearest box centre.
+        :return: (N,) squared distances within which each point is guaranteed an element.
+        """
+        bounds = np.full(len(points), np.inf)
+        stack = [(0, np.arange(len(points)))]
+        while stack:
+            node, indices = stack.pop()
+            children = self._node_children[node]
+            if children is None:
+                start, end = self._node_ranges[node]
+                elements = self._order[start:end]
+                distances = self._maximum_distances_squared(
+                    points[indices, np.newaxis, :], self._minimums[elements], self._maximums[elements])
+                bounds[indices] = np.minimum(bounds[indices], distances.min(axis=1))
+                continue
+            centres = 0.5 * (self._node_minimums[list(children)] + self._node_maximums[list(children)])
+            to_left = np.sum((points[indices] - centres[0])**2, axis=1) <= \
+                np.sum((points[indices] - centres[1])**2, axis=1)
+            stack.append((children[0], indices[to_left]))
+            stack.append((children[1], indices[~to_left]))
+        return bounds
+
+    def nearest_candidates(self, points):
+        """
+        Find the elements which may contain the nearest location to each point: those whose
+        bounding box is no further than the smallest maximum distance to any box.
+
+        :param points: (N, components) array.
+        :return: point indices, element indices: parallel arrays of candidate pairs, sorted by point.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if (len(points) == 0) or (self.get_size() == 0):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        bounds = self._descend_upper_bounds(points)
+        pair_points = []
+        pair_elements = []
+        pair_distances = []
+        stack = [(0, np.arange(len(points)))]
+        while stack:
+            node, indices = stack.pop()
+            inside = self._minimum_distances_squared(
+                points[indices], self._node_minimums[node], self._node_maximums[node]) <= bounds[indices]
+            indices = indices[inside]
+            if len(indices) == 0:
+                continue
+            children = self._node_children[node]
+            if children is not None:
+                stack.append((children[0], indices))
+                stack.append((children[1], indices))
+                continue
+            start, end = self._node_ranges[node]
+            elements = self._order[start:end]
+            local_points = points[indices, np.newaxis, :]
+            maximum_distances = self._maximum_distances_squared(
+                local_points, self._minimums[elements], self._maximums[elements])
+            bounds[indices] = np.minimum(bounds[indices], maximum_distances.min(axis=1))
+            minimum_distances = self._minimum_distances_squared(
+                local_points, self._minimums[elements], self._maximums[elements])
+            pairs = np.nonzero(minimum_distances <= bounds[indices, np.newaxis])
+            pair_points.append(indices[pairs[0]])
+            pair_elements.append(elements[pairs[1]])
+            pair_distances.append(minimum_distances[pairs])
+        point_indices = np.concatenate(pair_points)
+        element_indices = np.concatenate(pair_elements)
+        # bounds tighten during traversal: discard pairs collected before they did
+        keep = np.concatenate(pair_distances) <= bounds[point_indices]
+        point_indices = point_indices[keep]
+        element_indices = element_indices[keep]
+        order = np.lexsort((element_indices, point_indices))
+        return point_indices[order], element_indices[order]
+
+    def overlapping(self, minimum, maximum):
+        """
+        :return: Indices of elements whose bounding boxes intersect the box minimum, maximum.
+        """
+        result = []
+        stack = [0] if self.get_size() > 0 else []
+        while stack:
+            node = stack.pop()
+            if np.any(self._node_minimums[node] > maximum) or np.any(self._node_maximums[node] < minimum):
+                continue
+            children = self._node_children[node]
+            if children is not None:
+                stack.extend(children)
+                continue
+            start, end = self._node_ranges[node]
+            elements = self._order[start:end]
+            inside = np.all((self._minimums[elements] <= maximum) & (self._maximums[elements] >= minimum), axis=1)
+            result.extend(elements[inside].tolist())
+        return np.array(sorted(result), dtype=np.int64)
+
+
+def compute_element_bounding_boxes(coordinate_field, mesh, samples_per_direction=4):
+    """
+    Estimate element bounding boxes by evaluating coordinate_field on a grid of xi in each
+    element, padded by BOUNDING_BOX_PADDING to contain curvature between samples.
+
+    :return: element identifiers (E,), minimums (E, components), maximums (E, components).
+    """
+    fm = coordinate_field.getFieldmodule()
+    cache = fm.createFieldcache()
+    components_count = coordinate_field.getNumberOfComponents()
+    xi_samples = [[x / (samples_per_direction - 1) for x in range(samples_per_direction)]] * mesh.getDimension()
+    xi_grid = [list(xi) for xi in itertools.product(*xi_samples)]
+    identifiers = []
+    minimums = []
+    maximums = []
+    iterator = mesh.createElementiterator()
+    element = iterator.next()
+    while element.isValid():
+        values = []
+        for xi in xi_grid:
+            cache.setMeshLocation(element, xi)
+            result, x = coordinate_field.evaluateReal(cache, components_count)
+            if result == ZINC_OK:
+                values.append(x)
+        if values:
+            values = np.array(values)
+            minimum = values.min(axis=0)
+            maximum = values.max(axis=0)
+            padding = BOUNDING_BOX_PADDING * np.max(maximum - minimum)
+            identifiers.append(element.getIdentifier())
+            minimums.append(minimum - padding)
+            maximums.append(maximum + padding)
+        element = iterator.next()
+    return (np.array(identifiers, dtype=np.int64), np.array(minimums).reshape(-1, components_count),
+            np.array(maximums).reshape(-1, components_count))
+
+
+class MeshProjector(object):
+    """
+    Finds the nearest location on a mesh to arbitrary points, restricting each Zinc
+    find-mesh-location search to the candidate elements pruned with an element bounding volume
+    hierarchy. The hierarchy is built on first use and rebuilt only after coordinate_field changes.
+    """
+
+    def __init__(self, coordinate_field, mesh, use_hierarchy=True):
+        """
+        :param mesh: Mesh or mesh group to project onto.
+        """
+        self._coordinate_field = coordinate_field
+        self._mesh = mesh
+        self._use_hierarchy = use_hierarchy
+        self._fm = coordinate_field.getFieldmodule()
+        self._fm.beginChange()
+        components_count = coordinate_field.getNumberOfComponents()
+        self._point_field = self._fm.createFieldConstant([0.0] * components_count)
+        self._find_mesh_location = self._fm.createFieldFindMeshLocation(self._point_field, coordinate_field, mesh)
+        self._find_mesh_location.setSearchMode(FieldFindMeshLocation.SEARCH_MODE_NEAREST)
+        self._projected_coordinates = self._fm.createFieldEmbedded(coordinate_field, self._find_mesh_location)
+        master_mesh = self._fm.findMeshByDimension(mesh.getDimension())
+        self._search_group = self._fm.createFieldElementGroup(master_mesh).getMeshGroup()
+        self._fm.endChange()
+        self._cache = self._fm.createFieldcache()
+        self._hierarchy = None
+        self._element_identifiers = None
+        self._element_indices = None
+        self._neighbours = {}
+        self._notifier = self._fm.createFieldmodulenotifier()
+        self._notifier.setCallback(self._fieldmodule_change)
+
+    def _fieldmodule_change(self, event):
+        if event.getFieldChangeFlags(self._coordinate_field) & Field.CHANGE_FLAG_RESULT:
+            self._hierarchy = None
+
+    def get_coordinate_field(self):
+        return self._coordinate_field
+
+    def get_mesh_dimension(self):
+        return self._mesh.getDimension()
+
+    def get_bounding_boxes(self):
+        """
+        :return: element identifiers (E,), minimums (E, components), maximums (E, components).
+        """
+        hierarchy = self.get_hierarchy()
+        minimums, maximums = hierarchy.get_bounding_box(slice(None))
+        return self._element_identifiers, minimums, maximums
+
+    def set_bounding_boxes(self, element_identifiers, minimums, maximums):
+        """
+        Build the hierarchy from element bounding boxes computed elsewhere, e.g. by the process
+        sharing the geometry with this one.
+        """
+        self._element_identifiers = element_identifiers
+        self._element_indices = {identifier: index for index, identifier in
+                                 enumerate(self._element_identifiers.tolist())}
+        self._neighbours = {}
+        self._hierarchy = ElementBoundingVolumeHierarchy(minimums, maximums)
+
+    def get_hierarchy(self):
+        if self._hierarchy is None:
+            self.set_bounding_boxes(*compute_element_bounding_boxes(self._coordinate_field, self._mesh))
+        return self._hierarchy
+
+    def _get_neighbours(self, element_index):
+        """
+        :return: Tuple of indices of the element and the elements whose bounding boxes touch it.
+        """
+        neighbours = self._neighbours.get(element_index)
+        if neighbours is None:
+            neighbours = tuple(self._hierarchy.overlapping(*self._hierarchy.get_bounding_box(element_index)).tolist())
+            self._neighbours[element_index] = neighbours
+        return neighbours
+
+    def _set_search_elements(self, element_indices):
+        mesh = self._search_group.getMasterMesh()
+        self._search_group.removeAllElements()
+        for identifier in self._element_identifiers[element_indices].tolist():
+            self._search_group.addElement(mesh.findElementByIdentifier(identifier))
+        self._find_mesh_location.setSearchMesh(self._search_group)
+
+    def _evaluate(self, point):
+        """
+        :return: element identifier or -1, xi, distance.
+        """
+        self._cache.setFieldReal(self._point_field, point)
+        element, xi = self._find_mesh_location.evaluateMeshLocation(self._cache, self._mesh.getDimension())
+        if not element.isValid():
+            return -1, None, np.inf
+        result, x = self._projected_coordinates.evaluateReal(self._cache, len(point))
+        distance = np.sqrt(np.sum((np.array(x) - point)**2)) if result == ZINC_OK else np.inf
+        if not isinstance(xi, list):
+            xi = [xi]
+        return element.getIdentifier(), xi, distance
+
+    def _project_groups(self, points, groups, results):
+        """
+        Project points restricting the search to each group's elements.
+
+        :param groups: dict of tuple of element indices -> list of indices into points.
+        :param results: element identifiers, xi, distances arrays to fill in for the projected points.
+        """
+        element_identifiers, xis, distances = results
+        for elements, indices in groups.items():
+            self._set_search_elements(list(elements))
+            for index in indices:
+                identifier, xi, distance = self._evaluate(points[index].tolist())
+                if identifier >= 0:
+                    element_identifiers[index], xis[index], distances[index] = identifier, xi, distance
+        self._find_mesh_location.setSearchMesh(self._mesh)
+
+    def _candidate_groups(self, points, indices):
+        """
+        Group points with identical candidate element sets to reuse the search group.
+        """
+        groups = {}
+        point_indices, element_indices = self.get_hierarchy().nearest_candidates(points[indices])
+        if len(point_indices) == 0:
+            return groups
+        boundaries = np.flatnonzero(np.diff(point_indices)) + 1
+        for point_index, elements in zip(point_indices[np.r_[0, boundaries]].tolist(),
+                                         np.split(element_indices, boundaries)):
+            groups.setdefault(tuple(elements.tolist()), []).append(int(indices[point_index]))
+        return groups
+
+    def _local_groups(self, previous_element_identifiers, indices):
+        """
+        Group points by the neighbourhood of the element they were last projected onto.
+
+        :return: groups dict, indices of points whose previous element is no longer in the mesh.
+        """
+        self.get_hierarchy()
+        groups = {}
+        missing = []
+        for index, identifier in zip(indices.tolist(), previous_element_identifiers[indices].tolist()):
+            element_index = self._element_indices.get(identifier)
+            if element_index is None:
+                missing.append(index)
+            else:
+                groups.setdefault(self._get_neighbours(element_index), []).append(index)
+        return groups, np.array(missing, dtype=np.int64)
+
+    def project(self, points, previous_element_identifiers=None, previous_distances=None):
+        """
+        :param points: (N, components) array.
+        :param previous_element_identifiers: Optional (N,) identifiers of the elements the points
+        were last projected onto, or -1. With previous_distances, points are first searched for in
+        their previous element and its neighbours, and only searched for over the whole mesh if
+        they are further from it than before.
+        :param previous_distances: Optional (N,) distances of the previous projections.
+        :return: element identifiers (N,) with -1 where not found, xi (N, dimension), distances (N,).
+        """
+        points = np.asarray(points, dtype=np.float64)
+        count = len(points)
+        results = (np.full(count, -1, dtype=np.int64), np.zeros((count, self._mesh.getDimension())),
+                   np.full(count, np.inf))
+        self._fm.beginChange()
+        if not self._use_hierarchy:
+            self._find_mesh_location.setSearchMesh(self._mesh)
+            element_identifiers, xis, distances = results
+            for index, point in enumerate(points.tolist()):
+                identifier, xi, distance = self._evaluate(point)
+                if identifier >= 0:
+                    element_identifiers[index], xis[index], distances[index] = identifier, xi, distance
+        else:
+            global_indices = np.arange(count)
+            if (previous_element_identifiers is not None) and (previous_distances is not None):
+                local_indices = np.flatnonzero(previous_element_identifiers >= 0)
+                groups, missing = self._local_groups(previous_element_identifiers, local_indices)
+                self._project_groups(points, groups, results)
+                worse = results[2][local_indices] > previous_distances[local_indices]
+                global_indices = np.union1d(np.flatnonzero(previous_element_identifiers < 0),
+                                            np.union1d(local_indices[worse], missing))
+            self._project_groups(points, self._candidate_groups(points, global_indices), results)
+        self._fm.endChange()
+        return results
+
+
+def serialise_geometry(coordinate_field):
+    """
+    :return: EX format bytes of the nodes, elements and finite element coordinate_field only.
+    """
+    region = coordinate_field.getFieldmodule().getRegion()
+    sir = region.createStreaminformationRegion()
+    memory_resource = sir.createStreamresourceMemory()
+    sir.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_NODES | Field.DOMAIN_TYPE_MESH1D |
+                               Field.DOMAIN_TYPE_MESH2D | Field.DOMAIN_TYPE_MESH3D)
+    sir.setFieldNames([coordinate_field.getName()])
+    result = region.write(sir)
+    if result != ZINC_OK:
+        raise ValueError('Failed to serialise geometry')
+    result, buffer = memory_resource.getBuffer()
+    return buffer
+
+
+# context and projector of each pool worker process, created by _initialise_worker
+_worker_context = None
+_worker_projector = None
+
+
+def _initialise_worker(geometry, field_name, dimension, element_identifiers, minimums, maximums):
+    global _worker_context, _worker_projector
+    _worker_context = Context('projection_worker')
+    region = _worker_context.getDefaultRegion()
+    sir = region.createStreaminformationRegion()
+    sir.createStreamresourceMemoryBuffer(geometry)
+    if region.read(sir) != ZINC_OK:
+        raise ValueError('Failed to read geometry in projection worker')
+    fm = region.getFieldmodule()
+    fm.beginChange()
+    mesh_group = fm.createFieldElementGroup(fm.findMeshByDimension(dimension)).getMeshGroup()
+    mesh = fm.findMeshByDimension(dimension)
+    for identifier in element_identifiers.tolist():
+        mesh_group.addElement(mesh.findElementByIdentifier(identifier))
+    fm.endChange()
+    _worker_projector = MeshProjector(fm.findFieldByName(field_name), mesh_group)
+    _worker_projector.set_bounding_boxes(element_identifiers, minimums, maximums)
+
+
+def _project_chunk(arguments):
+    return _worker_projector.project(*arguments)
+
+
+class ParallelMeshProjector(object):
+    """
+    Projects points with a pool of worker processes, each reading its own copy of the geometry of
+    a serial MeshProjector and projecting one chunk of the points at a time. Workers are started
+    with WORKER_START_METHOD, so it is safe to project from any thread.
+    """
+
+    def __init__(self, projector, workers_count, chunks_per_worker=4):
+        self._projector = projector
+        self._workers_count = workers_count
+        self._chunks_per_worker = chunks_per_worker
+        self._report = {}
+
+    def get_report(self):
+        """
+        :return: dict with 'workers', 'points', 'parallel_time' and, if measured, 'serial_time'
+        and 'speedup'.
+        """
+        return self._report
+
+    def project(self, points, previous_element_identifiers=None, previous_distances=None, measure_speedup=False):
+        """
+        Parameters and results as for MeshProjector.project.
+
+        :param measure_speedup: If True, also time the serial projection for the report.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        start_time = time.perf_counter()
+        coordinate_field = self._projector.get_coordinate_field()
+        element_identifiers, minimums, maximums = self._projector.get_bounding_boxes()
+        initialise_arguments = (serialise_geometry(coordinate_field), coordinate_field.getName(),
+                                self._projector.get_mesh_dimension(), element_identifiers, minimums, maximums)
+        chunks_count = max(1, min(len(points), self._workers_count * self._chunks_per_worker))
+        chunks = []
+        for indices in np.array_split(np.arange(len(points)), chunks_count):
+            if previous_element_identifiers is None:
+                chunks.append((points[indices], None, None))
+            else:
+                chunks.append((points[indices], previous_element_identifiers[indices], previous_distances[indices]))
+        pool = multiprocessing.get_context(WORKER_START_METHOD).Pool(
+            self._workers_count, _initialise_worker, initialise_arguments)
+        try:
+            chunk_results = pool.map(_project_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+        results = tuple(np.concatenate([chunk_result[i] for chunk_result in chunk_results]) for i in range(3))
+        self._report = {
+            'workers': self._workers_count,
+            'points': len(points),
+            'parallel_time': time.perf_counter() - start_time
+        }
+        if measure_speedup:
+            start_time = time.perf_counter()
+            self._projector.project(points, previous_element_identifiers, previous_distances)
+            self._report['serial_time'] = time.perf_counter() - start_time
+            self._report['speedup'] = self._report['serial_time'] / self._report['parallel_time']
+        return results
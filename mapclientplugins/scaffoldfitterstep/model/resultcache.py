@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .sidecar import compute_file_hash
+
+DEFAULT_MAX_SIZE = 1 << 30
+RESULT_EXTENSION = '.exf'
+RESULT_EXTENSIONS = (RESULT_EXTENSION, RESULT_EXTENSION + '.gz')
+RESULT_CACHE_VERSION = 1
+
+
+def _update_hash_with_point_cloud(inputs_hash, point_cloud):
+    if isinstance(point_cloud, np.ndarray):
+        inputs_hash.update(np.ascontiguousarray(point_cloud, dtype=np.float64).tobytes())
+    else:
+        inputs_hash.update(compute_file_hash(point_cloud).encode('utf-8'))
+
+
+def _update_hash_with_scaffold(inputs_hash, scaffold):
+    if isinstance(scaffold, dict):
+        for key in sorted(scaffold):
+            value = scaffold[key]
+            inputs_hash.update(key.encode('utf-8'))
+            inputs_hash.update(value if isinstance(value, bytes) else str(value).encode('utf-8'))
+    else:
+        inputs_hash.update(compute_file_hash(scaffold).encode('utf-8'))
+
+
+def compute_inputs_hash(point_cloud, scaffold, align_settings, fit_settings, initial_geometry=None,
+                        export_settings=None):
+    """
+    Hash the content of everything determining a fitted scaffold.
+
+    :param point_cloud: file_location of the point cloud.
+    :param scaffold: file_location of the scaffold or a scaffold description dict of EX memory buffers.
+    :param align_settings: dict of the align transform, e.g. from MasterModel.get_align_settings().
+    :param fit_settings: dict from MasterModel.get_fit_settings().
+    :param initial_geometry: Optional file_location of the fitted scaffold fitting started from.
+    :param export_settings: Optional dict of the options the result is written with.
+    :return: Hexadecimal digest.
+    """
+    inputs_hash = hashlib.sha1()
+    inputs_hash.update(str(RESULT_CACHE_VERSION).encode('utf-8'))
+    _update_hash_with_point_cloud(inputs_hash, point_cloud)
+    _update_hash_with_scaffold(inputs_hash, scaffold)
+    if initial_geometry:
+        inputs_hash.update(compute_file_hash(initial_geometry).encode('utf-8'))
+    settings = {'align': align_settings, 'fit': fit_settings}
+    if export_settings:
+        settings['export'] = export_settings
+    inputs_hash.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return inputs_hash.hexdigest()
+
+
+def compute_problem_hash(point_cloud, scaffold):
+    """
+    Hash the content of the point cloud and scaffold, identifying the fitting problem whatever
+    the settings.
+
+    :param point_cloud: file_location of the point cloud, or an (N, 3) array.
+    :param scaffold: file_location of the scaffold or a scaffold description dict of EX memory buffers.
+    :return: Hexadecimal digest.
+    """
+    problem_hash = hashlib.sha1()
+    _update_hash_with_point_cloud(problem_hash, point_cloud)
+    _update_hash_with_scaffold(problem_hash, scaffold)
+    return problem_hash.hexdigest()
+
+
+class FittedResultCache(object):
+    """
+    Directory of fitted scaffold EX files named by the hash of their inputs. Once the total size
+    exceeds max_size, the least recently used results are removed.
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_SIZE):
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+
+    def _get_filename(self, key, extension):
+        return os.path.join(self._cache_dir, key + extension)
+
+    def get(self, key, extension=RESULT_EXTENSION):
+        """
+        :param extension: One of RESULT_EXTENSIONS.
+        :return: file_location of the fitted scaffold for key, or None if not cached.
+        """
+        filename = self._get_filename(key, extension)
+        if not os.path.isfile(filename):
+            return None
+        # access times are unreliable on many file systems, so the mtime records use
+        os.utime(filename, None)
+        return filename
+
+    def add(self, key, write_result, extension=RESULT_EXTENSION):
+        """
+        :param write_result: callable(file_location) writing the fitted scaffold.
+        :param extension: One of RESULT_EXTENSIONS.
+        :return: file_location of the cached fitted scaffold.
+        """
+        if not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir)
+        filename = self._get_filename(key, extension)
+        temporary_filename = filename + '.tmp'
+        write_result(temporary_filename)
+        os.replace(temporary_filename, filename)
+        self._evict(filename)
+        return filename
+
+    def _evict(self, keep_filename):
+        entries = []
+        for name in os.listdir(self._cache_dir):
+            if name.endswith(RESULT_EXTENSIONS):
+                filename = os.path.join(self._cache_dir, name)
+                stat = os.stat(filename)
+                entries.append((stat.st_mtime, stat.st_size, filename))
+        total_size = sum(entry[1] for entry in entries)
+        for mtime, size, filename in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            if filename != keep_filename:
+                os.remove(filename)
+                total_size -= size
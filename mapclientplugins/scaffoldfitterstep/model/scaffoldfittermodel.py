@@ -1,3 +1,7 @@
+import time
+
+import numpy as np
+
 from opencmiss.zinc.field import Field
 from opencmiss.zinc.glyph import Glyph
 from opencmiss.zinc.graphics import Graphics
@@ -6,6 +10,89 @@ from opencmiss.zinc.status import OK as ZINC_OK
 
 from scaffoldfitter.fitter import Fitter
 
+from .checkpoint import DEFAULT_CHECKPOINT_INTERVAL, deserialise_node_parameters, read_checkpoint, \
+    serialise_node_parameters, write_checkpoint
+from .downsample import downsample_indices
+from .export import write_region_fields
+from .graphicsmanager import GraphicsManager, DEFAULT_DISPLAY_POINT_BUDGET
+from .icp import icp_align
+from .pointcloud import get_nodeset_coordinates, read_point_cloud, DEFAULT_CHUNK_SIZE
+from .profiler import profiled
+from .projection import MeshProjector, ParallelMeshProjector, PROJECTION_METHODS
+from .resultcache import compute_problem_hash
+from .schedule import get_fit_stages
+from .telemetry import FitTelemetry, PenaltyEvaluator
+from .tessellation import AdaptiveTessellation, MAX_REFINEMENT
+
+# fit settings and the fitter methods setting them, which older fitters do not have
+FIT_PENALTY_SETTERS = (('strain_penalty', 'setFitStrainPenalty'),
+                       ('edge_discontinuity_penalty', 'setFitEdgeDiscontinuityPenalty'))
+
+
+def read_model_description(region, description):
+    stream_information = region.createStreaminformationRegion()
+    memory_resource = stream_information.createStreamresourceMemoryBuffer(description['elements3D'])
+    stream_information.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_MESH3D)
+    memory_resource = stream_information.createStreamresourceMemoryBuffer(description['elements2D'])
+    stream_information.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_MESH2D)
+    memory_resource = stream_information.createStreamresourceMemoryBuffer(description['elements1D'])
+    stream_information.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_MESH1D)
+    memory_resource = stream_information.createStreamresourceMemoryBuffer(description['nodes'])
+    stream_information.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_NODES)
+    return stream_information
+
+
+def create_field_finite_element_clone(source_field, name):
+    """
+    Copy the finite element field source_field to a new field called name in the same region.
+    Only the definition and parameters of source_field are serialised, so the scaffold
+    file itself is not parsed again.
+    """
+    fm = source_field.getFieldmodule()
+    region = fm.getRegion()
+    source_name = source_field.getName()
+    fm.beginChange()
+    sir = region.createStreaminformationRegion()
+    memory_resource = sir.createStreamresourceMemory()
+    sir.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_NODES | Field.DOMAIN_TYPE_MESH1D |
+                               Field.DOMAIN_TYPE_MESH2D | Field.DOMAIN_TYPE_MESH3D)
+    sir.setFieldNames([source_name])
+    region.write(sir)
+    result, buffer = memory_resource.getBuffer()
+    # field names are written as ') name,' in the field headers of the EX format
+    buffer = buffer.replace(bytes(') ' + source_name + ',', 'utf-8'), bytes(') ' + name + ',', 'utf-8'))
+    sir = region.createStreaminformationRegion()
+    sir.createStreamresourceMemoryBuffer(buffer)
+    result = region.read(sir)
+    fm.endChange()
+    if result != ZINC_OK:
+        raise ValueError('Failed to copy field ' + source_name)
+    field = fm.findFieldByName(name).castFiniteElement()
+    field.setManaged(True)
+    return field
+
+
+def copy_node_parameters(source_field, target_field):
+    """
+    Copy the node parameters of finite element source_field, which may be in another region, to
+    the nodes with the same identifiers in target_field.
+    """
+    source_region = source_field.getFieldmodule().getRegion()
+    source_name = source_field.getName()
+    target_name = target_field.getName()
+    sir = source_region.createStreaminformationRegion()
+    memory_resource = sir.createStreamresourceMemory()
+    sir.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_NODES)
+    sir.setResourceFieldNames(memory_resource, [source_name])
+    source_region.write(sir)
+    result, buffer = memory_resource.getBuffer()
+    buffer = buffer.replace(bytes(') ' + source_name + ',', 'utf-8'), bytes(') ' + target_name + ',', 'utf-8'))
+    target_region = target_field.getFieldmodule().getRegion()
+    sir = target_region.createStreaminformationRegion()
+    sir.createStreamresourceMemoryBuffer(buffer)
+    if target_region.read(sir) != ZINC_OK:
+        raise ValueError('Failed to copy node parameters of ' + source_name + ' to ' + target_name)
+
 
 class ScaffoldFitterModel(object):
 
@@ -16,16 +103,64 @@ class ScaffoldFitterModel(object):
         self._materialmodule = None
         self._glyphmodule = None
         self._tessellationmodule = None
+        self._tessellation = None
+        self._adaptive_tessellation = None
+        self._model_size = None
         self._location = None
         self._scaffold_model = None
         self._point_cloud = None
+        self._initial_geometry = None
+        self._initial_geometry_field_name = None
         self._model_reference_coordinate_field = None
         self._model_coordinate_field = None
         self._model_centre = None
         self._project_surface_group = None
         self._project_surface_element_group = None
         self._active_data_point_group_field = None
+        self._base_active_identifiers = None
+        self._projected_identifiers = None
+        self._data_projection_location_field = None
+        self._projector = None
+        self._projection_method = 'fitter'
+        self._incremental_projection = True
+        self._previous_projections = None
+        self._projection_workers_count = 1
+        self._measure_projection_speedup = False
+        self._projection_report = {}
+        self._fit_settings = {
+            'strain_penalty': 0.0,
+            'edge_discontinuity_penalty': 0.0,
+            'max_iterations': 1,
+            'schedule': []
+        }
+        self._fit_telemetry_enabled = False
+        self._fit_telemetry = FitTelemetry()
+        self._fit_telemetry_callback = None
+        self._penalty_evaluator = None
+        self._checkpoint_filename = None
+        self._checkpoint_interval = DEFAULT_CHECKPOINT_INTERVAL
+        self._resume_iteration = 0
+        self._fitted = False
+        self._problem_hash = None
         self._scene = None
+        self._graphics_shown = False
+        self._graphics_manager = None
+        self._load_timings = {}
+        self._point_cloud_chunk_size = DEFAULT_CHUNK_SIZE
+        self._point_cloud_progress_callback = None
+        self._sidecar_cache = False
+        self._cache_dir = None
+        self._downsample_settings = {
+            'mode': 'none',
+            'voxel_size': None,
+            'target_count': None
+        }
+        self._display_settings = {
+            'mode': 'stratified',
+            'point_budget': DEFAULT_DISPLAY_POINT_BUDGET,
+            'full_resolution': False
+        }
+        self._display_data_point_group_field = None
 
         self._context = context
         self._material_module = self._context.getMaterialmodule()
@@ -42,9 +177,11 @@ class ScaffoldFitterModel(object):
             'display_node_derivative_labels': self._node_derivative_labels[0:3],
             'display_lines': True,
             'display_lines_post_fit': True,
+            'display_data_points': True,
             'display_lines_exterior': False,
             'display_surfaces': True,
             'display_surfaces_exterior': True,
+            'display_surfaces_post_fit': True,
             'display_surfaces_translucent': False,
             'display_surfaces_wireframe': False,
             'display_element_numbers': False,
@@ -55,7 +192,7 @@ class ScaffoldFitterModel(object):
 
         self._initialise_surface_material()
         self._initialise_glyph_material()
-        self._initialise_tessellation(12)
+        self._initialise_tessellation(MAX_REFINEMENT)
 
     def get_context(self):
         return self._context
@@ -70,6 +207,13 @@ class ScaffoldFitterModel(object):
         return self._region
 
     def get_scene(self):
+        """
+        :return: The region's scene. Its visible graphics are created on first use, so models
+        which are never drawn, e.g. when fitting headless, do not build them.
+        """
+        if (self._scene is not None) and not self._graphics_shown:
+            self._graphics_shown = True
+            self._show_graphics()
         return self._region.getScene()
 
     def get_material_module(self):
@@ -88,54 +232,535 @@ class ScaffoldFitterModel(object):
     def get_align_euler_angles(self):
         return self._ScaffoldFitter.getAlignEulerAngles()
 
+    def get_align_settings(self):
+        """
+        :return: dict of the align transform 'scale', 'euler_angles' and 'offset'.
+        """
+        return {
+            'scale': self.get_align_scale(),
+            'euler_angles': list(self.get_align_euler_angles()),
+            'offset': list(self.get_align_offset())
+        }
+
+    def get_load_timings(self):
+        """
+        :return: dict of stage name -> seconds spent loading, e.g. 'scaffold', 'point_cloud'.
+        """
+        return self._load_timings
+
     def _get_visibility(self, graphics_name):
         return self._settings[graphics_name]
 
-    def initialise(self, point_cloud, scaffold_sir):
+    def initialise(self, point_cloud, scaffold):
+        """
+        :param point_cloud: file_location of the point cloud data.
+        :param scaffold: file_location of the scaffold or a scaffold description dict of EX memory
+        buffers with keys 'nodes', 'elements1D', 'elements2D' and 'elements3D'.
+        """
         self._reset_align_settings()
+        self._fitted = False
+        self._problem_hash = None
         self._load_point_cloud(point_cloud)
-        self._load_scaffold(scaffold_sir)
+        self._load_scaffold(scaffold)
         self.initialise_problem()
 
+    def done(self):
+        """
+        Release the fitter region with its graphics and fields, so models created one after another
+        in a shared context do not accumulate regions.
+        """
+        if self._scene is not None:
+            self._scene.removeAllGraphics()
+        self._scene = None
+        self._graphics_manager = None
+        self._adaptive_tessellation = None
+        self._tessellation = None
+        self._projector = None
+        self._penalty_evaluator = None
+        self._previous_projections = None
+        self._model_coordinate_field = None
+        self._model_reference_coordinate_field = None
+        self._data_coordinate_field = None
+        self._data_projection_location_field = None
+        self._active_data_point_group_field = None
+        self._display_data_point_group_field = None
+        self._project_surface_group = None
+        self._project_surface_element_group = None
+        self._ScaffoldFitter = None
+        self._region = None
+
     def _load_scaffold(self, scaffold):
         self._scaffold_model = scaffold
 
     def _load_point_cloud(self, point_cloud):
         self._point_cloud = point_cloud
 
+    def set_initial_geometry(self, filename, field_name=None):
+        """
+        Start fitting from the geometry of an earlier fit of the same scaffold instead of the
+        undeformed scaffold. The reference coordinates used by the penalties are still the
+        scaffold's own.
+
+        :param filename: EX file of the earlier fitted scaffold, e.g. from write_model(), or None
+        to start from the scaffold.
+        :param field_name: Name of the coordinate field in filename, by default the same as the
+        model coordinate field.
+        """
+        self._initial_geometry = filename
+        self._initial_geometry_field_name = field_name
+
+    def get_initial_geometry(self):
+        return self._initial_geometry
+
     def initialise_problem(self):
-        self._initialise_scaffold_model(reference=True)  # once to generate a model with reference field
-        self._initialise_scaffold_model(reference=False)  # again as a target model
+        self._initialise_scaffold_model()
+        self._initialise_initial_geometry()
+        self._initialise_projection_surface()
         self._initialise_point_cloud()
         self._initialise_active_data_point()
+        self._initialise_display_data_point()
+        self._initialise_data_projection_location()
         self._initialise_scene()
-        self._show_graphics()
+        self._graphics_shown = False
 
     def is_align_mirror(self):
         return self._ScaffoldFitter.isAlignMirror()
 
     def set_visibility(self, graphics_name, show):
         self._settings[graphics_name] = show
-        graphics = self._region.getScene().findGraphicsByName(graphics_name)
-        graphics.setVisibilityFlag(show)
+        if self._graphics_manager is not None:
+            self._graphics_manager.set_visibility(graphics_name, show)
+
+    def release_hidden_graphics(self):
+        """
+        Remove graphics hidden for longer than the release delay. Call periodically, e.g. from a
+        timer, as otherwise they are only released when the visibility of graphics changes.
+        """
+        if self._graphics_manager is not None:
+            self._graphics_manager.release_hidden_graphics()
 
     def set_location(self, location):
         self._location = location
 
+    def set_point_cloud_chunk_size(self, chunk_size):
+        self._point_cloud_chunk_size = chunk_size
+
+    def set_point_cloud_progress_callback(self, progress_callback):
+        """
+        :param progress_callback: callable(datapoints_count, fraction_complete) called after each
+        chunk of the point cloud is read.
+        """
+        self._point_cloud_progress_callback = progress_callback
+
+    def set_sidecar_cache(self, enabled, cache_dir=None):
+        """
+        :param enabled: Cache parsed EX point clouds in binary sidecar files for faster reloading.
+        :param cache_dir: Directory for the sidecars, or None to write them next to the point cloud.
+        """
+        self._sidecar_cache = enabled
+        self._cache_dir = cache_dir if cache_dir else None
+
+    def get_downsample_settings(self):
+        return self._downsample_settings
+
+    def set_downsample_settings(self, mode, voxel_size=None, target_count=None):
+        """
+        Set how the point cloud is reduced to the active data used for projection and fitting.
+        All datapoints remain in the region for reporting errors over the full cloud. Modes other
+        than 'none' need the 'bvh' projection method, checked by initialise().
+
+        :param mode: 'none', 'voxel' for the point nearest each voxel's centroid, 'stratified' for a
+        random point per voxel, or 'poisson' for a Poisson-disk sample.
+        :param voxel_size: Voxel side, or minimum point distance for 'poisson'.
+        :param target_count: Maximum number of active points, used if voxel_size is not set.
+        """
+        self._downsample_settings = {
+            'mode': mode,
+            'voxel_size': voxel_size,
+            'target_count': target_count
+        }
+
+    def get_display_settings(self):
+        return self._display_settings
+
+    def set_display_settings(self, mode='stratified', point_budget=DEFAULT_DISPLAY_POINT_BUDGET):
+        """
+        Set how the datapoints drawn are chosen; fitting still uses all active datapoints.
+
+        :param mode: 'voxel' or 'stratified' sampling, as for set_downsample_settings().
+        :param point_budget: Maximum number of datapoints drawn, or 0 to draw all.
+        """
+        self._display_settings['mode'] = mode
+        self._display_settings['point_budget'] = point_budget
+        self._refresh_display_data_points()
+
+    def set_display_full_resolution(self, full_resolution):
+        """
+        :param full_resolution: True to draw every datapoint regardless of the point budget.
+        """
+        self._display_settings['full_resolution'] = full_resolution
+        self._refresh_display_data_points()
+
+    def get_projection_method(self):
+        return self._projection_method
+
+    def get_projection_methods(self):
+        """
+        :return: Projection methods the installed fitter supports. 'bvh' needs a fitter accepting
+        projections computed outside it.
+        """
+        if hasattr(self._ScaffoldFitter, 'setDataProjectionMeshLocationField'):
+            return PROJECTION_METHODS
+        return ('fitter',)
+
+    def set_projection_method(self, method):
+        """
+        :param method: 'fitter' to use the fitter's own projection, or 'bvh' to project with
+        candidate elements pruned by an element bounding volume hierarchy, if supported.
+        """
+        if method not in self.get_projection_methods():
+            raise ValueError('Projection method ' + str(method) + ' is not supported by the installed fitter')
+        if (method == 'fitter') and (self._base_active_identifiers is not None):
+            raise ValueError("Projection method 'fitter' cannot fit the downsampled datapoints")
+        self._projection_method = method
+
+    def _check_active_data_subset(self, description):
+        """
+        The fitter's own projection and fit use all datapoints, so a subset of them can only be
+        fitted with projections computed here.
+
+        :param description: What makes the active datapoints a subset, for the error message.
+        """
+        if self._projection_method == 'fitter':
+            raise ValueError(description + " needs the 'bvh' projection method, as the fitter's own projection "
+                             "uses all datapoints")
+
+    def is_incremental_projection(self):
+        return self._incremental_projection
+
+    def set_incremental_projection(self, incremental):
+        """
+        :param incremental: If True, re-projection searches first around each datapoint's
+        previous element, falling back to a global search only where the distance increased.
+        """
+        self._incremental_projection = incremental
+
+    def set_projection_workers(self, workers_count, measure_speedup=False):
+        """
+        :param workers_count: Number of processes projecting data in parallel; 1 projects serially.
+        :param measure_speedup: If True, parallel projections are repeated serially to report the speedup.
+        """
+        self._projection_workers_count = workers_count
+        self._measure_projection_speedup = measure_speedup
+
+    def get_projection_report(self):
+        """
+        :return: dict describing the last projection: 'workers', 'points', 'parallel_time' or
+        'serial_time', and 'speedup' if measured.
+        """
+        return self._projection_report
+
+    def clear_projections(self):
+        """
+        Forget previous projections so the next projection searches globally.
+        """
+        self._previous_projections = None
+
+    def get_fit_settings(self):
+        return self._fit_settings
+
+    def is_fitted(self):
+        """
+        :return: True if at least one fit iteration has completed since initialise(), including
+        iterations before a checkpoint resumed from.
+        """
+        return self._fitted
+
+    def set_fit_settings(self, strain_penalty=None, edge_discontinuity_penalty=None, max_iterations=None,
+                         schedule=None):
+        """
+        Set any of the fit settings given; others are unchanged.
+
+        :param schedule: List of coarse to fine stage dicts, each with 'points_fraction' of the
+        active datapoints to fit and any of 'strain_penalty', 'edge_discontinuity_penalty' and
+        'max_iterations' overriding the other settings for that stage; an empty list to fit all
+        active datapoints in one stage.
+        """
+        for key, value in (('strain_penalty', strain_penalty),
+                           ('edge_discontinuity_penalty', edge_discontinuity_penalty),
+                           ('max_iterations', max_iterations),
+                           ('schedule', schedule)):
+            if value is not None:
+                self._fit_settings[key] = value
+
+    def set_fit_telemetry(self, enabled, telemetry_callback=None):
+        """
+        :param enabled: If True, measure errors and penalties after each fit iteration. This adds
+        their evaluation to each iteration, so is off by default.
+        :param telemetry_callback: Optional callable(record) called with each iteration's record.
+        """
+        self._fit_telemetry_enabled = enabled
+        self._fit_telemetry_callback = telemetry_callback
+
+    def get_fit_telemetry(self):
+        """
+        :return: FitTelemetry of the iterations of the last fit.
+        """
+        return self._fit_telemetry
+
+    def _get_penalty_evaluator(self):
+        if (self._penalty_evaluator is None) or \
+                (self._penalty_evaluator.get_model_coordinate_field() is not self._model_coordinate_field):
+            self._penalty_evaluator = PenaltyEvaluator(self._model_coordinate_field,
+                                                       self._model_reference_coordinate_field)
+        return self._penalty_evaluator
+
+    def _record_fit_iteration(self, iteration, wall_time, fit_time, stage):
+        rms_error, max_error = self.get_data_projection_errors()
+        strain_penalty, edge_discontinuity_penalty = self._get_penalty_evaluator().evaluate()
+        if strain_penalty is not None:
+            strain_penalty *= stage['strain_penalty']
+        if edge_discontinuity_penalty is not None:
+            edge_discontinuity_penalty *= stage['edge_discontinuity_penalty']
+        record = {
+            'iteration': iteration,
+            'wall_time': wall_time,
+            'fit_time': fit_time,
+            'rms_error': rms_error,
+            'max_error': max_error,
+            'strain_penalty': strain_penalty,
+            'edge_discontinuity_penalty': edge_discontinuity_penalty
+        }
+        self._fit_telemetry.add(record)
+        if self._fit_telemetry_callback is not None:
+            self._fit_telemetry_callback(record)
+
+    def set_checkpoint(self, filename, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        :param filename: File to write a checkpoint to every interval fit iterations, and when
+        fitting stops, or None to not write checkpoints.
+        """
+        self._checkpoint_filename = filename
+        self._checkpoint_interval = interval
+
+    def get_checkpoint_filename(self):
+        return self._checkpoint_filename
+
+    def _get_finite_element_model_coordinates(self, purpose):
+        """
+        :param purpose: What needs the node parameters, for the error message.
+        :return: The model coordinate field as a finite element field. Alignment can make it a
+        computed field, which has no node parameters to write.
+        """
+        model_coordinate_field = self._model_coordinate_field.castFiniteElement()
+        if not model_coordinate_field.isValid():
+            raise ValueError('Cannot ' + purpose + ': model coordinates ' + self._model_coordinate_field.getName() +
+                             ' are not a finite element field')
+        return model_coordinate_field
+
+    def _get_problem_hash(self):
+        if self._problem_hash is None:
+            self._problem_hash = compute_problem_hash(self._point_cloud, self._scaffold_model)
+        return self._problem_hash
+
+    def _get_problem_sizes(self):
+        """
+        :return: Numbers of nodes and datapoints in the region.
+        """
+        fm = self._region.getFieldmodule()
+        return (fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES).getSize(),
+                fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS).getSize())
+
+    def write_checkpoint(self, filename, iteration):
+        """
+        Write the model node parameters, active datapoints, projections and iteration counter,
+        with the align settings and a hash of the scaffold and point cloud they apply to.
+        """
+        model_coordinate_field = self._get_finite_element_model_coordinates('write checkpoint')
+        active_identifiers, _ = get_nodeset_coordinates(
+            self._data_coordinate_field, self._active_data_point_group_field.getNodesetGroup())
+        metadata = {
+            'iteration': iteration,
+            'problem_hash': self._get_problem_hash(),
+            'problem_sizes': list(self._get_problem_sizes()),
+            'model_coordinate_field': model_coordinate_field.getName(),
+            'fit_settings': self._fit_settings,
+            'align_settings': self.get_align_settings(),
+            'align_mirror': bool(self.is_align_mirror()),
+            'projections': self._previous_projections is not None
+        }
+        arrays = {
+            'node_parameters': np.frombuffer(serialise_node_parameters(model_coordinate_field), dtype=np.uint8),
+            'active_identifiers': active_identifiers
+        }
+        if self._previous_projections is not None:
+            for name, array in zip(('identifiers', 'element_identifiers', 'xis', 'distances'),
+                                   self._previous_projections):
+                arrays['projection_' + name] = array
+        write_checkpoint(filename, metadata, arrays)
+
+    def resume_from_checkpoint(self, filename):
+        """
+        Restore a checkpoint written by the same scaffold and point cloud, so the next fit
+        continues after its iteration. Call after initialise() instead of aligning and projecting.
+        Raises ValueError if the checkpoint was written for a different scaffold or point cloud.
+
+        :return: Number of iterations completed before the checkpoint.
+        """
+        metadata, arrays = read_checkpoint(filename)
+        if (metadata['problem_hash'] != self._get_problem_hash()) or \
+                (tuple(metadata['problem_sizes']) != self._get_problem_sizes()):
+            raise ValueError('Checkpoint ' + filename + ' was written for a different scaffold or point cloud')
+        align_settings = metadata['align_settings']
+        self._ScaffoldFitter.setAlignScale(align_settings['scale'])
+        self._ScaffoldFitter.setAlignEulerAngles(align_settings['euler_angles'])
+        self._ScaffoldFitter.setAlignOffset(align_settings['offset'])
+        self._ScaffoldFitter.setAlignMirror(metadata['align_mirror'])
+        fm = self._region.getFieldmodule()
+        model_coordinate_field = fm.findFieldByName(metadata['model_coordinate_field'])
+        if not model_coordinate_field.isValid():
+            # the aligned coordinates were created by alignment, so are not in a new session
+            self._model_coordinate_field = self._ScaffoldFitter.setStatePostAlign()
+            model_coordinate_field = fm.findFieldByName(metadata['model_coordinate_field'])
+        if not model_coordinate_field.isValid():
+            raise ValueError('Checkpoint field ' + metadata['model_coordinate_field'] + ' is not in the scaffold')
+        deserialise_node_parameters(self._region, arrays['node_parameters'].tobytes())
+        self._model_coordinate_field = model_coordinate_field
+        self._ScaffoldFitter.setModelCoordinates(self._model_coordinate_field)
+        self._fit_settings.update(metadata['fit_settings'])
+        self._set_active_data_points(arrays['active_identifiers'])
+        if metadata['projections'] and (self._projection_method == 'bvh'):
+            self._previous_projections = tuple(arrays['projection_' + name] for name in (
+                'identifiers', 'element_identifiers', 'xis', 'distances'))
+            identifiers, element_identifiers, xis, _ = self._previous_projections
+            self._assign_data_projections(identifiers, element_identifiers, xis)
+            self._ScaffoldFitter.setDataProjectionMeshLocationField(self._data_projection_location_field)
+        else:
+            self.project_data()
+        self._resume_iteration = metadata['iteration']
+        self._fitted = self._resume_iteration > 0
+        return self._resume_iteration
+
+    def _check_fit_settings(self, stages):
+        """
+        Fitters without penalty setters fit with their own penalties, so only zero penalties can
+        be requested of them.
+        """
+        for stage in stages:
+            for key, setter_name in FIT_PENALTY_SETTERS:
+                if stage[key] and not hasattr(self._ScaffoldFitter, setter_name):
+                    raise ValueError('Installed fitter does not support setting ' + key)
+
+    def _apply_fit_settings(self, stage):
+        for key, setter_name in FIT_PENALTY_SETTERS:
+            if hasattr(self._ScaffoldFitter, setter_name):
+                getattr(self._ScaffoldFitter, setter_name)(stage[key])
+
+    def get_data_projection_errors(self, full_cloud=False):
+        """
+        :param full_cloud: If True, project all datapoints onto the current geometry, otherwise use
+        the stored projections of the active datapoints. Projections made with the 'fitter' method
+        are held by the fitter, so the active datapoints are then projected onto the current geometry.
+        :return: RMS and maximum distance from the datapoints to their projections, or None, None if
+        there are none.
+        """
+        fm = self._region.getFieldmodule()
+        if full_cloud or (self._projection_method == 'fitter'):
+            if full_cloud:
+                datapoints = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
+            else:
+                datapoints = self._active_data_point_group_field.getNodesetGroup()
+            identifiers, coordinates = get_nodeset_coordinates(self._data_coordinate_field, datapoints)
+            distances = self._get_projector().project(coordinates)[2]
+            distances = distances[np.isfinite(distances)]
+            if len(distances) == 0:
+                return None, None
+            return float(np.sqrt(np.mean(distances**2))), float(np.max(distances))
+        fm.beginChange()
+        projected_coordinates = fm.createFieldEmbedded(self._model_coordinate_field, self._data_projection_location_field)
+        error = fm.createFieldMagnitude(fm.createFieldSubtract(projected_coordinates, self._data_coordinate_field))
+        active_datapoints = self._active_data_point_group_field.getNodesetGroup()
+        mean_squared_error = fm.createFieldNodesetMeanSquares(error, active_datapoints)
+        maximum_error = fm.createFieldNodesetMaximum(error, active_datapoints)
+        fm.endChange()
+        cache = fm.createFieldcache()
+        result, mean_squared = mean_squared_error.evaluateReal(cache, 1)
+        if result != ZINC_OK:
+            return None, None
+        result, maximum = maximum_error.evaluateReal(cache, 1)
+        return float(np.sqrt(mean_squared)), maximum
+
+    def get_data_point_counts(self):
+        """
+        :return: number of active datapoints used in fitting, total number of datapoints.
+        """
+        fm = self._region.getFieldmodule()
+        datapoints = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
+        return self._active_data_point_group_field.getNodesetGroup().getSize(), datapoints.getSize()
+
     def set_align_settings_change_callback(self, align_settings_change_callback):
         self._ScaffoldFitter.setAlignSettingsChangeCallback(align_settings_change_callback)
 
+    @profiled('auto_align_model_on_data')
     def auto_align_model_on_data(self):
         self._model_coordinate_field = self._ScaffoldFitter.autoCentreModelOnData()
         # self._ScaffoldFitter.initializeRigidAlignment()
         # self._set_model_graphics_post_align()
 
+    def _get_projection_surface_nodes(self):
+        """
+        :return: Nodeset group of the nodes of the elements data are projected onto.
+        """
+        fm = self._region.getFieldmodule()
+        nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        surface_nodes = fm.createFieldNodeGroup(nodes).getNodesetGroup()
+        fm.beginChange()
+        iterator = self._project_surface_element_group.createElementiterator()
+        element = iterator.next()
+        while element.isValid():
+            surface_nodes.addElementNodes(element)
+            element = iterator.next()
+        fm.endChange()
+        return surface_nodes
+
+    @profiled('icp_align_model_on_data')
+    def icp_align_model_on_data(self, mode='similarity', mirror='current', max_iterations=50, tolerance=1.0E-6,
+                                sample_count=5000, trim_fraction=0.0):
+        """
+        Align the scaffold to the active data by iterative closest point, starting from the
+        current align settings, and set the resulting align scale, rotation, offset and mirror.
+        See icp.icp_align() for the arguments.
+
+        :param mirror: True or False, None to try both, or 'current' to keep the current align mirror.
+
+        :return: dict of the ICP result.
+        """
+        _, source = get_nodeset_coordinates(self._model_reference_coordinate_field,
+                                            self._get_projection_surface_nodes())
+        _, target = get_nodeset_coordinates(self._data_coordinate_field,
+                                            self._active_data_point_group_field.getNodesetGroup())
+        align_scale = self.get_align_scale()
+        # the fitter may hold the scale per axis
+        per_axis_scale = isinstance(align_scale, (list, tuple))
+        if mirror == 'current':
+            mirror = bool(self.is_align_mirror())
+        result = icp_align(source, target, mode, mirror, float(np.mean(align_scale)),
+                           self.get_align_euler_angles(), self.get_align_offset(),
+                           max_iterations, tolerance, sample_count, trim_fraction)
+        self._ScaffoldFitter.setAlignScale([result['scale']] * 3 if per_axis_scale else result['scale'])
+        self._ScaffoldFitter.setAlignEulerAngles(result['euler_angles'])
+        self._ScaffoldFitter.setAlignOffset(result['offset'].tolist())
+        self._ScaffoldFitter.setAlignMirror(result['mirror'])
+        self._model_coordinate_field = self._ScaffoldFitter.setStatePostAlign()
+        return result
+
     def rigid_align(self):
         _ = self._ScaffoldFitter.initializeRigidAlignment()
         self._model_coordinate_field = self._ScaffoldFitter.setStatePostAlign()
 
     def _create_line_graphics(self):
         lines = self._region.getScene().createGraphicsLines()
+        lines.setTessellation(self._tessellation)
         fieldmodule = self._context.getMaterialmodule()
         lines.setCoordinateField(self._model_reference_coordinate_field)
         lines.setName('display_lines')
@@ -145,6 +770,7 @@ class ScaffoldFitterModel(object):
 
     def _create_line_graphics_post_fit(self):
         lines_post_fit = self._region.getScene().createGraphicsLines()
+        lines_post_fit.setTessellation(self._tessellation)
         fieldmodule = self._context.getMaterialmodule()
         lines_post_fit.setCoordinateField(self._model_coordinate_field)
         lines_post_fit.setName('display_lines_post_fit')
@@ -154,6 +780,7 @@ class ScaffoldFitterModel(object):
 
     def _create_surface_graphics(self):
         surface = self._scene.createGraphicsSurfaces()
+        surface.setTessellation(self._tessellation)
         surface.setCoordinateField(self._model_reference_coordinate_field)
         surface.setRenderPolygonMode(Graphics.RENDER_POLYGON_MODE_SHADED)
         surface_material = self._materialmodule.findMaterialByName('trans_blue')
@@ -163,6 +790,7 @@ class ScaffoldFitterModel(object):
 
     def _create_surface_graphics_post_fit(self):
         surface_post_fit = self._scene.createGraphicsSurfaces()
+        surface_post_fit.setTessellation(self._tessellation)
         surface_post_fit.setCoordinateField(self._model_coordinate_field)
         surface_post_fit.setRenderPolygonMode(Graphics.RENDER_POLYGON_MODE_SHADED)
         surface_material_post_fit = self._materialmodule.findMaterialByName('heart_tissue_trans_postfit')
@@ -172,6 +800,7 @@ class ScaffoldFitterModel(object):
 
     def _create_surface_trans_graphics(self):
         surface_trans = self._scene.createGraphicsSurfaces()
+        surface_trans.setTessellation(self._tessellation)
         surface_trans.setCoordinateField(self._model_reference_coordinate_field)
         surface_trans.setRenderPolygonMode(Graphics.RENDER_POLYGON_MODE_SHADED)
         surface_material = self._materialmodule.findMaterialByName('heart_tissue_trans')
@@ -180,14 +809,19 @@ class ScaffoldFitterModel(object):
         return surface_trans
 
     def _create_data_point_graphics(self):
+        # the datapoints drawn are only chosen once they are to be drawn
+        self._update_display_data_points()
         points = self._scene.createGraphicsPoints()
         points.setFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
         points.setCoordinateField(self._data_coordinate_field)
+        points.setSubgroupField(self._display_data_point_group_field)
         point_attr = points.getGraphicspointattributes()
         point_attr.setGlyphShapeType(Glyph.SHAPE_TYPE_CROSS)
         point_size = self._ScaffoldFitter.getAutoPointSize()
         point_attr.setBaseSize(point_size)
         points.setMaterial(self._materialmodule.findMaterialByName('silver'))
+        points.setName('display_data_points')
+        return points
 
     def _create_axis_graphics(self):
         axes_scale = [10]*3
@@ -199,6 +833,7 @@ class ScaffoldFitterModel(object):
         axes.setMaterial(self._materialmodule.findMaterialByName('red'))
         axes.setName('display_axes')
         axes.setVisibilityFlag(self.is_display_axes())
+        return axes
 
     @staticmethod
     def _get_node_coordinates_range(coordinates):
@@ -214,8 +849,14 @@ class ScaffoldFitterModel(object):
         fm.endChange()
         return min_x, max_x
 
+    @profiled('initialise_surface_material')
     def _initialise_surface_material(self):
+        """
+        Define the materials used, unless already defined in the context by an earlier model.
+        """
         self._materialmodule = self._context.getMaterialmodule()
+        if self._materialmodule.findMaterialByName('trans_blue').isValid():
+            return
         self._materialmodule.beginChange()
         self._materialmodule.defineStandardMaterials()
         solid_tissue = self._materialmodule.createMaterial()
@@ -237,72 +878,275 @@ class ScaffoldFitterModel(object):
         trans_blue.setAttributeReal3(Material.ATTRIBUTE_SPECULAR, [0.1, 0.1, 0.1])
         trans_blue.setAttributeReal(Material.ATTRIBUTE_ALPHA, 0.3)
         trans_blue.setAttributeReal(Material.ATTRIBUTE_SHININESS, 0.2)
-        glyph_module = self._context.getGlyphmodule()
-        glyph_module.defineStandardGlyphs()
         self._materialmodule.endChange()
 
+    @profiled('initialise_glyph_material')
     def _initialise_glyph_material(self):
         self._glyphmodule = self._context.getGlyphmodule()
-        self._glyphmodule.defineStandardGlyphs()
+        if not self._glyphmodule.findGlyphByGlyphShapeType(Glyph.SHAPE_TYPE_CROSS).isValid():
+            self._glyphmodule.defineStandardGlyphs()
 
     def _initialise_tessellation(self, res):
+        """
+        Create the tessellation used by this model's lines and surfaces, so its refinement changes
+        do not regenerate graphics of other models sharing the context.
+        """
         self._tessellationmodule = self._context.getTessellationmodule()
-        self._tessellationmodule = self._tessellationmodule.getDefaultTessellation()
-        self._tessellationmodule.setRefinementFactors([res])
-
-    def _initialise_scaffold_model(self, reference=True):
-        filename = 'D:\\sparc\\fitting\\Shwaber\\model.exf'
-
-        if reference:
-            # exnodeFile = filename + '.exnode'
-            # exelemFile = filename + '.exelem'
-            # result = self._region.readFile(exnodeFile)
-            result = self._region.readFile(filename)
-            # result = self._region.read(self._scaffold_model)
-            if result != ZINC_OK:
-                raise ValueError('Failed to initiate reference scaffold')
-            self._model_reference_coordinate_field = self._ScaffoldFitter.getModelCoordinateField()
-            name = self._model_reference_coordinate_field.getName()
-            number = 0
-            number_string = ''
-            while True:
-                result = self._model_reference_coordinate_field.setName('reference_' + name + number_string)
-                if result == ZINC_OK:
-                    break
-                number = number + 1
-            self._ScaffoldFitter.setRefereceModelCoordinates(self._model_reference_coordinate_field)
-        else:
-            # exnodeFile = filename+ '.exnode'
-            # exelemFile = filename + '.exelem'
-            # result = self._region.readFile(exnodeFile)
-            result = self._region.readFile(filename)
-            # result = self._region.read(self._scaffold_model)
-            if result != ZINC_OK:
-                raise ValueError('Failed to initiate model scaffold')
-            self._model_coordinate_field = self._ScaffoldFitter.getModelCoordinateField()
-            self._ScaffoldFitter.setModelCoordinates(self._model_coordinate_field)
+        self._tessellation = self._tessellationmodule.createTessellation()
+        self._adaptive_tessellation = AdaptiveTessellation(self._tessellation, res)
 
-    def _initialise_point_cloud(self):
-        filename = 'D:\\sparc\\fitting\\Shwaber\\data.exdata'
-        sir = self._region.createStreaminformationRegion()
-        # point_cloud_resource = sir.createStreamresourceFile(self._point_cloud)
-        point_cloud_resource = sir.createStreamresourceFile(filename)
-        sir.setResourceDomainTypes(point_cloud_resource, Field.DOMAIN_TYPE_DATAPOINTS)
-        result = self._region.read(sir)
+    def _update_tessellation_mesh(self):
+        fm = self._region.getFieldmodule()
+        surface_elements_count = fm.findMeshByDimension(2).getSize()
+        elements_across = None
+        for dimension in (3, 2, 1):
+            elements_count = fm.findMeshByDimension(dimension).getSize()
+            if elements_count > 0:
+                elements_across = elements_count ** (1.0 / dimension)
+                break
+        min_x, max_x = self._get_node_coordinates_range(self._model_coordinate_field)
+        self._model_size = float(np.linalg.norm(np.subtract(max_x, min_x)))
+        self._adaptive_tessellation.set_mesh(surface_elements_count, elements_across)
+
+    def set_view_size(self, viewport_pixels, view_extent):
+        """
+        Set the tessellation refinement for the scaffold's size on screen.
+
+        :param viewport_pixels: Size of the sceneviewer in pixels.
+        :param view_extent: Size of the region visible in the sceneviewer in model units.
+        """
+        if not (self._model_size and view_extent):
+            return
+        self._adaptive_tessellation.set_screen_size(self._model_size * viewport_pixels / view_extent)
+
+    def set_view_interacting(self, interacting):
+        """
+        :param interacting: True while the view is being rotated, panned or zoomed, to draw with a
+        coarse tessellation; False to restore full quality.
+        """
+        self._adaptive_tessellation.set_interacting(interacting)
+
+    def _read_scaffold(self):
+        if isinstance(self._scaffold_model, dict):
+            return self._region.read(read_model_description(self._region, self._scaffold_model))
+        return self._region.readFile(self._scaffold_model)
+
+    @profiled('load_scaffold')
+    def _initialise_scaffold_model(self):
+        start_time = time.perf_counter()
+        result = self._read_scaffold()
         if result != ZINC_OK:
-            raise ValueError('Failed to read point cloud')
+            raise ValueError('Failed to initiate model scaffold')
+        self._model_coordinate_field = self._ScaffoldFitter.getModelCoordinateField()
+        self._ScaffoldFitter.setModelCoordinates(self._model_coordinate_field)
+        self._initialise_reference_coordinate_field()
+        self._update_tessellation_mesh()
+        self._load_timings['scaffold'] = time.perf_counter() - start_time
+
+    def _initialise_reference_coordinate_field(self):
+        fm = self._region.getFieldmodule()
+        name = 'reference_' + self._model_coordinate_field.getName()
+        number = 0
+        number_string = ''
+        while fm.findFieldByName(name + number_string).isValid():
+            number = number + 1
+            number_string = str(number)
+        self._model_reference_coordinate_field = create_field_finite_element_clone(
+            self._model_coordinate_field, name + number_string)
+        self._ScaffoldFitter.setRefereceModelCoordinates(self._model_reference_coordinate_field)
+
+    def _initialise_initial_geometry(self):
+        if not self._initial_geometry:
+            return
+        region = self._context.createRegion()
+        if region.readFile(self._initial_geometry) != ZINC_OK:
+            raise ValueError('Failed to read initial geometry ' + self._initial_geometry)
+        field_name = self._initial_geometry_field_name or self._model_coordinate_field.getName()
+        source_field = region.getFieldmodule().findFieldByName(field_name).castFiniteElement()
+        if not source_field.isValid():
+            raise ValueError('Initial geometry ' + self._initial_geometry + ' has no field ' + field_name)
+        source_nodes = region.getFieldmodule().findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        nodes = self._region.getFieldmodule().findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        if source_nodes.getSize() != nodes.getSize():
+            raise ValueError('Initial geometry ' + self._initial_geometry + ' is not a fit of this scaffold')
+        copy_node_parameters(source_field, self._model_coordinate_field)
+
+    @profiled('load_point_cloud')
+    def _initialise_point_cloud(self):
+        start_time = time.perf_counter()
+        read_point_cloud(self._region, self._point_cloud, self._point_cloud_chunk_size,
+                         self._point_cloud_progress_callback, self._sidecar_cache, self._cache_dir)
         self._data_coordinate_field = self._ScaffoldFitter.getDataCoordinateField()
         self._ScaffoldFitter.setDataCoordinates(self._data_coordinate_field)
+        self._load_timings['point_cloud'] = time.perf_counter() - start_time
+
+    def _initialise_projection_surface(self):
+        """
+        Data are projected onto the exterior faces of 3-D scaffolds, otherwise onto the mesh of
+        highest dimension.
+        """
+        fm = self._region.getFieldmodule()
+        fm.beginChange()
+        for dimension in range(3, 0, -1):
+            mesh = fm.findMeshByDimension(dimension)
+            if mesh.getSize() > 0:
+                break
+        if dimension == 3:
+            mesh = fm.findMeshByDimension(2)
+            if mesh.getSize() == 0:
+                fm.defineAllFaces()
+        self._project_surface_group = fm.createFieldElementGroup(mesh)
+        self._project_surface_element_group = self._project_surface_group.getMeshGroup()
+        if dimension == 3:
+            self._project_surface_element_group.addElementsConditional(fm.createFieldIsExterior())
+        else:
+            self._project_surface_element_group.addElementsConditional(fm.createFieldConstant([1]))
+        fm.endChange()
+
+    def _initialise_data_projection_location(self):
+        self._previous_projections = None
+        self._projected_identifiers = None
+        fm = self._region.getFieldmodule()
+        self._data_projection_location_field = fm.findFieldByName('data_projection_location').castStoredMeshLocation()
+        if not self._data_projection_location_field.isValid():
+            mesh = self._project_surface_element_group.getMasterMesh()
+            self._data_projection_location_field = fm.createFieldStoredMeshLocation(mesh)
+            self._data_projection_location_field.setName('data_projection_location')
+            self._data_projection_location_field.setManaged(True)
+
+    def _get_projector(self):
+        if (self._projector is None) or (self._projector.get_coordinate_field() is not self._model_coordinate_field):
+            self._projector = MeshProjector(self._model_coordinate_field, self._project_surface_element_group)
+        return self._projector
+
+    def _get_previous_projections(self, identifiers):
+        """
+        :return: element identifiers and distances of the last projection of the datapoints with
+        identifiers, -1 and inf for those not projected then; or None, None if not incremental.
+        """
+        if (not self._incremental_projection) or (self._previous_projections is None):
+            return None, None
+        previous_identifiers, previous_element_identifiers, _, previous_distances = self._previous_projections
+        element_identifiers = np.full(len(identifiers), -1, dtype=np.int64)
+        distances = np.full(len(identifiers), np.inf)
+        if len(previous_identifiers) > 0:
+            positions = np.minimum(np.searchsorted(previous_identifiers, identifiers), len(previous_identifiers) - 1)
+            found = previous_identifiers[positions] == identifiers
+            element_identifiers[found] = previous_element_identifiers[positions[found]]
+            distances[found] = previous_distances[positions[found]]
+        return element_identifiers, distances
+
+    def _assign_data_projections(self, identifiers, element_identifiers, xis):
+        """
+        Assign projections, and remove those of datapoints projected before but not now, so only
+        the datapoints now projected are fitted.
+        """
+        fm = self._region.getFieldmodule()
+        datapoints = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
+        mesh = self._project_surface_element_group.getMasterMesh()
+        cache = fm.createFieldcache()
+        projected_identifiers = identifiers[element_identifiers >= 0]
+        fm.beginChange()
+        if self._projected_identifiers is not None:
+            nodetemplate = datapoints.createNodetemplate()
+            nodetemplate.undefineField(self._data_projection_location_field)
+            for identifier in np.setdiff1d(self._projected_identifiers, projected_identifiers).tolist():
+                datapoints.findNodeByIdentifier(identifier).merge(nodetemplate)
+        self._projected_identifiers = projected_identifiers
+        nodetemplate = datapoints.createNodetemplate()
+        nodetemplate.defineField(self._data_projection_location_field)
+        for identifier, element_identifier, xi in zip(identifiers.tolist(), element_identifiers.tolist(), xis.tolist()):
+            if element_identifier < 0:
+                continue
+            node = datapoints.findNodeByIdentifier(identifier)
+            node.merge(nodetemplate)
+            cache.setNode(node)
+            self._data_projection_location_field.assignMeshLocation(cache, mesh.findElementByIdentifier(element_identifier), xi)
+        fm.endChange()
 
     def _initialise_active_data_point(self):
         fm = self._region.getFieldmodule()
         datapoints = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
         self._active_data_point_group_field = fm.createFieldNodeGroup(datapoints)
-        active_data_point_group_field = self._active_data_point_group_field.getNodesetGroup()
-        active_data_point_group_field.addNodesConditional(fm.createFieldConstant([1]))
+        self._base_active_identifiers = None
+        if self._downsample_settings['mode'] == 'none':
+            self._set_active_data_points(None)
+            return
+        self._check_active_data_subset('Downsampling')
+        start_time = time.perf_counter()
+        identifiers, coordinates = get_nodeset_coordinates(self._data_coordinate_field, datapoints)
+        indices = downsample_indices(coordinates, **self._downsample_settings)
+        self._base_active_identifiers = identifiers[indices]
+        self._set_active_data_points(self._base_active_identifiers)
+        self._load_timings['downsample'] = time.perf_counter() - start_time
+
+    def _initialise_display_data_point(self):
+        """
+        Create the group of datapoints drawn, filled when the data point graphics are created.
+        """
+        fm = self._region.getFieldmodule()
+        datapoints = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
+        self._display_data_point_group_field = fm.createFieldNodeGroup(datapoints)
+
+    def _refresh_display_data_points(self):
+        """
+        Choose the datapoints drawn again if the data point graphics exist.
+        """
+        if (self._graphics_manager is not None) and \
+                (self._graphics_manager.get_graphics('display_data_points') is not None):
+            self._update_display_data_points()
+
+    def _update_display_data_points(self):
+        """
+        Choose the datapoints drawn: all of them, or a spatially even subset within the point budget.
+        """
+        fm = self._region.getFieldmodule()
+        datapoints = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
+        display_datapoints = self._display_data_point_group_field.getNodesetGroup()
+        point_budget = self._display_settings['point_budget']
+        fm.beginChange()
+        display_datapoints.removeAllNodes()
+        if self._display_settings['full_resolution'] or (not point_budget) or (datapoints.getSize() <= point_budget):
+            display_datapoints.addNodesConditional(fm.createFieldConstant([1]))
+        else:
+            identifiers, coordinates = get_nodeset_coordinates(self._data_coordinate_field, datapoints)
+            indices = downsample_indices(coordinates, self._display_settings['mode'], target_count=point_budget)
+            for identifier in identifiers[indices].tolist():
+                display_datapoints.addNode(datapoints.findNodeByIdentifier(identifier))
+        fm.endChange()
+
+    def _set_active_data_points(self, identifiers):
+        """
+        :param identifiers: Array of datapoint identifiers to make active, or None for all.
+        """
+        fm = self._region.getFieldmodule()
+        datapoints = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_DATAPOINTS)
+        active_datapoints = self._active_data_point_group_field.getNodesetGroup()
+        fm.beginChange()
+        active_datapoints.removeAllNodes()
+        if identifiers is None:
+            active_datapoints.addNodesConditional(fm.createFieldConstant([1]))
+        else:
+            for identifier in identifiers.tolist():
+                active_datapoints.addNode(datapoints.findNodeByIdentifier(identifier))
+        fm.endChange()
+
+    def _set_stage_data_points(self, identifiers, coordinates, points_fraction):
+        """
+        Make active an even subset of points_fraction of the datapoints with identifiers.
+        """
+        count = max(1, int(round(points_fraction * len(identifiers))))
+        if count < len(identifiers):
+            identifiers = identifiers[downsample_indices(coordinates, 'voxel', target_count=count)]
+        self._set_active_data_points(identifiers)
 
     def _initialise_scene(self):
         self._scene = self._region.getScene()
+        self._graphics_manager = GraphicsManager(self._scene)
+        self._graphics_manager.register('display_data_points', self._create_data_point_graphics)
+        self._graphics_manager.register('display_lines', self._create_line_graphics)
+        self._graphics_manager.register('display_surfaces', self._create_surface_graphics)
+        self._graphics_manager.register('display_surfaces_translucent', self._create_surface_trans_graphics)
 
     def is_display_lines(self):
         return self._get_visibility('display_lines')
@@ -319,45 +1163,168 @@ class ScaffoldFitterModel(object):
     def _reset_align_settings(self):
         self._ScaffoldFitter.resetAlignSettings()
 
+    @profiled('show_graphics')
     def _show_graphics(self):
+        """
+        Create the graphics which are visible; the rest are created when first made visible.
+        """
         self._scene.beginChange()
-        self._create_data_point_graphics()
-        self._create_line_graphics()
-        self._create_surface_graphics()
-        self._create_surface_trans_graphics()
+        for name in ['display_data_points', 'display_lines', 'display_surfaces', 'display_surfaces_translucent']:
+            self._graphics_manager.set_visibility(name, self._settings[name])
         # self._create_axis_graphics()
         self._scene.endChange()
 
     def _set_model_graphics_post_align(self):
-        self._scene.beginChange()
-        for name in ['display_lines_post_fit', 'display_surfaces_post_fit']:
-            graphics = self._scene.findGraphicsByName(name)
-            graphics.setCoordinateField(self._model_coordinate_field)
-        self._scene.endChange()
+        self._graphics_manager.set_coordinate_field(
+            ['display_lines_post_fit', 'display_surfaces_post_fit'], self._model_coordinate_field)
 
     def _show_post_fit_graphics(self):
+        """
+        Show the post-fit graphics, reusing those from any earlier fit.
+        """
         self._scene.beginChange()
-        self._create_surface_graphics_post_fit()
-        self._create_line_graphics_post_fit()
+        self._graphics_manager.register('display_surfaces_post_fit', self._create_surface_graphics_post_fit)
+        self._graphics_manager.register('display_lines_post_fit', self._create_line_graphics_post_fit)
+        self._set_model_graphics_post_align()
+        for name in ['display_surfaces_post_fit', 'display_lines_post_fit']:
+            self._graphics_manager.set_visibility(name, self._settings[name])
         self._scene.endChange()
 
     def _set_explicit_model_graphics(self, field):
-        self._scene.beginChange()
-        for name in ['display_lines', 'display_surfaces']:
-            graphics = self._scene.findGraphicsByName(name)
-            graphics.setCoordinateField(field)
-        self._scene.endChange()
+        self._graphics_manager.set_coordinate_field(['display_lines', 'display_surfaces'], field)
 
     def swap_axes(self, axes=None):
         self._ScaffoldFitter.swapAxes(axes=axes)
 
+    @profiled('project_data')
     def project_data(self):
-        self._ScaffoldFitter.computeProjection()
+        if self._projection_method == 'fitter':
+            self._ScaffoldFitter.computeProjection()
+            return
+        identifiers, coordinates = get_nodeset_coordinates(
+            self._data_coordinate_field, self._active_data_point_group_field.getNodesetGroup())
+        previous_element_identifiers, previous_distances = self._get_previous_projections(identifiers)
+        projector = self._get_projector()
+        # workers read a copy of the model coordinates, so it must be a finite element field
+        if (self._projection_workers_count > 1) and self._model_coordinate_field.castFiniteElement().isValid():
+            parallel_projector = ParallelMeshProjector(projector, self._projection_workers_count)
+            element_identifiers, xis, distances = parallel_projector.project(
+                coordinates, previous_element_identifiers, previous_distances, self._measure_projection_speedup)
+            self._projection_report = parallel_projector.get_report()
+        else:
+            start_time = time.perf_counter()
+            element_identifiers, xis, distances = projector.project(
+                coordinates, previous_element_identifiers, previous_distances)
+            self._projection_report = {
+                'workers': 1,
+                'points': len(coordinates),
+                'serial_time': time.perf_counter() - start_time
+            }
+        self._previous_projections = (identifiers, element_identifiers, xis, distances)
+        self._assign_data_projections(identifiers, element_identifiers, xis)
+        self._ScaffoldFitter.setDataProjectionMeshLocationField(self._data_projection_location_field)
+
+    @profiled('fit_data')
+    def fit_data(self, iteration_callback=None, update_graphics=True):
+        """
+        Fit for up to the maximum number of iterations, one fitter iteration at a time, or for
+        the remaining iterations after resume_from_checkpoint(). With a schedule, each stage
+        fits a subset of the active datapoints, projected from where the previous stage left the
+        model, and iterations are counted through all stages.
 
-    def fit_data(self):
-        self._ScaffoldFitter.fit()
+        :param iteration_callback: Optional callable(iteration, iterations_count) called after each
+        iteration, which can return False to stop fitting before the next iteration.
+        :param update_graphics: If False, call update_post_fit_graphics() later, e.g. when fitting
+        outside the GUI thread.
+        """
+        stages = get_fit_stages(self._fit_settings)
+        if any(stage['points_fraction'] < 1.0 for stage in stages):
+            self._check_active_data_subset('Fitting a fraction of the datapoints')
+        self._check_fit_settings(stages)
+        # iterations are driven from here so they can be reported and stopped between; a fitter
+        # without setFitMaxIterations runs its own iterations in one fit(), counted as one here
+        if hasattr(self._ScaffoldFitter, 'setFitMaxIterations'):
+            self._ScaffoldFitter.setFitMaxIterations(1)
+        else:
+            stages = [dict(stage, max_iterations=1) for stage in stages]
+        scheduled = len(self._fit_settings['schedule']) > 0
+        iterations_count = sum(stage['max_iterations'] for stage in stages)
+        self._fit_telemetry = FitTelemetry()
+        first_iteration = self._resume_iteration + 1
+        self._resume_iteration = 0
+        if scheduled:
+            self._set_active_data_points(self._base_active_identifiers)
+            base_identifiers, base_coordinates = get_nodeset_coordinates(
+                self._data_coordinate_field, self._active_data_point_group_field.getNodesetGroup())
+        stage_last_iteration = 0
+        stop = False
+        # wall_time of each iteration is since fitting started, excluding telemetry evaluation
+        fit_start_time = time.perf_counter()
+        telemetry_time = 0.0
+        for stage in stages:
+            stage_first_iteration = max(stage_last_iteration + 1, first_iteration)
+            stage_last_iteration += stage['max_iterations']
+            if stage_first_iteration > stage_last_iteration:
+                continue
+            self._apply_fit_settings(stage)
+            if scheduled:
+                self._set_stage_data_points(base_identifiers, base_coordinates, stage['points_fraction'])
+                self.project_data()
+            for iteration in range(stage_first_iteration, stage_last_iteration + 1):
+                start_time = time.perf_counter()
+                self._ScaffoldFitter.fit()
+                end_time = time.perf_counter()
+                self._fitted = True
+                if self._fit_telemetry_enabled:
+                    self._record_fit_iteration(iteration, end_time - fit_start_time - telemetry_time,
+                                               end_time - start_time, stage)
+                    telemetry_time += time.perf_counter() - end_time
+                stop = (iteration_callback is not None) and \
+                    (iteration_callback(iteration, iterations_count) is False)
+                if self._checkpoint_filename and \
+                        (stop or (iteration == iterations_count) or (iteration % self._checkpoint_interval == 0)):
+                    self.write_checkpoint(self._checkpoint_filename, iteration)
+                if stop:
+                    break
+            if stop:
+                break
+        if scheduled:
+            self._set_active_data_points(self._base_active_identifiers)
+        if update_graphics:
+            self.update_post_fit_graphics()
+
+    def update_post_fit_graphics(self):
         self._show_post_fit_graphics()
 
+    def write_model(self, filename):
+        """
+        Write the scaffold nodes and elements with the fitted model coordinates to an EX file.
+        """
+        self.export_model(filename)
+
+    def export_model(self, filename, reference_coordinates=False, projections=False, compress=False):
+        """
+        Write the scaffold nodes and elements with the fitted model coordinates to an EX file,
+        streamed from the region so large meshes are not serialised in memory.
+
+        :param reference_coordinates: Also write the reference model coordinates fitting started from.
+        :param projections: Also write the datapoints with their coordinates and projection locations.
+        Only for the 'bvh' projection method, as the fitter's own projections are held in the fitter.
+        :param compress: If True, gzip compress the file.
+        :return: filename.
+        """
+        if projections and (self._projection_method != 'bvh'):
+            raise ValueError("Exporting projections needs the 'bvh' projection method")
+        field_names = [self._get_finite_element_model_coordinates('export model').getName()]
+        domain_types = Field.DOMAIN_TYPE_NODES | Field.DOMAIN_TYPE_MESH1D | Field.DOMAIN_TYPE_MESH2D | \
+            Field.DOMAIN_TYPE_MESH3D
+        if reference_coordinates:
+            field_names.append(self._model_reference_coordinate_field.getName())
+        if projections:
+            field_names += [self._data_coordinate_field.getName(), self._data_projection_location_field.getName()]
+            domain_types |= Field.DOMAIN_TYPE_DATAPOINTS
+        return write_region_fields(self._region, filename, field_names, domain_types, compress)
+
     def perturb_lines(self):
         if self._region is None:
             return False
@@ -0,0 +1,63 @@
+STAGE_KEYS = ('points_fraction', 'strain_penalty', 'edge_discontinuity_penalty', 'max_iterations')
+
+
+def get_fit_stages(fit_settings):
+    """
+    :param fit_settings: dict of 'strain_penalty', 'edge_discontinuity_penalty', 'max_iterations'
+    and optional 'schedule': list of stage dicts with any of STAGE_KEYS.
+    :return: List of complete stage dicts, with values missing from a stage taken from
+    fit_settings; a single stage using all points if there is no schedule.
+    """
+    schedule = fit_settings.get('schedule') or [{}]
+    stages = []
+    for stage in schedule:
+        complete_stage = {'points_fraction': 1.0}
+        for key in STAGE_KEYS[1:]:
+            complete_stage[key] = fit_settings[key]
+        complete_stage.update(stage)
+        stages.append(complete_stage)
+    return stages
+
+
+def parse_fit_schedule(text):
+    """
+    Parse a schedule of comma separated stages, each 'points_fraction:strain_penalty' optionally
+    followed by ':max_iterations', e.g. '0.05:0.1:5, 0.25:0.01:5, 1:0.001'. An empty
+    strain_penalty, as in '0.5::5', uses the fit settings' strain penalty. Points fractions below 1
+    need the 'bvh' projection method, as the fitter's own projection uses all datapoints.
+
+    :return: List of stage dicts.
+    """
+    schedule = []
+    for stage_text in text.split(','):
+        if not stage_text.strip():
+            continue
+        values = stage_text.split(':')
+        if not (2 <= len(values) <= 3):
+            raise ValueError('Invalid fit stage: ' + stage_text.strip())
+        stage = {
+            'points_fraction': float(values[0])
+        }
+        if values[1].strip():
+            stage['strain_penalty'] = float(values[1])
+        if not (0.0 < stage['points_fraction'] <= 1.0):
+            raise ValueError('Fit stage points fraction must be in (0, 1]: ' + stage_text.strip())
+        if len(values) == 3:
+            stage['max_iterations'] = int(values[2])
+        schedule.append(stage)
+    return schedule
+
+
+def format_fit_schedule(schedule):
+    """
+    :param schedule: List of stage dicts, any of which may omit keys other than points_fraction.
+    :return: Text in the format read by parse_fit_schedule().
+    """
+    stage_texts = []
+    for stage in schedule:
+        values = ['{:.4g}'.format(stage.get('points_fraction', 1.0)),
+                  '{:.4g}'.format(stage['strain_penalty']) if 'strain_penalty' in stage else '']
+        if 'max_iterations' in stage:
+            values.append(str(stage['max_iterations']))
+        stage_texts.append(':'.join(values))
+    return ', '.join(stage_texts)
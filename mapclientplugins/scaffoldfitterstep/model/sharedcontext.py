@@ -0,0 +1,25 @@
+from opencmiss.zinc.context import Context
+
+_shared_contexts = {}
+
+
+def get_shared_context(name):
+    """
+    Get the process-wide Zinc context with name, creating it on first use. Models sharing it
+    reuse its materials, glyphs and tessellations instead of defining them again.
+
+    :return: Zinc Context.
+    """
+    context = _shared_contexts.get(name)
+    if context is None:
+        context = Context(name)
+        _shared_contexts[name] = context
+    return context
+
+
+def reset_shared_contexts():
+    """
+    Forget all shared contexts, e.g. in a forked child process so it creates its own instead of
+    using copies of the parent's.
+    """
+    _shared_contexts.clear()
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+SIDECAR_EXTENSION = '.sfcache'
+SIDECAR_VERSION = 1
+
+
+def compute_file_hash(filename, block_size=1 << 20):
+    file_hash = hashlib.sha1()
+    with open(filename, 'rb') as stream:
+        for block in iter(lambda: stream.read(block_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+class PointCloudSidecar(object):
+    """
+    Binary cache of the datapoints parsed from a text point cloud file, stored as raw
+    identifiers and coordinates that later loads memory-map instead of parsing the text again.
+    The sidecar is valid while the source file's mtime and size are unchanged, or if its
+    content hash still matches after the mtime changes.
+    """
+
+    def __init__(self, filename, cache_dir=None):
+        self._filename = os.path.abspath(filename)
+        if cache_dir:
+            path_hash = hashlib.sha1(self._filename.encode('utf-8')).hexdigest()[:12]
+            base = os.path.join(cache_dir, os.path.basename(filename) + '-' + path_hash)
+        else:
+            base = self._filename
+        base += SIDECAR_EXTENSION
+        self._metadata_filename = base + '.json'
+        self._identifiers_filename = base + '.ids'
+        self._coordinates_filename = base + '.f64'
+        self._metadata = None
+        self._identifiers_stream = None
+        self._coordinates_stream = None
+        self._count = 0
+
+    def _source_stat(self):
+        stat = os.stat(self._filename)
+        return stat.st_mtime, stat.st_size
+
+    def _read_metadata(self):
+        try:
+            with open(self._metadata_filename, 'r') as stream:
+                metadata = json.load(stream)
+        except (IOError, OSError, ValueError):
+            return None
+        if metadata.get('version') != SIDECAR_VERSION:
+            return None
+        return metadata
+
+    def _write_metadata(self, metadata):
+        temporary_filename = self._metadata_filename + '.tmp'
+        with open(temporary_filename, 'w') as stream:
+            json.dump(metadata, stream, sort_keys=True, indent=4)
+        os.replace(temporary_filename, self._metadata_filename)
+
+    def is_valid(self):
+        metadata = self._read_metadata()
+        if metadata is None:
+            return False
+        mtime, size = self._source_stat()
+        if metadata['size'] != size:
+            return False
+        if metadata['mtime'] != mtime:
+            if metadata['hash'] != compute_file_hash(self._filename):
+                return False
+            metadata['mtime'] = mtime
+            try:
+                self._write_metadata(metadata)
+            except (IOError, OSError):
+                pass  # e.g. read-only cache directory; the content still matches, so hash again next time
+        self._metadata = metadata
+        return True
+
+    def load(self):
+        """
+        Call only after is_valid() returns True.
+
+        :return: field name, memory-mapped identifiers (N,) and coordinates (N, components).
+        """
+        count = self._metadata['count']
+        components_count = self._metadata['components_count']
+        if count == 0:
+            return self._metadata['field_name'], np.zeros((0,), np.int64), np.zeros((0, components_count))
+        identifiers = np.memmap(self._identifiers_filename, dtype='<i8', mode='r', shape=(count,))
+        coordinates = np.memmap(self._coordinates_filename, dtype='<f8', mode='r', shape=(count, components_count))
+        return self._metadata['field_name'], identifiers, coordinates
+
+    def begin_write(self, field_name, components_count):
+        self._metadata = {
+            'version': SIDECAR_VERSION,
+            'source': self._filename,
+            'field_name': field_name,
+            'components_count': components_count,
+        }
+        directory = os.path.dirname(self._metadata_filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        if os.path.exists(self._metadata_filename):
+            os.remove(self._metadata_filename)
+        self._count = 0
+        self._identifiers_stream = open(self._identifiers_filename, 'wb')
+        self._coordinates_stream = open(self._coordinates_filename, 'wb')
+
+    def append(self, identifiers, coordinates):
+        self._identifiers_stream.write(np.asarray(identifiers, dtype='<i8').tobytes())
+        self._coordinates_stream.write(np.asarray(coordinates, dtype='<f8').tobytes())
+        self._count += len(identifiers)
+
+    def end_write(self):
+        """
+        Close the data files and write the metadata, which marks the sidecar as complete.
+        """
+        self._identifiers_stream.close()
+        self._coordinates_stream.close()
+        self._identifiers_stream = None
+        self._coordinates_stream = None
+        mtime, size = self._source_stat()
+        self._metadata.update({
+            'count': self._count,
+            'mtime': mtime,
+            'size': size,
+            'hash': compute_file_hash(self._filename),
+        })
+        self._write_metadata(self._metadata)
+
+    def abort_write(self):
+        for stream in (self._identifiers_stream, self._coordinates_stream):
+            if stream is not None:
+                stream.close()
+        self._identifiers_stream = None
+        self._coordinates_stream = None
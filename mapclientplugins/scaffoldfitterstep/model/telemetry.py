@@ -0,0 +1,95 @@
+import csv
+import json
+
+from opencmiss.zinc.field import FieldEdgeDiscontinuity
+from opencmiss.zinc.status import OK as ZINC_OK
+
+TELEMETRY_KEYS = ('iteration', 'wall_time', 'fit_time', 'rms_error', 'max_error',
+                  'strain_penalty', 'edge_discontinuity_penalty')
+
+
+class FitTelemetry(object):
+    """
+    Records per-iteration fit measurements as dicts with TELEMETRY_KEYS. wall_time is seconds
+    since fitting started and fit_time seconds in the iteration's fit, neither including the time
+    spent evaluating telemetry.
+    """
+
+    def __init__(self):
+        self._records = []
+
+    def add(self, record):
+        self._records.append(record)
+
+    def get_records(self):
+        return self._records
+
+    def write_json(self, filename):
+        with open(filename, 'w') as stream:
+            json.dump(self._records, stream, indent=4)
+
+    def write_csv(self, filename):
+        with open(filename, 'w', newline='') as stream:
+            writer = csv.DictWriter(stream, fieldnames=TELEMETRY_KEYS)
+            writer.writeheader()
+            writer.writerows(self._records)
+
+    def write(self, filename):
+        """
+        Write as CSV if filename ends in .csv, otherwise as JSON.
+        """
+        if filename.lower().endswith('.csv'):
+            self.write_csv(filename)
+        else:
+            self.write_json(filename)
+
+
+class PenaltyEvaluator(object):
+    """
+    Evaluates the unweighted strain and edge discontinuity penalty integrals of the model
+    coordinates relative to the reference coordinates, or None where the mesh they are integrated
+    over is empty.
+    """
+
+    def __init__(self, model_coordinate_field, reference_coordinate_field, quadrature_points_count=4):
+        self._model_coordinate_field = model_coordinate_field
+        fm = model_coordinate_field.getFieldmodule()
+        fm.beginChange()
+        self._strain_integral = None
+        mesh3d = fm.findMeshByDimension(3)
+        if mesh3d.getSize() > 0:
+            # Green-Lagrange strain E = (F^T F - I) / 2, F = dx/dX
+            deformation_gradient = fm.createFieldGradient(model_coordinate_field, reference_coordinate_field)
+            right_cauchy_green = fm.createFieldMatrixMultiply(
+                3, fm.createFieldTranspose(3, deformation_gradient), deformation_gradient)
+            identity = fm.createFieldConstant([1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0])
+            strain = fm.createFieldMultiply(fm.createFieldSubtract(right_cauchy_green, identity),
+                                            fm.createFieldConstant([0.5] * 9))
+            strain_integral = fm.createFieldMeshIntegralSquares(strain, reference_coordinate_field, mesh3d)
+            strain_integral.setNumbersOfPoints([quadrature_points_count])
+            self._strain_integral = fm.createFieldSumComponents(strain_integral)
+        self._edge_integral = None
+        mesh1d = fm.findMeshByDimension(1)
+        if mesh1d.getSize() > 0:
+            edge_discontinuity = fm.createFieldEdgeDiscontinuity(model_coordinate_field)
+            edge_discontinuity.setMeasure(FieldEdgeDiscontinuity.MEASURE_C1)
+            edge_integral = fm.createFieldMeshIntegralSquares(edge_discontinuity, reference_coordinate_field, mesh1d)
+            edge_integral.setNumbersOfPoints([quadrature_points_count])
+            self._edge_integral = fm.createFieldSumComponents(edge_integral)
+        fm.endChange()
+        self._cache = fm.createFieldcache()
+
+    def get_model_coordinate_field(self):
+        return self._model_coordinate_field
+
+    def _evaluate(self, field):
+        if field is None:
+            return None
+        result, value = field.evaluateReal(self._cache, 1)
+        return value if result == ZINC_OK else None
+
+    def evaluate(self):
+        """
+        :return: strain penalty integral, edge discontinuity penalty integral.
+        """
+        return self._evaluate(self._strain_integral), self._evaluate(self._edge_integral)
@@ -0,0 +1,76 @@
+import math
+
+MIN_REFINEMENT = 1
+MAX_REFINEMENT = 12
+# finest refinement gives each tessellated element edge at least this many pixels on screen
+PIXELS_PER_SEGMENT = 6
+# upper limit on the triangles in one surface graphics
+TRIANGLES_BUDGET = 2000000
+# upper limit while the view is being interacted with; meshes within it keep their refinement
+INTERACTIVE_TRIANGLES_BUDGET = 200000
+
+
+def get_refinement(surface_elements_count, elements_across=None, screen_size=None,
+                   max_refinement=MAX_REFINEMENT, triangles_budget=TRIANGLES_BUDGET):
+    """
+    Choose a tessellation refinement keeping surface graphics within triangles_budget, and no
+    finer than is visible when the mesh spans screen_size pixels.
+
+    :param surface_elements_count: Number of 2D elements drawn by surface graphics.
+    :param elements_across: Approximate number of elements spanning the mesh.
+    :param screen_size: Approximate size of the mesh on screen in pixels, or None if unknown.
+    """
+    refinement = max_refinement
+    if surface_elements_count > 0:
+        refinement = min(refinement, int(math.sqrt(triangles_budget / (2.0 * surface_elements_count))))
+    if screen_size and elements_across:
+        refinement = min(refinement, int(screen_size / (elements_across * PIXELS_PER_SEGMENT)))
+    return max(MIN_REFINEMENT, refinement)
+
+
+class AdaptiveTessellation(object):
+    """
+    Sets the refinement of a tessellation from the mesh size and its size on screen, coarsening
+    large meshes to INTERACTIVE_TRIANGLES_BUDGET while the view is being interacted with.
+    """
+
+    def __init__(self, tessellation, refinement=MAX_REFINEMENT):
+        self._tessellation = tessellation
+        self._max_refinement = refinement
+        self._surface_elements_count = 0
+        self._elements_across = None
+        self._screen_size = None
+        self._interacting = False
+        self._refinement = None
+        self._update()
+
+    def get_refinement(self):
+        return self._refinement
+
+    def set_mesh(self, surface_elements_count, elements_across):
+        self._surface_elements_count = surface_elements_count
+        self._elements_across = elements_across
+        self._update()
+
+    def set_screen_size(self, screen_size):
+        """
+        :param screen_size: Approximate size of the mesh on screen in pixels, or None if unknown.
+        """
+        self._screen_size = screen_size
+        self._update()
+
+    def set_interacting(self, interacting):
+        self._interacting = interacting
+        self._update()
+
+    def _update(self):
+        refinement = get_refinement(self._surface_elements_count, self._elements_across, self._screen_size,
+                                    self._max_refinement)
+        if self._interacting:
+            refinement = min(refinement, get_refinement(self._surface_elements_count,
+                                                        max_refinement=self._max_refinement,
+                                                        triangles_budget=INTERACTIVE_TRIANGLES_BUDGET))
+        # changing refinement regenerates all graphics using the tessellation
+        if refinement != self._refinement:
+            self._refinement = refinement
+            self._tessellation.setRefinementFactors([refinement])
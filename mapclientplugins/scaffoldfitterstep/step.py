@@ -8,9 +8,10 @@ import os
 from PySide import QtGui
 
 from mapclient.mountpoints.workflowstep import WorkflowStepMountPoint
-from mapclientplugins.scaffoldfitterstep.configuredialog import ConfigureDialog
-from mapclientplugins.scaffoldfitterstep.model.master import MasterModel
-from mapclientplugins.scaffoldfitterstep.view.scaffoldfitterwidget import ScaffoldFitterWidget
+# only lightweight modules here: the MAP Client imports every plugin at startup, so the
+# fitting model, zinc and the view are imported when the step is first configured or executed
+from mapclientplugins.scaffoldfitterstep.model.graphicsmanager import DEFAULT_DISPLAY_POINT_BUDGET
+from mapclientplugins.scaffoldfitterstep.model.profiler import get_profiler
 
 
 class ScaffoldFitterStep(WorkflowStepMountPoint):
@@ -42,6 +43,18 @@ class ScaffoldFitterStep(WorkflowStepMountPoint):
         # Config:
         self._config = {}
         self._config['identifier'] = ''
+        self._config['cache_dir'] = ''
+        self._config['sidecar_cache'] = False
+        self._config['profile'] = False
+        self._config['result_cache'] = False
+        self._config['initial_geometry'] = ''
+        self._config['display_point_budget'] = DEFAULT_DISPLAY_POINT_BUDGET
+        self._config['export_reference_coordinates'] = False
+        self._config['export_projections'] = False
+        self._config['export_compressed'] = False
+        # align and fit settings of the last fitted scaffold, which key cached results on re-runs
+        self._config['fitted_settings'] = None
+        self._model = None
         self._view = None
 
     def execute(self):
@@ -51,15 +64,108 @@ class ScaffoldFitterStep(WorkflowStepMountPoint):
         may be connected up to a button in a widget for example.
         """
         # Put your execute step code here before calling the '_doneExecution' method.
-        if self._view is None:
-            context = 'Fitting'
-            scaffolfittermodel = MasterModel(context)
-            meshFile = 'D:\\sparc\\codes\\cmgui\\box_example\\figure8'
-            pointData = 'D:\\sparc\\codes\\cmgui\\box_example\\boxpoints.exdata'
-            self._view = ScaffoldFitterWidget(scaffolfittermodel, self._scaffoldDescription, self._pointCloudData)
-            self._view.register_done_execution(self._doneExecution)
-
-        self._setCurrentWidget(self._view)
+        profiler = get_profiler()
+        profiler.set_enabled(self._config.get('profile', False))
+        with profiler.span('ScaffoldFitterStep.execute'):
+            fitted_scaffold = self._get_cached_result()
+            if fitted_scaffold is not None:
+                self._fittedScaffold = fitted_scaffold
+                self._done_execution()
+                return
+            if self._view is None:
+                from mapclientplugins.scaffoldfitterstep.model.master import MasterModel
+                from mapclientplugins.scaffoldfitterstep.view.scaffoldfitterwidget import ScaffoldFitterWidget
+                context = 'Fitting'
+                scaffolfittermodel = MasterModel(context)
+                scaffolfittermodel.set_sidecar_cache(self._config['sidecar_cache'], self._config['cache_dir'])
+                scaffolfittermodel.set_checkpoint(self._get_checkpoint_filename())
+                scaffolfittermodel.set_initial_geometry(self._config.get('initial_geometry') or None)
+                scaffolfittermodel.set_display_settings(point_budget=self._config['display_point_budget'])
+                if self._config.get('export_projections', False):
+                    # only projections made outside the fitter can be exported
+                    scaffolfittermodel.set_projection_method('bvh')
+                meshFile = 'D:\\sparc\\codes\\cmgui\\box_example\\figure8'
+                pointData = 'D:\\sparc\\codes\\cmgui\\box_example\\boxpoints.exdata'
+                self._model = scaffolfittermodel
+                self._view = ScaffoldFitterWidget(scaffolfittermodel, self._scaffoldDescription, self._pointCloudData)
+                self._view.register_done_execution(self._fit_done)
+
+            self._setCurrentWidget(self._view)
+
+    def _get_cache_directory(self):
+        return self._config['cache_dir'] or self._location
+
+    def _get_profile_filename(self):
+        return os.path.join(self._get_cache_directory(), self._config['identifier'] + '.trace.json')
+
+    def _get_checkpoint_filename(self):
+        return os.path.join(self._get_cache_directory(), self._config['identifier'] + '.checkpoint.npz')
+
+    def _get_export_settings(self):
+        return {
+            'reference_coordinates': self._config.get('export_reference_coordinates', False),
+            'projections': self._config.get('export_projections', False),
+            'compress': self._config.get('export_compressed', False)
+        }
+
+    def _get_export_extension(self):
+        return '.exf.gz' if self._config.get('export_compressed') else '.exf'
+
+    def _get_export_filename(self):
+        return os.path.join(self._get_cache_directory(), self._config['identifier'] + '.fitted' +
+                            self._get_export_extension())
+
+    def _export_fitted_scaffold(self, filename):
+        return self._model.export_model(filename, **self._get_export_settings())
+
+    def _get_result_cache(self):
+        from mapclientplugins.scaffoldfitterstep.model.resultcache import FittedResultCache
+        return FittedResultCache(os.path.join(self._get_cache_directory(), 'fitted_results'))
+
+    def _get_inputs_hash(self, fitted_settings):
+        from mapclientplugins.scaffoldfitterstep.model.resultcache import compute_inputs_hash
+        return compute_inputs_hash(self._pointCloudData, self._scaffoldDescription.get_scaffold_description(),
+                                   fitted_settings['align'], fitted_settings['fit'],
+                                   self._config.get('initial_geometry') or None, self._get_export_settings())
+
+    def _get_cached_result(self):
+        """
+        :return: file_location of the cached fitted scaffold for the current port data and the
+        settings of the last fit, or None if not cached.
+        """
+        fitted_settings = self._config.get('fitted_settings')
+        if (not self._config.get('result_cache')) or (fitted_settings is None):
+            return None
+        return self._get_result_cache().get(self._get_inputs_hash(fitted_settings), self._get_export_extension())
+
+    def _fit_done(self):
+        if not self._model.is_fitted():
+            # nothing to export or cache, and an earlier result does not match the port data
+            self._fittedScaffold = None
+        elif self._config.get('result_cache'):
+            fitted_settings = {
+                'align': self._model.get_align_settings(),
+                'fit': self._model.get_fit_settings()
+            }
+            self._fittedScaffold = self._get_result_cache().add(
+                self._get_inputs_hash(fitted_settings), self._export_fitted_scaffold, self._get_export_extension())
+            self._config['fitted_settings'] = fitted_settings
+        else:
+            self._fittedScaffold = self._export_fitted_scaffold(self._get_export_filename())
+        self._done_execution()
+
+    def _done_execution(self):
+        profiler = get_profiler()
+        if profiler.is_enabled():
+            profiler.write_trace(self._get_profile_filename())
+            profiler.clear()
+        # the next execution builds a new model in the shared context from the port data then
+        if self._model is not None:
+            self._view.done()
+            self._model.done()
+            self._model = None
+            self._view = None
+        self._doneExecution()
 
     def setPortData(self, index, dataIn):
         """
@@ -93,6 +199,7 @@ class ScaffoldFitterStep(WorkflowStepMountPoint):
         then set:
             self._configured = True
         """
+        from mapclientplugins.scaffoldfitterstep.configuredialog import ConfigureDialog
         dlg = ConfigureDialog(self._main_window)
         dlg.identifierOccursCount = self._identifierOccursCount
         dlg.setConfig(self._config)
@@ -100,7 +207,7 @@ class ScaffoldFitterStep(WorkflowStepMountPoint):
         dlg.setModal(True)
 
         if dlg.exec_():
-            self._config = dlg.getConfig()
+            self._config.update(dlg.getConfig())
 
         self._configured = dlg.validate()
         self._configuredObserver()
@@ -133,6 +240,7 @@ class ScaffoldFitterStep(WorkflowStepMountPoint):
         """
         self._config.update(json.loads(string))
 
+        from mapclientplugins.scaffoldfitterstep.configuredialog import ConfigureDialog
         d = ConfigureDialog()
         d.identifierOccursCount = self._identifierOccursCount
         d.setConfig(self._config)
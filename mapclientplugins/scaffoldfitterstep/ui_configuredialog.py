@@ -32,6 +32,56 @@ class Ui_ConfigureDialog(object):
         self.lineEdit1 = QtGui.QLineEdit(self.configGroupBox)
         self.lineEdit1.setObjectName("lineEdit1")
         self.formLayout.setWidget(1, QtGui.QFormLayout.FieldRole, self.lineEdit1)
+        self.label2 = QtGui.QLabel(self.configGroupBox)
+        self.label2.setObjectName("label2")
+        self.formLayout.setWidget(2, QtGui.QFormLayout.LabelRole, self.label2)
+        self.checkBox2 = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBox2.setObjectName("checkBox2")
+        self.formLayout.setWidget(2, QtGui.QFormLayout.FieldRole, self.checkBox2)
+        self.label3 = QtGui.QLabel(self.configGroupBox)
+        self.label3.setObjectName("label3")
+        self.formLayout.setWidget(3, QtGui.QFormLayout.LabelRole, self.label3)
+        self.checkBox3 = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBox3.setObjectName("checkBox3")
+        self.formLayout.setWidget(3, QtGui.QFormLayout.FieldRole, self.checkBox3)
+        self.label4 = QtGui.QLabel(self.configGroupBox)
+        self.label4.setObjectName("label4")
+        self.formLayout.setWidget(4, QtGui.QFormLayout.LabelRole, self.label4)
+        self.checkBox4 = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBox4.setObjectName("checkBox4")
+        self.formLayout.setWidget(4, QtGui.QFormLayout.FieldRole, self.checkBox4)
+        self.label5 = QtGui.QLabel(self.configGroupBox)
+        self.label5.setObjectName("label5")
+        self.formLayout.setWidget(5, QtGui.QFormLayout.LabelRole, self.label5)
+        self.lineEdit5 = QtGui.QLineEdit(self.configGroupBox)
+        self.lineEdit5.setObjectName("lineEdit5")
+        self.formLayout.setWidget(5, QtGui.QFormLayout.FieldRole, self.lineEdit5)
+        self.label6 = QtGui.QLabel(self.configGroupBox)
+        self.label6.setObjectName("label6")
+        self.formLayout.setWidget(6, QtGui.QFormLayout.LabelRole, self.label6)
+        self.spinBox6 = QtGui.QSpinBox(self.configGroupBox)
+        self.spinBox6.setMaximum(100000000)
+        self.spinBox6.setSingleStep(10000)
+        self.spinBox6.setObjectName("spinBox6")
+        self.formLayout.setWidget(6, QtGui.QFormLayout.FieldRole, self.spinBox6)
+        self.label7 = QtGui.QLabel(self.configGroupBox)
+        self.label7.setObjectName("label7")
+        self.formLayout.setWidget(7, QtGui.QFormLayout.LabelRole, self.label7)
+        self.checkBox7 = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBox7.setObjectName("checkBox7")
+        self.formLayout.setWidget(7, QtGui.QFormLayout.FieldRole, self.checkBox7)
+        self.label8 = QtGui.QLabel(self.configGroupBox)
+        self.label8.setObjectName("label8")
+        self.formLayout.setWidget(8, QtGui.QFormLayout.LabelRole, self.label8)
+        self.checkBox8 = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBox8.setObjectName("checkBox8")
+        self.formLayout.setWidget(8, QtGui.QFormLayout.FieldRole, self.checkBox8)
+        self.label9 = QtGui.QLabel(self.configGroupBox)
+        self.label9.setObjectName("label9")
+        self.formLayout.setWidget(9, QtGui.QFormLayout.LabelRole, self.label9)
+        self.checkBox9 = QtGui.QCheckBox(self.configGroupBox)
+        self.checkBox9.setObjectName("checkBox9")
+        self.formLayout.setWidget(9, QtGui.QFormLayout.FieldRole, self.checkBox9)
         self.gridLayout.addWidget(self.configGroupBox, 0, 0, 1, 1)
         self.buttonBox = QtGui.QDialogButtonBox(ConfigureDialog)
         self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
@@ -47,5 +97,16 @@ class Ui_ConfigureDialog(object):
     def retranslateUi(self, ConfigureDialog):
         ConfigureDialog.setWindowTitle(QtGui.QApplication.translate("ConfigureDialog", "Configure Step", None, QtGui.QApplication.UnicodeUTF8))
         self.label0.setText(QtGui.QApplication.translate("ConfigureDialog", "identifier:  ", None, QtGui.QApplication.UnicodeUTF8))
-        self.label1.setText(QtGui.QApplication.translate("ConfigureDialog", ":  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.label1.setText(QtGui.QApplication.translate("ConfigureDialog", "cache directory:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.lineEdit1.setPlaceholderText(QtGui.QApplication.translate("ConfigureDialog", "next to the data files", None, QtGui.QApplication.UnicodeUTF8))
+        self.label2.setText(QtGui.QApplication.translate("ConfigureDialog", "cache point clouds:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.label3.setText(QtGui.QApplication.translate("ConfigureDialog", "profile stages:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.label4.setText(QtGui.QApplication.translate("ConfigureDialog", "cache fitted results:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.label5.setText(QtGui.QApplication.translate("ConfigureDialog", "initial geometry:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.lineEdit5.setPlaceholderText(QtGui.QApplication.translate("ConfigureDialog", "undeformed scaffold", None, QtGui.QApplication.UnicodeUTF8))
+        self.label6.setText(QtGui.QApplication.translate("ConfigureDialog", "display point budget:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.spinBox6.setSpecialValueText(QtGui.QApplication.translate("ConfigureDialog", "all points", None, QtGui.QApplication.UnicodeUTF8))
+        self.label7.setText(QtGui.QApplication.translate("ConfigureDialog", "export reference coordinates:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.label8.setText(QtGui.QApplication.translate("ConfigureDialog", "export data projections:  ", None, QtGui.QApplication.UnicodeUTF8))
+        self.label9.setText(QtGui.QApplication.translate("ConfigureDialog", "compress export (gzip):  ", None, QtGui.QApplication.UnicodeUTF8))
 
@@ -0,0 +1,35 @@
+import traceback
+
+from PySide import QtCore
+
+
+class ModelTask(QtCore.QThread):
+    """
+    Runs a long model operation off the GUI thread. The function is called with this task, whose
+    report_progress method can be passed to the model as an iteration callback: it emits progress
+    and returns False once the task is cancelled, so the model stops between iterations.
+    """
+
+    progress = QtCore.Signal(int, int)
+    failed = QtCore.Signal(str)
+
+    def __init__(self, function, parent=None):
+        super(ModelTask, self).__init__(parent)
+        self._function = function
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def report_progress(self, iteration, iterations_count):
+        self.progress.emit(iteration, iterations_count)
+        return not self._cancelled
+
+    def run(self):
+        try:
+            self._function(self)
+        except Exception:
+            self.failed.emit(traceback.format_exc())
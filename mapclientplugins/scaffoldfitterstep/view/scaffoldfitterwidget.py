@@ -1,7 +1,11 @@
+import math
+import os
+
 from PySide import QtGui, QtCore
-from opencmiss.zinc.field import Field
 from functools import partial
 
+from ..model.schedule import format_fit_schedule, parse_fit_schedule
+from .modeltask import ModelTask
 from .ui_scaffoldfitterwidget import Ui_ScaffoldfitterWidget
 
 from opencmiss.zinchandlers.scenemanipulation import SceneManipulation
@@ -9,22 +13,17 @@ from opencmiss.zincwidgets.basesceneviewerwidget import BaseSceneviewerWidget
 
 # from scaffoldmaker.scaffoldpackage import ScaffoldPackage
 
-
-def _read_model_description(region, description):
-    stream_information = region.createStreaminformationRegion()
-    memory_resource = stream_information.createStreamresourceMemoryBuffer(description['elements3D'])
-    stream_information.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_MESH3D)
-    memory_resource = stream_information.createStreamresourceMemoryBuffer(description['elements2D'])
-    stream_information.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_MESH2D)
-    memory_resource = stream_information.createStreamresourceMemoryBuffer(description['elements1D'])
-    stream_information.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_MESH1D)
-    memory_resource = stream_information.createStreamresourceMemoryBuffer(description['nodes'])
-    stream_information.setResourceDomainTypes(memory_resource, Field.DOMAIN_TYPE_NODES)
-    return stream_information
+# milliseconds after the last view interaction before restoring full quality tessellation
+VIEW_IDLE_DELAY = 300
+# milliseconds between releasing graphics hidden for longer than the model's release delay
+GRAPHICS_RELEASE_INTERVAL = 60000
 
 
 class ScaffoldFitterWidget(QtGui.QWidget):
 
+    # emitted by the model's align settings callback, which may run in a model task thread
+    align_settings_changed = QtCore.Signal()
+
     def __init__(self, model, scaffold_description_model, point_cloud, parent=None):
         super(ScaffoldFitterWidget, self).__init__(parent)
         self._model = model
@@ -35,7 +34,6 @@ class ScaffoldFitterWidget(QtGui.QWidget):
 
         self._scaffold_description_model = scaffold_description_model
         self._scaffold_description = self._scaffold_description_model.get_scaffold_description()
-        self._scaffold_stream_information = _read_model_description(self._region, self._scaffold_description)
         self._scaffold_name = self._scaffold_description_model.get_model_name()
         self._scaffold_species = self._scaffold_description_model.get_model_species()
         self._scaffold_params = self._scaffold_description_model.get_parameters()
@@ -48,10 +46,12 @@ class ScaffoldFitterWidget(QtGui.QWidget):
         self._scene = None
         self._callback = None
         self._done_callback = None
+        self._task = None
         self._settings = {'view-parameters': {}}
         self._initialise()
 
-        self._model.set_align_settings_change_callback(self._align_settings_display)
+        self.align_settings_changed.connect(self._align_settings_display)
+        self._model.set_align_settings_change_callback(self.align_settings_changed.emit)
         self._model.get_initial_scale()
 
         self._ui.sceneviewerWidget.set_context(model.get_context())
@@ -67,6 +67,16 @@ class ScaffoldFitterWidget(QtGui.QWidget):
         # general connections
         self._ui.sceneviewerWidget.graphics_initialized.connect(self._graphics_initialized)
         self._ui.overlaySceneviewerWidget.graphics_initialized.connect(self._graphics_initialized)
+        self._view_idle_timer = QtCore.QTimer(self)
+        self._view_idle_timer.setSingleShot(True)
+        self._view_idle_timer.setInterval(VIEW_IDLE_DELAY)
+        self._view_idle_timer.timeout.connect(self._view_idle)
+        self._graphics_release_timer = QtCore.QTimer(self)
+        self._graphics_release_timer.setInterval(GRAPHICS_RELEASE_INTERVAL)
+        self._graphics_release_timer.timeout.connect(self._release_hidden_graphics)
+        self._graphics_release_timer.start()
+        self._ui.sceneviewerWidget.installEventFilter(self)
+        self._ui.overlaySceneviewerWidget.installEventFilter(self)
         self._ui.doneButton.clicked.connect(self._done_clicked)
         self._ui.viewAllButton.clicked.connect(self._view_all)
 
@@ -75,6 +85,7 @@ class ScaffoldFitterWidget(QtGui.QWidget):
         self._ui.parameterSet_label.setText(self._scaffold_species)
         self._ui.displayAnnotationPoints_checkBox.clicked.connect(self._display_annotation_points_clicked)
         self._ui.displayAxes_checkBox.clicked.connect(self._display_axes_clicked)
+        self._ui.displayDataFullResolution_checkBox.clicked.connect(self._display_data_full_resolution_clicked)
         self._ui.displayElementAxes_checkBox.clicked.connect(self._display_element_axes_clicked)
         self._ui.displayElementNumbers_checkBox.clicked.connect(self._display_element_numbers_clicked)
         self._ui.displayLines_checkBox.clicked.connect(self._display_lines_clicked)
@@ -97,13 +108,20 @@ class ScaffoldFitterWidget(QtGui.QWidget):
         # rigid alignment page connections
         self._ui.yz_radioButton.clicked.connect(self._swap_yz_clicked)
         self._ui.alignAutoCentreButton.clicked.connect(self._auto_align_button_clicked)
+        self._ui.alignIcpButton.clicked.connect(self._icp_align_button_clicked)
         self._ui.alignResetButton.clicked.connect(self._reset_clicked)
 
         # Smooth fitting page connections
         self._ui.projectPointsButton.clicked.connect(self._project_clicked)
+        self._ui.projectClearButton.clicked.connect(self._project_clear_clicked)
         self._ui.fitPerformButton.clicked.connect(self._fit_clicked)
+        self._ui.fitCancelButton.clicked.connect(self._cancel_clicked)
+        self._ui.fitResumeButton.clicked.connect(self._fit_resume_clicked)
 
     def _done_clicked(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task.wait()
         self._done_callback()
 
     def _custom_parameters_change(self):
@@ -113,13 +131,14 @@ class ScaffoldFitterWidget(QtGui.QWidget):
         self._model.initialise_region(self._scaffold_model_parent_region)
 
     def _initialise(self):
-        self._model.initialise(self._point_cloud, self._scaffold_stream_information)
+        self._model.initialise(self._point_cloud, self._scaffold_description)
         self._setup_ui()
         # self._graphics_initialized()
 
     def _setup_ui(self):
         self._ui.toolBox.setCurrentIndex(0)
         self._align_settings_display()
+        self._fit_settings_display()
 
     def set_settings(self, settings):
         self._settings.update(settings)
@@ -164,6 +183,7 @@ class ScaffoldFitterWidget(QtGui.QWidget):
                 angle = self._settings['view-parameters']['angle']
                 sender.set_view_parameters(eye, look_at, up, angle)
                 self._view_all()
+            self._view_idle_timer.start()
 
     def _setup_handlers(self):
         basic_handler = SceneManipulation()
@@ -177,7 +197,10 @@ class ScaffoldFitterWidget(QtGui.QWidget):
             self._yz = True
 
     def _auto_align_button_clicked(self):
-        self._model.auto_align_model_on_data()
+        self._run_task(lambda task: self._model.auto_align_model_on_data())
+
+    def _icp_align_button_clicked(self):
+        self._run_task(lambda task: self._model.icp_align_model_on_data(mirror=None))
 
     def _reset_clicked(self):
         self._model.reset_clicked()
@@ -195,6 +218,28 @@ class ScaffoldFitterWidget(QtGui.QWidget):
         self._ui.alignMirrorCheckBox.setCheckState(
             QtCore.Qt.Checked if self._model.is_align_mirror() else QtCore.Qt.Unchecked)
 
+    def _fit_settings_display(self):
+        fit_settings = self._model.get_fit_settings()
+        self._display_real(self._ui.fitStrainPenaltyLineEdit, fit_settings['strain_penalty'])
+        self._display_real(self._ui.fitEdgeDiscontinuityPenaltyLineEdit, fit_settings['edge_discontinuity_penalty'])
+        self._ui.fitMaxIterationsSpinBox.setValue(fit_settings['max_iterations'])
+        self._ui.fitScheduleLineEdit.setText(format_fit_schedule(fit_settings['schedule']))
+
+    def _set_fit_settings_from_ui(self):
+        """
+        :return: True if the fit settings entered are valid and have been set, otherwise False.
+        """
+        try:
+            strain_penalty = float(self._ui.fitStrainPenaltyLineEdit.text())
+            edge_discontinuity_penalty = float(self._ui.fitEdgeDiscontinuityPenaltyLineEdit.text())
+            schedule = parse_fit_schedule(self._ui.fitScheduleLineEdit.text())
+        except ValueError as error:
+            QtGui.QMessageBox.warning(self, 'Scaffold Fitter', 'Invalid fit settings: ' + str(error))
+            return False
+        self._model.set_fit_settings(strain_penalty, edge_discontinuity_penalty,
+                                     self._ui.fitMaxIterationsSpinBox.value(), schedule)
+        return True
+
     def _display_real(self, widget, value):
         new_text = '{:.4g}'.format(value)
         widget.setText(new_text)
@@ -203,6 +248,38 @@ class ScaffoldFitterWidget(QtGui.QWidget):
         new_text = ", ".join(number_format.format(value) for value in values)
         widget.setText(new_text)
 
+    # overriding the QObject method
+    def eventFilter(self, source, event):
+        """
+        Draw with a coarse tessellation while a sceneviewer is being rotated, panned or zoomed.
+        The tessellation is left alone while a model task runs, and updated when it finishes.
+        """
+        if self._task is None:
+            event_type = event.type()
+            if ((event_type == QtCore.QEvent.MouseMove) and (event.buttons() != QtCore.Qt.NoButton)) or \
+                    (event_type == QtCore.QEvent.Wheel):
+                self._model.set_view_interacting(True)
+                self._view_idle_timer.start()
+            elif event_type in (QtCore.QEvent.MouseButtonRelease, QtCore.QEvent.Resize):
+                self._view_idle_timer.start()
+        return super(ScaffoldFitterWidget, self).eventFilter(source, event)
+
+    def _view_idle(self):
+        if self._task is not None:
+            return
+        sceneviewer_widget = self._ui.sceneviewerWidget
+        if sceneviewer_widget.get_zinc_sceneviewer() is not None:
+            eye, look_at, up, angle = sceneviewer_widget.getViewParameters()
+            distance = math.sqrt(sum((eye[i] - look_at[i]) ** 2 for i in range(3)))
+            view_extent = 2.0 * distance * math.tan(0.5 * angle)
+            self._model.set_view_size(min(sceneviewer_widget.width(), sceneviewer_widget.height()), view_extent)
+        self._model.set_view_interacting(False)
+
+    def _release_hidden_graphics(self):
+        # scene changes are held while a model task runs
+        if self._task is None:
+            self._model.release_hidden_graphics()
+
     # overriding the QWidget method
     def keyPressEvent(self, event):
         if (event.key() == QtCore.Qt.Key_S) and (event.isAutoRepeat() == False):
@@ -222,6 +299,23 @@ class ScaffoldFitterWidget(QtGui.QWidget):
     def get_model(self):
         return self._model
 
+    def done(self):
+        """
+        Release the model, region and scene held by the widget and its sceneviewers, so they can
+        be freed with the model.
+        """
+        self._view_idle_timer.stop()
+        self._graphics_release_timer.stop()
+        empty_scene = self._model.get_context().getDefaultRegion().getScene()
+        for sceneviewer_widget in (self._ui.sceneviewerWidget, self._ui.overlaySceneviewerWidget):
+            sceneviewer_widget.removeEventFilter(self)
+            sceneviewer = sceneviewer_widget.get_zinc_sceneviewer()
+            if sceneviewer is not None:
+                sceneviewer.setScene(empty_scene)
+        self._scene = None
+        self._region = None
+        self._model = None
+
     def register_done_execution(self, done_callback):
         self._done_callback = done_callback
 
@@ -293,6 +387,9 @@ class ScaffoldFitterWidget(QtGui.QWidget):
     def _display_axes_clicked(self):
         self._model.show_axes(self._ui.displayAxes_checkBox.isChecked())
 
+    def _display_data_full_resolution_clicked(self):
+        self._model.set_display_full_resolution(self._ui.displayDataFullResolution_checkBox.isChecked())
+
     def _display_element_axes_clicked(self):
         self._generator_model.setDisplayElementAxes(self._ui.displayElementAxes_checkBox.isChecked())
 
@@ -360,9 +457,89 @@ class ScaffoldFitterWidget(QtGui.QWidget):
             self._ui.sceneviewerWidget.view_all()
         if self._ui.overlaySceneviewerWidget.get_zinc_sceneviewer() is not None:
             self._ui.overlaySceneviewerWidget.view_all()
+        self._view_idle_timer.start()
+
+    def _task_controls(self):
+        """
+        :return: Widgets disabled while a model task runs, as their actions change the model or
+        its graphics. The fit progress bar and cancel button stay enabled.
+        """
+        return [self._ui.displayOptions_groupBox, self._ui.alignSettingsGroupBox, self._ui.alignResetButton,
+                self._ui.groupBoxProjectData, self._ui.filterDataGroupBox, self._ui.fitSettingsLoadSaveWidgets,
+                self._ui.fitStrainPenaltyLineEdit, self._ui.fitEdgeDiscontinuityPenaltyLineEdit,
+                self._ui.fitMaxIterationsSpinBox, self._ui.fitScheduleLineEdit, self._ui.fitPerformButton,
+                self._ui.fitResumeButton, self._ui.doneButton]
+
+    def _run_task(self, function, iterations_count=0, finished_callback=None):
+        """
+        Run function(task) in a model task thread. Scene changes are held until it finishes so the
+        sceneviewers keep drawing the previous graphics meanwhile.
+
+        :param iterations_count: Number of iterations reported by the task, or 0 for busy progress.
+        :param finished_callback: Optional callable run in the GUI thread after the task finishes.
+        """
+        if self._task is not None:
+            return
+        self._model.get_scene().beginChange()
+        for control in self._task_controls():
+            control.setEnabled(False)
+        self._ui.fitCancelButton.setEnabled(iterations_count > 0)
+        self._ui.fitProgressBar.setRange(0, iterations_count)
+        self._ui.fitProgressBar.setValue(0)
+        self._task = ModelTask(function, self)
+        self._task.progress.connect(self._task_progress)
+        self._task.failed.connect(self._task_failed)
+        self._task.finished.connect(partial(self._task_finished, finished_callback))
+        self._task.start()
+
+    def _task_progress(self, iteration, iterations_count):
+        self._ui.fitProgressBar.setRange(0, iterations_count)
+        self._ui.fitProgressBar.setValue(iteration)
+
+    def _task_failed(self, message):
+        QtGui.QMessageBox.warning(self, 'Scaffold Fitter', message)
+
+    def _task_finished(self, finished_callback):
+        self._task = None
+        if finished_callback is not None:
+            finished_callback()
+        self._model.get_scene().endChange()
+        for control in self._task_controls():
+            control.setEnabled(True)
+        # catch up with any view changes made during the task
+        self._view_idle_timer.start()
+        self._ui.fitCancelButton.setEnabled(False)
+        self._ui.fitProgressBar.setRange(0, 1)
+        self._ui.fitProgressBar.setValue(0)
+
+    def _cancel_clicked(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._ui.fitCancelButton.setEnabled(False)
 
     def _project_clicked(self):
-        self._model.project_data()
+        self._run_task(lambda task: self._model.project_data())
+
+    def _project_clear_clicked(self):
+        self._model.clear_projections()
 
     def _fit_clicked(self):
-        self._model.fit_scaffold()
+        if not self._set_fit_settings_from_ui():
+            return
+        # the progress range is updated to the total iterations of any schedule once fitting starts
+        iterations_count = self._ui.fitMaxIterationsSpinBox.value()
+        self._run_task(lambda task: self._model.fit_scaffold(task.report_progress, update_graphics=False),
+                       iterations_count, self._model.update_post_fit_graphics)
+
+    def _fit_resume_clicked(self):
+        checkpoint_filename = self._model.get_checkpoint_filename()
+        if not (checkpoint_filename and os.path.isfile(checkpoint_filename)):
+            QtGui.QMessageBox.information(self, 'Scaffold Fitter', 'There is no checkpoint to resume from.')
+            return
+
+        def _resume_fit(task):
+            self._model.resume_from_checkpoint(checkpoint_filename)
+            self._model.fit_scaffold(task.report_progress, update_graphics=False)
+
+        # the progress range is set from the checkpoint's fit settings once fitting starts
+        self._run_task(_resume_fit, 1, self._model.update_post_fit_graphics)
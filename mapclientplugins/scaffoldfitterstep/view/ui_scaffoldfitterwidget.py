@@ -232,6 +232,9 @@ class Ui_ScaffoldfitterWidget(object):
         self.alignLoadButton.setEnabled(True)
         self.alignLoadButton.setObjectName("alignLoadButton")
         self.gridLayout.addWidget(self.alignLoadButton, 0, 1, 1, 1)
+        self.alignIcpButton = QtGui.QPushButton(self.alignLoadSaveWidgets)
+        self.alignIcpButton.setObjectName("alignIcpButton")
+        self.gridLayout.addWidget(self.alignIcpButton, 1, 0, 1, 2)
         self.verticalLayout_7.addWidget(self.alignLoadSaveWidgets)
         self.alignScaleWidgets = QtGui.QWidget(self.alignSettingsGroupBox)
         sizePolicy = QtGui.QSizePolicy(QtGui.QSizePolicy.Preferred, QtGui.QSizePolicy.Fixed)
@@ -383,6 +386,17 @@ class Ui_ScaffoldfitterWidget(object):
         self.fitPerformButton = QtGui.QPushButton(self.fitSettingsWidget)
         self.fitPerformButton.setObjectName("fitPerformButton")
         self.formLayout_2.setWidget(5, QtGui.QFormLayout.SpanningRole, self.fitPerformButton)
+        self.fitProgressBar = QtGui.QProgressBar(self.fitSettingsWidget)
+        self.fitProgressBar.setProperty("value", 0)
+        self.fitProgressBar.setObjectName("fitProgressBar")
+        self.formLayout_2.setWidget(6, QtGui.QFormLayout.SpanningRole, self.fitProgressBar)
+        self.fitCancelButton = QtGui.QPushButton(self.fitSettingsWidget)
+        self.fitCancelButton.setEnabled(False)
+        self.fitCancelButton.setObjectName("fitCancelButton")
+        self.formLayout_2.setWidget(7, QtGui.QFormLayout.SpanningRole, self.fitCancelButton)
+        self.fitResumeButton = QtGui.QPushButton(self.fitSettingsWidget)
+        self.fitResumeButton.setObjectName("fitResumeButton")
+        self.formLayout_2.setWidget(8, QtGui.QFormLayout.SpanningRole, self.fitResumeButton)
         self.fitMaxIterationsLabel = QtGui.QLabel(self.fitSettingsWidget)
         self.fitMaxIterationsLabel.setObjectName("fitMaxIterationsLabel")
         self.formLayout_2.setWidget(2, QtGui.QFormLayout.LabelRole, self.fitMaxIterationsLabel)
@@ -398,6 +412,12 @@ class Ui_ScaffoldfitterWidget(object):
         self.fitMaxIterationsSpinBox.setProperty("value", 1)
         self.fitMaxIterationsSpinBox.setObjectName("fitMaxIterationsSpinBox")
         self.formLayout_2.setWidget(2, QtGui.QFormLayout.FieldRole, self.fitMaxIterationsSpinBox)
+        self.fitScheduleLabel = QtGui.QLabel(self.fitSettingsWidget)
+        self.fitScheduleLabel.setObjectName("fitScheduleLabel")
+        self.formLayout_2.setWidget(3, QtGui.QFormLayout.LabelRole, self.fitScheduleLabel)
+        self.fitScheduleLineEdit = QtGui.QLineEdit(self.fitSettingsWidget)
+        self.fitScheduleLineEdit.setObjectName("fitScheduleLineEdit")
+        self.formLayout_2.setWidget(3, QtGui.QFormLayout.FieldRole, self.fitScheduleLineEdit)
         self.verticalLayout_6.addWidget(self.fitSettingsWidget)
         self.verticalLayout_4.addWidget(self.fitSettingsGroupBox)
         spacerItem3 = QtGui.QSpacerItem(20, 40, QtGui.QSizePolicy.Minimum, QtGui.QSizePolicy.Expanding)
@@ -603,6 +623,9 @@ class Ui_ScaffoldfitterWidget(object):
         self.displayAnnotationPoints_checkBox = QtGui.QCheckBox(self.displayMisc_frame)
         self.displayAnnotationPoints_checkBox.setObjectName("displayAnnotationPoints_checkBox")
         self.horizontalLayout_8.addWidget(self.displayAnnotationPoints_checkBox)
+        self.displayDataFullResolution_checkBox = QtGui.QCheckBox(self.displayMisc_frame)
+        self.displayDataFullResolution_checkBox.setObjectName("displayDataFullResolution_checkBox")
+        self.horizontalLayout_8.addWidget(self.displayDataFullResolution_checkBox)
         spacerItem9 = QtGui.QSpacerItem(40, 20, QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Minimum)
         self.horizontalLayout_8.addItem(spacerItem9)
         self.verticalLayout_9.addWidget(self.displayMisc_frame)
@@ -673,6 +696,8 @@ class Ui_ScaffoldfitterWidget(object):
         self.alignAutoCentreButton.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Align Scaffold To Data", None, QtGui.QApplication.UnicodeUTF8))
         self.alignLoadButton.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Load pre-saved alignment settings", None, QtGui.QApplication.UnicodeUTF8))
         self.alignLoadButton.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Load Settings", None, QtGui.QApplication.UnicodeUTF8))
+        self.alignIcpButton.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Refine the alignment by iterative closest point, with scaling and trying mirroring", None, QtGui.QApplication.UnicodeUTF8))
+        self.alignIcpButton.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Refine Alignment (ICP)", None, QtGui.QApplication.UnicodeUTF8))
         self.alignScaleLabel.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Scale:", None, QtGui.QApplication.UnicodeUTF8))
         self.alignScaleLineEdit.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Scaling of model, where 1.0 is original size", None, QtGui.QApplication.UnicodeUTF8))
         self.alignRotationLabel.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Rotation:", None, QtGui.QApplication.UnicodeUTF8))
@@ -708,10 +733,17 @@ class Ui_ScaffoldfitterWidget(object):
         self.fitStrainPenaltyLineEdit.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Penalty factor for strains, typically << 1.0 e.g. 0.001", None, QtGui.QApplication.UnicodeUTF8))
         self.fitPerformButton.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Perform fitting up to at most the set number of iteratations", None, QtGui.QApplication.UnicodeUTF8))
         self.fitPerformButton.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Perform Fit", None, QtGui.QApplication.UnicodeUTF8))
+        self.fitCancelButton.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Stop fitting after the current iteration", None, QtGui.QApplication.UnicodeUTF8))
+        self.fitCancelButton.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Cancel", None, QtGui.QApplication.UnicodeUTF8))
+        self.fitResumeButton.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Continue fitting from the last checkpoint", None, QtGui.QApplication.UnicodeUTF8))
+        self.fitResumeButton.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Resume Fit", None, QtGui.QApplication.UnicodeUTF8))
         self.fitMaxIterationsLabel.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Max. Iterations:", None, QtGui.QApplication.UnicodeUTF8))
         self.fitEdgeDiscontinuityPenaltyLabel.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Edge Discontinuity Pen.:", None, QtGui.QApplication.UnicodeUTF8))
         self.fitEdgeDiscontinuityPenaltyLineEdit.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Penalty factor for discontinuity between adjacent elements. Used only with non-C1 continuous coordinate fields", None, QtGui.QApplication.UnicodeUTF8))
         self.fitMaxIterationsSpinBox.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Maximum number of iterations to limit fit time if convergence is slow", None, QtGui.QApplication.UnicodeUTF8))
+        self.fitScheduleLabel.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Schedule:", None, QtGui.QApplication.UnicodeUTF8))
+        self.fitScheduleLineEdit.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Optional coarse to fine stages fraction:strain_penalty[:iterations], e.g. 0.05:0.1:5, 0.25:0.01:5, 1:0.001", None, QtGui.QApplication.UnicodeUTF8))
+        self.fitScheduleLineEdit.setPlaceholderText(QtGui.QApplication.translate("ScaffoldfitterWidget", "single stage", None, QtGui.QApplication.UnicodeUTF8))
         self.toolBox.setItemText(self.toolBox.indexOf(self.fitPage), QtGui.QApplication.translate("ScaffoldfitterWidget", "Smooth Fitting", None, QtGui.QApplication.UnicodeUTF8))
         self.displayOptions_groupBox.setTitle(QtGui.QApplication.translate("ScaffoldfitterWidget", "Display options:", None, QtGui.QApplication.UnicodeUTF8))
         self.displayDataPoints_checkBox.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Data points", None, QtGui.QApplication.UnicodeUTF8))
@@ -735,6 +767,8 @@ class Ui_ScaffoldfitterWidget(object):
         self.displayElementAxes_checkBox.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Element axes", None, QtGui.QApplication.UnicodeUTF8))
         self.displayAxes_checkBox.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Axes", None, QtGui.QApplication.UnicodeUTF8))
         self.displayAnnotationPoints_checkBox.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "Annotation points", None, QtGui.QApplication.UnicodeUTF8))
+        self.displayDataFullResolution_checkBox.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Draw every data point instead of a decimated subset", None, QtGui.QApplication.UnicodeUTF8))
+        self.displayDataFullResolution_checkBox.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "All data points", None, QtGui.QApplication.UnicodeUTF8))
         self.viewAllButton.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Adjust the view to see the whole model", None, QtGui.QApplication.UnicodeUTF8))
         self.viewAllButton.setText(QtGui.QApplication.translate("ScaffoldfitterWidget", "View All", None, QtGui.QApplication.UnicodeUTF8))
         self.doneButton.setToolTip(QtGui.QApplication.translate("ScaffoldfitterWidget", "Finish this step", None, QtGui.QApplication.UnicodeUTF8))
@@ -45,9 +45,15 @@ setup(name='mapclientplugins.scaffoldfitterstep',
     author_email='',
     url='',
     license='APACHE',
-    packages=find_packages(exclude=['ez_setup',]),
+    packages=find_packages(exclude=['ez_setup', 'benchmarks', 'benchmarks.*', 'tests', 'tests.*']),
     namespace_packages=['mapclientplugins'],
     include_package_data=True,
     zip_safe=False,
     install_requires=requires,
+    entry_points={
+        'console_scripts': [
+            'scaffoldfitter-headless = mapclientplugins.scaffoldfitterstep.headless:main',
+            'scaffoldfitter-batch = mapclientplugins.scaffoldfitterstep.batch:main',
+        ],
+    },
     )
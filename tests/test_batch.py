@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from mapclientplugins.scaffoldfitterstep import batch
+
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                                reason='replaces run_job in forked worker processes')
+
+
+def _run_job(job):
+    # count attempts in a file, since each attempt runs in a new process
+    with open(job['attempts_file'], 'a') as stream:
+        stream.write('.')
+    with open(job['attempts_file'], 'r') as stream:
+        attempt = len(stream.read())
+    if job.get('sleep'):
+        time.sleep(job['sleep'])
+    if job.get('exit_code'):
+        os._exit(job['exit_code'])
+    if attempt <= job.get('failures', 0):
+        raise RuntimeError('attempt {0} failed'.format(attempt))
+    return {'name': job['name'], 'status': 'succeeded', 'duration': 0.0, 'rms_error': 0.1, 'max_error': 0.2}
+
+
+@pytest.fixture
+def make_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, 'run_job', _run_job)
+    monkeypatch.setattr(batch, 'POLL_INTERVAL', 0.01)
+
+    def _make_job(name, **options):
+        options.update({'name': name, 'attempts_file': str(tmp_path / (name + '.attempts'))})
+        return options
+
+    return _make_job
+
+
+def test_run_batch_retries_failed_jobs(make_job):
+    jobs = [make_job('ok'), make_job('flaky', failures=1), make_job('broken', failures=5)]
+    finished = []
+    results = batch.run_batch(jobs, workers_count=2, retries=1, progress_callback=finished.append)
+    assert [result['name'] for result in results] == ['ok', 'flaky', 'broken']
+    assert [result['status'] for result in results] == ['succeeded', 'succeeded', 'failed']
+    assert [result['attempts'] for result in results] == [1, 2, 2]
+    assert 'attempt 2 failed' in results[2]['error']
+    assert sorted(result['name'] for result in finished) == ['broken', 'flaky', 'ok']
+    summary = batch.summarise(results)
+    assert (summary['succeeded'], summary['failed'], summary['timeout']) == (2, 1, 0)
+
+
+def test_run_batch_terminates_jobs_exceeding_timeout(make_job):
+    start_time = time.perf_counter()
+    results = batch.run_batch([make_job('slow', sleep=30.0), make_job('ok')], workers_count=2, timeout=0.5)
+    assert time.perf_counter() - start_time < 10.0
+    assert [result['status'] for result in results] == ['timeout', 'succeeded']
+    assert results[0]['attempts'] == 1
+
+
+def test_run_batch_reports_exited_workers(make_job):
+    results = batch.run_batch([make_job('crash', exit_code=3)], workers_count=1, retries=1)
+    assert results[0]['status'] == 'failed'
+    assert results[0]['attempts'] == 2
+    assert 'code 3' in results[0]['error']
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from mapclientplugins.scaffoldfitterstep.model.downsample import POISSON_MAX_TARGET_COUNT, downsample_indices
+
+
+def _sphere_surface_points(count, seed=0):
+    points = np.random.RandomState(seed).normal(size=(count, 3))
+    return points / np.linalg.norm(points, axis=1)[:, np.newaxis]
+
+
+@pytest.mark.parametrize('mode', ['voxel', 'stratified', 'poisson'])
+@pytest.mark.parametrize('target_count', [2000, 10000])
+def test_target_count_on_surface(mode, target_count):
+    coordinates = _sphere_surface_points(100000)
+    count = len(downsample_indices(coordinates, mode, target_count=target_count))
+    assert 0.9 * target_count <= count <= target_count
+
+
+@pytest.mark.parametrize('mode', ['voxel', 'stratified', 'poisson'])
+@pytest.mark.parametrize('target_count', [1, 5])
+def test_small_target_count_not_exceeded(mode, target_count):
+    coordinates = _sphere_surface_points(10000)
+    count = len(downsample_indices(coordinates, mode, target_count=target_count))
+    assert 1 <= count <= target_count
+
+
+def test_poisson_target_count_limit():
+    coordinates = _sphere_surface_points(100000)
+    with pytest.raises(ValueError):
+        downsample_indices(coordinates, 'poisson', target_count=POISSON_MAX_TARGET_COUNT + 1)
+
+
+@pytest.mark.parametrize('mode', ['voxel', 'stratified', 'poisson'])
+def test_fewer_distinct_points_than_target_count(mode):
+    positions = _sphere_surface_points(10)
+    coordinates = positions[np.arange(1000) % 10]
+    count = len(downsample_indices(coordinates, mode, target_count=100))
+    assert count == 10
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from mapclientplugins.scaffoldfitterstep.model.icp import MIRROR, euler_angles_to_rotation_matrix, icp_align, \
+    rotation_matrix_to_euler_angles
+
+
+def _source_points():
+    # random points have no symmetry, so the alignment including mirroring has a unique answer
+    return np.random.RandomState(1).uniform(-1.0, 1.0, (200, 3)) * np.array([3.0, 2.0, 1.0])
+
+
+def _transform(points, scale, euler_angles, offset, mirror=False):
+    rotation = euler_angles_to_rotation_matrix(euler_angles)
+    if mirror:
+        points = np.dot(points, MIRROR.T)
+    return scale * np.dot(points, rotation.T) + np.asarray(offset)
+
+
+@pytest.mark.parametrize('euler_angles', [
+    [0.3, -0.2, 0.1],
+    [-2.5, 1.2, 3.0],
+    [1.0, 0.0, -1.0]])
+def test_euler_angles_round_trip(euler_angles):
+    rotation = euler_angles_to_rotation_matrix(euler_angles)
+    assert np.allclose(np.dot(rotation, rotation.T), np.identity(3))
+    assert np.linalg.det(rotation) == pytest.approx(1.0)
+    assert np.allclose(rotation_matrix_to_euler_angles(rotation), euler_angles)
+
+
+def test_euler_angles_round_trip_at_gimbal_lock():
+    rotation = euler_angles_to_rotation_matrix([0.4, 0.5 * np.pi, 0.0])
+    assert np.allclose(euler_angles_to_rotation_matrix(rotation_matrix_to_euler_angles(rotation)), rotation)
+
+
+@pytest.mark.parametrize('mode, scale', [('rigid', 1.0), ('similarity', 1.7)])
+def test_icp_recovers_transform(mode, scale):
+    source = _source_points()
+    euler_angles = [0.1, -0.05, 0.08]
+    offset = [0.2, -0.1, 0.3]
+    target = _transform(source, scale, euler_angles, offset)
+    result = icp_align(source, target, mode, mirror=False)
+    assert result['scale'] == pytest.approx(scale)
+    assert np.allclose(result['euler_angles'], euler_angles, atol=1.0E-6)
+    assert np.allclose(result['offset'], offset, atol=1.0E-6)
+    assert result['rms_error'] < 1.0E-6
+
+
+def test_icp_tries_mirror():
+    source = _source_points()
+    target = _transform(source, 1.0, [0.05, 0.0, 0.0], [0.1, 0.0, 0.0], mirror=True)
+    assert icp_align(source, target, mirror=False)['rms_error'] > 1.0E-3
+    result = icp_align(source, target, mirror=None)
+    assert result['mirror']
+    assert result['rms_error'] < 1.0E-6
+
+
+def test_icp_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        icp_align(_source_points(), _source_points(), mode='affine')
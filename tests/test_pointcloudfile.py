@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from mapclientplugins.scaffoldfitterstep.model.pointcloudfile import ARRAY_READERS, iterate_exdata_chunks, \
+    open_npy, open_ply, open_raw, read_exdata_header
+
+_COORDINATES = np.arange(30, dtype=np.float64).reshape(10, 3) * 0.5
+
+
+def _write_ply(filename, coordinates, byte_order='<', format_name='binary_little_endian'):
+    vertices = np.zeros(len(coordinates), dtype=[('x', byte_order + 'f4'), ('y', byte_order + 'f4'),
+                                                 ('z', byte_order + 'f4'), ('red', 'u1')])
+    vertices['x'], vertices['y'], vertices['z'] = coordinates.T
+    header = '\n'.join([
+        'ply',
+        'format {0} 1.0'.format(format_name),
+        'comment synthetic',
+        'element camera 1',
+        'property double focal',
+        'element vertex {0}'.format(len(coordinates)),
+        'property float x',
+        'property float y',
+        'property float z',
+        'property uchar red',
+        'element face 0',
+        'property list uchar int vertex_indices',
+        'end_header', ''])
+    with open(filename, 'wb') as stream:
+        stream.write(header.encode('ascii'))
+        stream.write(np.zeros(1, dtype=byte_order + 'f8').tobytes())
+        stream.write(vertices.tobytes())
+
+
+def _write_exdata(filename, coordinates, newline='\n'):
+    lines = [
+        ' Group name: data',
+        ' #Fields=1',
+        ' 1) data_coordinates, coordinate, rectangular cartesian, #Components=3',
+        '   x.  Value index= 1, #Derivatives= 0',
+        '   y.  Value index= 2, #Derivatives= 0',
+        '   z.  Value index= 3, #Derivatives= 0']
+    for identifier, values in enumerate(coordinates, 1):
+        lines.append(' Node: {0}'.format(identifier))
+        lines.append('  ' + ' '.join(repr(float(value)) for value in values))
+    with open(filename, 'w', newline='') as stream:
+        stream.write(newline.join(lines) + newline)
+
+
+def test_open_npy(tmp_path):
+    filename = str(tmp_path / 'points.npy')
+    np.save(filename, _COORDINATES)
+    assert np.array_equal(open_npy(filename), _COORDINATES)
+
+
+def test_open_npy_rejects_wrong_shape(tmp_path):
+    filename = str(tmp_path / 'points.npy')
+    np.save(filename, _COORDINATES.reshape(-1))
+    with pytest.raises(ValueError):
+        open_npy(filename)
+
+
+@pytest.mark.parametrize('extension, dtype', [('.f32', np.float32), ('.raw', np.float32), ('.f64', np.float64)])
+def test_open_raw(tmp_path, extension, dtype):
+    filename = str(tmp_path / ('points' + extension))
+    _COORDINATES.astype(dtype).tofile(filename)
+    assert np.array_equal(ARRAY_READERS[extension](filename), _COORDINATES)
+
+
+def test_open_raw_rejects_partial_coordinates(tmp_path):
+    filename = str(tmp_path / 'points.f32')
+    _COORDINATES.astype(np.float32).reshape(-1)[:-1].tofile(filename)
+    with pytest.raises(ValueError):
+        open_raw(filename, np.float32)
+
+
+@pytest.mark.parametrize('byte_order, format_name', [('<', 'binary_little_endian'), ('>', 'binary_big_endian')])
+def test_open_ply(tmp_path, byte_order, format_name):
+    filename = str(tmp_path / 'points.ply')
+    _write_ply(filename, _COORDINATES, byte_order, format_name)
+    coordinates = open_ply(filename)
+    assert len(coordinates) == len(_COORDINATES)
+    assert np.array_equal(coordinates[:], _COORDINATES)
+    assert np.array_equal(coordinates[2:5], _COORDINATES[2:5])
+
+
+def test_open_ply_rejects_ascii(tmp_path):
+    filename = str(tmp_path / 'points.ply')
+    with open(filename, 'wb') as stream:
+        stream.write(b'ply\nformat ascii 1.0\nelement vertex 0\nend_header\n')
+    with pytest.raises(ValueError):
+        open_ply(filename)
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_iterate_exdata_chunks(tmp_path, newline):
+    filename = str(tmp_path / 'points.exf')
+    _write_exdata(filename, _COORDINATES, newline)
+    assert read_exdata_header(filename) == ('data_coordinates', 3)
+    chunks = list(iterate_exdata_chunks(filename, 3, chunk_size=4))
+    assert [len(identifiers) for identifiers, _, _ in chunks] == [4, 4, 2]
+    assert np.array_equal(np.concatenate([identifiers for identifiers, _, _ in chunks]), np.arange(1, 11))
+    assert np.array_equal(np.concatenate([coordinates for _, coordinates, _ in chunks]), _COORDINATES)
+    # progress is in bytes, so the last chunk ends at the file size
+    assert chunks[-1][2] == (tmp_path / 'points.exf').stat().st_size
+
+
+def test_read_exdata_header_rejects_derivatives(tmp_path):
+    filename = str(tmp_path / 'points.exf')
+    _write_exdata(filename, _COORDINATES)
+    text = (tmp_path / 'points.exf').read_text().replace('#Derivatives= 0', '#Derivatives= 1')
+    (tmp_path / 'points.exf').write_text(text)
+    with pytest.raises(ValueError):
+        read_exdata_header(filename)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('opencmiss.zinc')
+pytest.importorskip('scaffoldfitter')
+
+from opencmiss.zinc.context import Context
+
+from benchmarks.synthetic import write_point_cloud, write_scaffold
+from mapclientplugins.scaffoldfitterstep.model.pointcloud import get_nodeset_coordinates
+from mapclientplugins.scaffoldfitterstep.model.scaffoldfittermodel import ScaffoldFitterModel
+
+
+def _evaluate_model_coordinates(model, element, xi):
+    coordinate_field = model._model_coordinate_field
+    cache = coordinate_field.getFieldmodule().createFieldcache()
+    cache.setMeshLocation(element, xi)
+    _, coordinates = coordinate_field.evaluateReal(cache, 3)
+    return np.array(coordinates)
+
+
+def test_fit_uses_supplied_projections(tmp_path):
+    scaffold = str(tmp_path / 'cube.exf')
+    point_cloud = str(tmp_path / 'cube.npy')
+    write_scaffold(scaffold, 'cube', 1)
+    write_point_cloud(point_cloud, 'cube', 1000)
+    model = ScaffoldFitterModel(Context('test_projection'))
+    if 'bvh' not in model.get_projection_methods():
+        pytest.skip('Installed fitter does not accept supplied projections')
+    model.set_projection_method('bvh')
+    model.set_fit_settings(strain_penalty=0.001, max_iterations=1)
+    model.set_fit_telemetry(False)
+    model.initialise(point_cloud, scaffold)
+    model.project_data()
+    # the points lie on the scaffold surface, so fitting their own projections barely moves it;
+    # projecting them all to one corner must pull that corner towards their centroid
+    identifiers, coordinates = get_nodeset_coordinates(
+        model._data_coordinate_field, model._active_data_point_group_field.getNodesetGroup())
+    element = model._project_surface_element_group.createElementiterator().next()
+    xi = [0.0, 0.0]
+    model._assign_data_projections(identifiers, np.full(len(identifiers), element.getIdentifier()),
+                                   np.zeros((len(identifiers), 2)))
+    model._ScaffoldFitter.setDataProjectionMeshLocationField(model._data_projection_location_field)
+    centroid = np.mean(coordinates, axis=0)
+    corner_before = _evaluate_model_coordinates(model, element, xi)
+    model.fit_data(update_graphics=False)
+    corner_after = _evaluate_model_coordinates(model, element, xi)
+    model.done()
+    assert np.linalg.norm(corner_after - centroid) < 0.5 * np.linalg.norm(corner_before - centroid)
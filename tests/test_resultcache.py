@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+
+from mapclientplugins.scaffoldfitterstep.model.resultcache import FittedResultCache, compute_inputs_hash, \
+    compute_problem_hash
+
+
+def _writer(size):
+    def write_result(filename):
+        with open(filename, 'wb') as stream:
+            stream.write(b'x' * size)
+    return write_result
+
+
+def _age(filename, seconds):
+    stat = os.stat(filename)
+    os.utime(filename, (stat.st_atime, stat.st_mtime - seconds))
+
+
+def test_cache_miss_then_hit(tmp_path):
+    cache = FittedResultCache(str(tmp_path / 'cache'))
+    assert cache.get('a') is None
+    filename = cache.add('a', _writer(10))
+    assert cache.get('a') == filename
+    assert cache.get('a', '.exf.gz') is None
+    assert not os.path.exists(filename + '.tmp')
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = FittedResultCache(str(tmp_path), max_size=250)
+    a = cache.add('a', _writer(100))
+    b = cache.add('b', _writer(100))
+    _age(a, 20)
+    _age(b, 10)
+    # using a makes b the least recently used
+    cache.get('a')
+    c = cache.add('c', _writer(100))
+    assert os.path.exists(a)
+    assert not os.path.exists(b)
+    assert os.path.exists(c)
+
+
+def test_cache_keeps_result_larger_than_max_size(tmp_path):
+    cache = FittedResultCache(str(tmp_path), max_size=50)
+    a = cache.add('a', _writer(10))
+    _age(a, 10)
+    b = cache.add('b', _writer(100))
+    assert not os.path.exists(a)
+    assert cache.get('b') == b
+
+
+def test_cache_ignores_other_files(tmp_path):
+    other = tmp_path / 'notes.txt'
+    other.write_bytes(b'x' * 1000)
+    cache = FittedResultCache(str(tmp_path), max_size=50)
+    cache.add('a', _writer(10))
+    assert other.exists()
+
+
+def test_inputs_hash_depends_on_settings(tmp_path):
+    point_cloud = tmp_path / 'points.exf'
+    scaffold = tmp_path / 'scaffold.exf'
+    point_cloud.write_text(u'points')
+    scaffold.write_text(u'scaffold')
+    align_settings = {'scale': 1.0}
+    key = compute_inputs_hash(str(point_cloud), str(scaffold), align_settings, {'strain_penalty': 0.1})
+    assert key == compute_inputs_hash(str(point_cloud), str(scaffold), dict(align_settings),
+                                      {'strain_penalty': 0.1})
+    assert key != compute_inputs_hash(str(point_cloud), str(scaffold), align_settings, {'strain_penalty': 0.2})
+    assert key != compute_inputs_hash(str(point_cloud), str(scaffold), align_settings, {'strain_penalty': 0.1},
+                                      export_settings={'projections': True})
+
+
+def test_problem_hash_depends_on_content_only():
+    scaffold = {'elements': b'scaffold'}
+    coordinates = np.arange(12, dtype=np.float64).reshape(4, 3)
+    key = compute_problem_hash(coordinates, scaffold)
+    assert key == compute_problem_hash(coordinates.astype(np.float32), dict(scaffold))
+    assert key != compute_problem_hash(coordinates + 1.0, scaffold)
+    assert key != compute_problem_hash(coordinates, {'elements': b'other'})
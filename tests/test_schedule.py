@@ -0,0 +1,25 @@
+import pytest
+
+from mapclientplugins.scaffoldfitterstep.model.schedule import format_fit_schedule, get_fit_stages, \
+    parse_fit_schedule
+
+
+def test_round_trip():
+    text = '0.05:0.1:5, 0.25:0.01:5, 1:0.001'
+    assert format_fit_schedule(parse_fit_schedule(text)) == text
+
+
+def test_missing_strain_penalty_is_inherited():
+    schedule = [{'points_fraction': 0.5, 'max_iterations': 5}, {'points_fraction': 1.0}]
+    text = format_fit_schedule(schedule)
+    assert text == '0.5::5, 1:'
+    assert parse_fit_schedule(text) == schedule
+    fit_settings = {'strain_penalty': 0.2, 'edge_discontinuity_penalty': 0.0, 'max_iterations': 3,
+                    'schedule': parse_fit_schedule(text)}
+    assert [stage['strain_penalty'] for stage in get_fit_stages(fit_settings)] == [0.2, 0.2]
+
+
+@pytest.mark.parametrize('text', ['0.5', '0.5:0.1:5:1', '0:0.1', '1.5:0.1'])
+def test_invalid_stage(text):
+    with pytest.raises(ValueError):
+        parse_fit_schedule(text)
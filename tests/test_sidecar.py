@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+
+from mapclientplugins.scaffoldfitterstep.model.sidecar import PointCloudSidecar
+
+
+def _write_sidecar(filename, cache_dir=None):
+    identifiers = np.arange(1, 11)
+    coordinates = np.arange(30, dtype=np.float64).reshape(10, 3)
+    sidecar = PointCloudSidecar(filename, cache_dir)
+    sidecar.begin_write('data_coordinates', 3)
+    sidecar.append(identifiers[:4], coordinates[:4])
+    sidecar.append(identifiers[4:], coordinates[4:])
+    sidecar.end_write()
+    return identifiers, coordinates
+
+
+def _touch(filename, seconds):
+    stat = os.stat(filename)
+    os.utime(filename, (stat.st_atime, stat.st_mtime + seconds))
+
+
+def test_sidecar_round_trip(tmp_path):
+    filename = str(tmp_path / 'points.exf')
+    (tmp_path / 'points.exf').write_text(u'points')
+    identifiers, coordinates = _write_sidecar(filename, str(tmp_path / 'cache'))
+    sidecar = PointCloudSidecar(filename, str(tmp_path / 'cache'))
+    assert sidecar.is_valid()
+    field_name, loaded_identifiers, loaded_coordinates = sidecar.load()
+    assert field_name == 'data_coordinates'
+    assert np.array_equal(loaded_identifiers, identifiers)
+    assert np.array_equal(loaded_coordinates, coordinates)
+
+
+def test_sidecar_missing_or_incomplete_is_invalid(tmp_path):
+    filename = str(tmp_path / 'points.exf')
+    (tmp_path / 'points.exf').write_text(u'points')
+    assert not PointCloudSidecar(filename).is_valid()
+    sidecar = PointCloudSidecar(filename)
+    sidecar.begin_write('data_coordinates', 3)
+    sidecar.append([1], [[0.0, 0.0, 0.0]])
+    sidecar.abort_write()
+    assert not PointCloudSidecar(filename).is_valid()
+
+
+def test_sidecar_invalid_after_content_changes(tmp_path):
+    filename = str(tmp_path / 'points.exf')
+    (tmp_path / 'points.exf').write_text(u'points')
+    _write_sidecar(filename)
+    (tmp_path / 'points.exf').write_text(u'pointz')
+    _touch(filename, 10)
+    assert not PointCloudSidecar(filename).is_valid()
+    (tmp_path / 'points.exf').write_text(u'more points')
+    assert not PointCloudSidecar(filename).is_valid()
+
+
+def test_sidecar_valid_after_touch(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'points.exf')
+    (tmp_path / 'points.exf').write_text(u'points')
+    _write_sidecar(filename)
+    _touch(filename, 10)
+    assert PointCloudSidecar(filename).is_valid()
+    # the refreshed mtime is kept, so the file need not be hashed again
+    monkeypatch.setattr('mapclientplugins.scaffoldfitterstep.model.sidecar.compute_file_hash', None)
+    assert PointCloudSidecar(filename).is_valid()
+
+
+def test_sidecar_valid_when_metadata_cannot_be_refreshed(tmp_path, monkeypatch):
+    filename = str(tmp_path / 'points.exf')
+    (tmp_path / 'points.exf').write_text(u'points')
+    _write_sidecar(filename)
+    _touch(filename, 10)
+
+    def _fail_write_metadata(self, metadata):
+        raise OSError('read-only')
+
+    monkeypatch.setattr(PointCloudSidecar, '_write_metadata', _fail_write_metadata)
+    assert PointCloudSidecar(filename).is_valid()
@@ -0,0 +1,39 @@
+from mapclientplugins.scaffoldfitterstep.model.tessellation import AdaptiveTessellation
+
+
+class _RecordingTessellation(object):
+
+    def __init__(self):
+        self.refinements = []
+
+    def setRefinementFactors(self, factors):
+        self.refinements.append(factors[0])
+
+
+def _interact(surface_elements_count, screen_size=800):
+    tessellation = _RecordingTessellation()
+    adaptive_tessellation = AdaptiveTessellation(tessellation)
+    adaptive_tessellation.set_mesh(surface_elements_count, surface_elements_count ** 0.5)
+    adaptive_tessellation.set_screen_size(screen_size)
+    del tessellation.refinements[:]
+    adaptive_tessellation.set_interacting(True)
+    adaptive_tessellation.set_interacting(False)
+    return tessellation.refinements
+
+
+def test_small_mesh_keeps_refinement_while_interacting():
+    assert _interact(1000) == []
+
+
+def test_large_mesh_coarsens_while_interacting():
+    refinements = _interact(50000, screen_size=1.0E6)
+    assert len(refinements) == 2
+    assert refinements[0] < refinements[1]
+
+
+def test_unchanged_refinement_is_not_set():
+    tessellation = _RecordingTessellation()
+    adaptive_tessellation = AdaptiveTessellation(tessellation)
+    adaptive_tessellation.set_mesh(10, 10 ** 0.5)
+    adaptive_tessellation.set_mesh(10, 10 ** 0.5)
+    assert len(tessellation.refinements) == 1